@@ -0,0 +1,128 @@
+# DataEng S25 - Data Integration: integer-keyed county joins
+# every frame is keyed once by an int64 code of its normalized "County, State"
+# name (the same key data_integration.py used to build as a string), so the
+# cases/deaths/census joins are integer hash joins; the keyed census table is
+# cached on disk and only rebuilt when acs2017_county_data.csv changes
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from state_normalize import normalize_states, strip_names, unmatched_states
+
+CENSUS_COLUMNS = ['County', 'State', 'TotalPop', 'IncomePerCap', 'Poverty', 'Unemployment']
+CACHE_DIR = '.integration_cache'
+KEY_VERSION = 2  # bump when county_key changes so cached tables are rebuilt
+
+
+# int64 code of "County, State" for every row; each distinct pair is hashed
+# once, and equal names always get equal codes, in any file or run
+def county_key(county, state):
+    text = county.astype(str).str.strip() + ', ' + state.astype(str).str.strip()
+    codes, names = pd.factorize(text)
+    hashed = pd.util.hash_array(names.to_numpy(dtype=object)).view('int64')
+    return pd.Index(hashed[codes], name='key')
+
+
+# county and state columns normalized once per distinct value (names
+# stripped, states spelled out by state_normalize)
+# returns the normalized frame and the unmatched_states report of the states
+# that do not map (print it with state_normalize.print_unmatched)
+def normalize_places(df, county):
+    df = df.copy()
+    df[county] = strip_names(df[county])
+    raw = df['State']
+    df['State'], unmatched = normalize_states(raw)
+    return df, unmatched_states(raw, unmatched, df[county])
+
+
+# USAFacts cases or deaths reduced to one value column per date: county names
+# stripped, statewide unallocated rows dropped, state abbreviations spelled
+# out and the rows indexed by county_key
+# rename maps date columns to new names, e.g. {'2023-07-23': 'Cases'}
+# returns the frame and the report of states that do not map
+def clean_usafacts(df, rename=None):
+    df, report = normalize_places(df, 'County Name')
+    df = df[df['County Name'] != 'Statewide Unallocated']
+    df.index = county_key(df['County Name'], df['State'])
+    return df.rename(columns=rename or {}), report
+
+
+# keyed census table straight from the csv file, and the report of states
+# that do not map
+def read_census(path='acs2017_county_data.csv', columns=CENSUS_COLUMNS):
+    census_df = pd.read_csv(path, usecols=columns)[columns]
+    census_df, report = normalize_places(census_df, 'County')
+    census_df.index = county_key(census_df['County'], census_df['State'])
+    return census_df, report
+
+
+# an unmatched_states report as json records and back, for the cache metadata
+def _report_records(report):
+    return report.reset_index().to_dict('records')
+
+
+def _report_frame(records):
+    return pd.DataFrame(records, columns=['state', 'rows', 'counties']).set_index('state')
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# keyed census table and its report of states that do not map (see
+# read_census), from the on-disk cache when it was built from the same file:
+# a matching size and mtime is trusted, otherwise the content hash decides
+def load_census(path='acs2017_county_data.csv', columns=CENSUS_COLUMNS, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    base = os.path.join(cache_dir, os.path.basename(path))
+    data_path, meta_path = base + '.parquet', base + '.json'
+    stat = os.stat(path)
+    want = {'key_version': KEY_VERSION, 'columns': list(columns)}
+
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if all(meta.get(k) == v for k, v in want.items()) and meta['size'] == stat.st_size \
+                and 'unmatched' in meta:
+            if meta['mtime_ns'] == stat.st_mtime_ns:
+                return pd.read_parquet(data_path), _report_frame(meta['unmatched'])
+            if meta['sha256'] == _sha256(path):  # touched but unchanged
+                meta['mtime_ns'] = stat.st_mtime_ns
+                _write_json(meta_path, meta)
+                return pd.read_parquet(data_path), _report_frame(meta['unmatched'])
+
+    census_df, report = read_census(path, columns)
+    census_df.to_parquet(data_path + '.tmp', index=True)
+    os.replace(data_path + '.tmp', data_path)
+    _write_json(meta_path, {**want, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                            'sha256': _sha256(path), 'unmatched': _report_records(report)})
+    return census_df, report
+
+
+def _write_json(path, obj):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f)
+    os.replace(path + '.tmp', path)
+
+
+# cases joined with deaths and the census covariates on the integer key, plus
+# cases and deaths per head of population
+def integrate(cases_df, deaths_df, census_df,
+              covariates=('TotalPop', 'IncomePerCap', 'Poverty', 'Unemployment')):
+    join_df = cases_df.join(deaths_df[['Deaths']])
+    join_df = join_df.join(census_df[list(covariates)])
+    join_df['CasesPerCap'] = join_df['Cases'] / join_df['TotalPop']
+    join_df['DeathsPerCap'] = join_df['Deaths'] / join_df['TotalPop']
+    return join_df
+
+
+# rows of an integrate() result without census covariates: counties whose
+# name or state matched nothing in the census table
+def unmatched_counties(join_df, column='TotalPop'):
+    return join_df[join_df[column].isna()]
@@ -1,89 +1,99 @@
-import pandas as pd
+# DataEng S25 - Data Integration Lab Assignment
+# run it with -h to see the command line options
+import argparse
 import seaborn as sns
 import matplotlib.pyplot as plt
-from us_state_abbrev import abbrev_to_us_state
+from county_join import clean_usafacts, integrate, load_census, unmatched_counties
+from state_normalize import print_unmatched
+from usafacts import read_usafacts
 
 dashline = "----------------------------------"
 
-# Read
-cases_df = pd.read_csv('covid_confirmed_usafacts.csv')
-deaths_df = pd.read_csv('covid_deaths_usafacts.csv')
-census_df = pd.read_csv('acs2017_county_data.csv')
 
-# Trim
-cases_df = cases_df[['County Name', 'State', '2023-07-23']]
-deaths_df = deaths_df[['County Name', 'State', '2023-07-23']]
-census_df = census_df[['County', 'State', 'TotalPop', 'IncomePerCap', 'Poverty', 'Unemployment']]
-
-# Display
-print(dashline)
-print("cases_df columns:", cases_df.columns.tolist())
-print("deaths_df columns:", deaths_df.columns.tolist())
-print("census_df columns:", census_df.columns.tolist())
-print(dashline)
-
-# Integration Challenge #1
-cases_df['County Name'] = cases_df['County Name'].str.strip()
-deaths_df['County Name'] = deaths_df['County Name'].str.strip()
-washington_cases = cases_df[cases_df['County Name'] == 'Washington County']
-washington_deaths = deaths_df[deaths_df['County Name'] == 'Washington County']
-
-print("Washington County count in cases_df:", len(washington_cases))
-print("Washington County count in deaths_df:", len(washington_deaths))
-print(dashline)
-
-# Integration Challenge #2
-cases_df = cases_df[cases_df['County Name'] != 'Statewide Unallocated']
-deaths_df = deaths_df[deaths_df['County Name'] != 'Statewide Unallocated']
-
-print("Remaining rows in cases_df:", len(cases_df))
-print("Remaining rows in deaths_df:", len(deaths_df))
-print(dashline)
-
-# Integration Challenge #3 
-cases_df['State'] = cases_df['State'].map(abbrev_to_us_state)
-deaths_df['State'] = deaths_df['State'].map(abbrev_to_us_state)
-
-print(cases_df.head())
-print(dashline)
-
-# Integration Challenge #4 
-cases_df['key'] = cases_df['County Name'] + ', ' + cases_df['State']
-deaths_df['key'] = deaths_df['County Name'] + ', ' + deaths_df['State']
-census_df['key'] = census_df['County'] + ', ' + census_df['State']
-
-cases_df.set_index('key', inplace=True)
-deaths_df.set_index('key', inplace=True)
-census_df.set_index('key', inplace=True)
-
-print(census_df.head())
-print(dashline)
-
-# Integration Challenge #5 
-cases_df.rename(columns={'2023-07-23': 'Cases'}, inplace=True)
-deaths_df.rename(columns={'2023-07-23': 'Deaths'}, inplace=True)
-
-print("cases_df columns:", cases_df.columns.values.tolist())
-print("deaths_df columns:", deaths_df.columns.values.tolist())
-print(dashline)
-
-# Do the Integration
-join_df = cases_df.join(deaths_df[['Deaths']])
-join_df = join_df.join(census_df[['TotalPop', 'IncomePerCap', 'Poverty', 'Unemployment']])
-
-join_df['CasesPerCap'] = join_df['Cases'] / join_df['TotalPop']
-join_df['DeathsPerCap'] = join_df['Deaths'] / join_df['TotalPop']
-
-print("Number of rows in join_df:", len(join_df))
-print(dashline)
-
-# Correlation matrix
-correlation_matrix = join_df.corr(numeric_only=True)
-print(correlation_matrix)
-
-# Visualize
-sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
-
-plt.title('Correlation Matrix Heatmap')
-plt.tight_layout()  # Ensure it fits well
-plt.show()
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--cases", default="covid_confirmed_usafacts.csv")
+    parser.add_argument("-d", "--deaths", default="covid_deaths_usafacts.csv")
+    parser.add_argument("--census", default="acs2017_county_data.csv")
+    parser.add_argument("--date", default="2023-07-23", help="USAFacts date column, YYYY-MM-DD")
+    parser.add_argument("-o", "--output", default=None, help="also write join_df to this csv file")
+    args = parser.parse_args()
+
+    # Read
+    # only County Name, State and the one date column are parsed, the counts as Int32
+    cases_df = read_usafacts(args.cases, dates=[args.date])
+    deaths_df = read_usafacts(args.deaths, dates=[args.date])
+    # cleaned and keyed once, then read from .integration_cache while the file is unchanged
+    census_df, census_unmatched = load_census(args.census)
+    print_unmatched(census_unmatched, args.census)
+
+    # Display
+    print(dashline)
+    print("cases_df columns:", cases_df.columns.tolist())
+    print("deaths_df columns:", deaths_df.columns.tolist())
+    print("census_df columns:", census_df.columns.tolist())
+    print(dashline)
+
+    # Challenges #1 to #5 in one pass per file (county_join.clean_usafacts):
+    # names stripped, 'Statewide Unallocated' rows dropped, states spelled out
+    # by one lookup per distinct value, rows keyed by county_key and the date
+    # column renamed; states that do not map are reported, not left as NaN keys
+    cases_df, unmatched = clean_usafacts(cases_df, rename={args.date: 'Cases'})
+    print_unmatched(unmatched, 'cases_df')
+    deaths_df, unmatched = clean_usafacts(deaths_df, rename={args.date: 'Deaths'})
+    print_unmatched(unmatched, 'deaths_df')
+
+    # Integration Challenge #1
+    # the names were stripped once per distinct name; the columns are categoricals
+    washington_cases = cases_df[cases_df['County Name'] == 'Washington County']
+    washington_deaths = deaths_df[deaths_df['County Name'] == 'Washington County']
+
+    print("Washington County count in cases_df:", len(washington_cases))
+    print("Washington County count in deaths_df:", len(washington_deaths))
+    print(dashline)
+
+    # Integration Challenge #2
+    print("Remaining rows in cases_df:", len(cases_df))
+    print("Remaining rows in deaths_df:", len(deaths_df))
+    print(dashline)
+
+    # Integration Challenge #3
+    print(cases_df.head())
+    print(dashline)
+
+    # Integration Challenge #4
+    # integer codes of "County, State" instead of string keys; census_df is keyed by load_census
+    print(census_df.head())
+    print(dashline)
+
+    # Integration Challenge #5
+    print("cases_df columns:", cases_df.columns.values.tolist())
+    print("deaths_df columns:", deaths_df.columns.values.tolist())
+    print(dashline)
+
+    # Do the Integration
+    join_df = integrate(cases_df, deaths_df, census_df)
+
+    print("Number of rows in join_df:", len(join_df))
+    if args.output:
+        join_df.to_csv(args.output)
+    missing = unmatched_counties(join_df)
+    if len(missing):
+        print("Counties without census data:", len(missing))
+        print(missing[['County Name', 'State']].head().to_string(index=False))
+    print(dashline)
+
+    # Correlation matrix
+    correlation_matrix = join_df.corr(numeric_only=True)
+    print(correlation_matrix)
+
+    # Visualize
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5)
+
+    plt.title('Correlation Matrix Heatmap')
+    plt.tight_layout()  # Ensure it fits well
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
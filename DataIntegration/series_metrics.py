@@ -0,0 +1,200 @@
+# DataEng S25 - Data Integration: integrated metrics for every date
+# data_integration.py joins cases, deaths and the census for one date; this
+# does the same join for the whole USAFacts series as a county x date matrix,
+# a block of dates at a time:
+#   CasesPerCap / DeathsPerCap  per county and date (optional Parquet store)
+#   correlations                of Cases, Deaths, CasesPerCap and DeathsPerCap
+#                               with IncomePerCap, Poverty and Unemployment,
+#                               per date and over rolling windows of dates
+# a window's correlation pools every (county, date) pair in it; it is built
+# from per-date sums, so a window of 1 is the same number join_df.corr() gives
+#   python series_metrics.py -w 7 28 -o series_corr.csv
+# run it with -h to see the command line options
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from county_join import clean_usafacts, load_census
+from state_normalize import print_unmatched
+from usafacts import file_dates, read_long_wide, read_usafacts, select_dates, store_dates, write_long
+
+COVARIATES = ['IncomePerCap', 'Poverty', 'Unemployment']
+SUMS = ['n', 'x', 'y', 'xx', 'yy', 'xy']
+
+
+# reader of a wide csv (store=False) or a long store made by usafacts.py:
+# its dates, and the frame of a list of dates with the given id columns
+def make_reader(path, store=False):
+    if not store:
+        return file_dates(path), lambda dates, ids=(): read_usafacts(path, dates, id_columns=ids)
+
+    dates_in_store = store_dates(path)
+
+    # the ids alone come from the first date's partition
+    def read(dates, ids=()):
+        wide = read_long_wide(path, 'value', dates or dates_in_store[:1], id_columns=ids)
+        return wide[list(ids) + list(dates)]
+    return dates_in_store, read
+
+
+# keyed file rows left after clean_usafacts, as a 'row' column, and the
+# report of states that do not map
+def keyed_rows(read):
+    ids = read([], ('County Name', 'State'))
+    keyed, report = clean_usafacts(ids.assign(row=np.arange(len(ids))))
+    return keyed[['row']], report
+
+
+# the rows of integrate() computed once for the whole series: for each joined
+# county the cases row, the deaths row (-1 when there is none) and the census
+# values; every block of dates is then gathered through these positions
+def align(cases_rows, deaths_rows, census_df):
+    join_df = cases_rows.join(deaths_rows.rename(columns={'row': 'drow'}))
+    join_df = join_df.join(census_df[['TotalPop'] + COVARIATES])
+    join_df['drow'] = join_df['drow'].fillna(-1).astype('int64')
+    return join_df
+
+
+# the rows of a wide block gathered into join order, missing as NaN
+def gather(values, rows):
+    out = values[np.maximum(rows, 0)]
+    out[rows < 0] = np.nan
+    return out
+
+
+# county x date matrices of every metric for one block of dates
+def block_metrics(cases, deaths, join_df):
+    pop = join_df['TotalPop'].to_numpy(dtype='float64')[:, None]
+    c = gather(cases.to_numpy(dtype='float64', na_value=np.nan), join_df['row'].to_numpy())
+    d = gather(deaths.to_numpy(dtype='float64', na_value=np.nan), join_df['drow'].to_numpy())
+    return {'Cases': c, 'Deaths': d, 'CasesPerCap': c / pop, 'DeathsPerCap': d / pop}
+
+
+# a shift for each metric: the mean of its values in a block, 0 if it has none
+def metric_means(metrics):
+    means = {}
+    for name, y in metrics.items():
+        present = y[~np.isnan(y)]
+        means[name] = present.mean() if len(present) else 0.0
+    return means
+
+
+# per-date sums behind the correlation of each metric with each covariate,
+# over the counties where both are present; x is centred by xmean and each
+# metric y by its ymean, so the sums stay small next to the spread of the
+# values and the differences of cumulative sums and the sxy/sxx/syy below do
+# not cancel away their digits (any fixed shift gives the same correlation)
+# returns {(metric, covariate): {sum name: array over the block's dates}}
+def block_sums(metrics, join_df, xmean, ymean):
+    sums = {}
+    for cov in COVARIATES:
+        x = join_df[cov].to_numpy(dtype='float64')[:, None] - xmean[cov]
+        for name, y in metrics.items():
+            y = y - ymean[name]
+            both = ~np.isnan(y) & ~np.isnan(x)
+            xm, ym = np.where(both, x, 0.0), np.where(both, y, 0.0)
+            sums[name, cov] = {'n': both.sum(axis=0), 'x': xm.sum(axis=0), 'y': ym.sum(axis=0),
+                               'xx': (xm * xm).sum(axis=0), 'yy': (ym * ym).sum(axis=0),
+                               'xy': (xm * ym).sum(axis=0)}
+    return sums
+
+
+# Pearson correlation over rolling windows of `window` dates, from per-date
+# sums: window sums are differences of cumulative sums
+def window_corr(sums, window):
+    win = {}
+    for k in SUMS:
+        cum = np.concatenate([[0.0], np.cumsum(sums[k], dtype='float64')])
+        win[k] = cum[window:] - cum[:-window]
+    n = win['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxy = win['xy'] - win['x'] * win['y'] / n
+        sxx = win['xx'] - win['x'] ** 2 / n
+        syy = win['yy'] - win['y'] ** 2 / n
+        corr = sxy / np.sqrt(sxx * syy)
+    corr[n < 2] = np.nan
+    return np.concatenate([np.full(window - 1, np.nan), corr])
+
+
+# all metrics for every date (or start..end) of the series, block_dates dates
+# at a time; per-capita values go to percap_dir when given
+# returns the long correlation table (date, metric, covariate, window, corr)
+# and the reports of states that do not map, by file
+def series_metrics(cases_path, deaths_path, census_path='acs2017_county_data.csv', windows=(1,),
+                   start=None, end=None, block_dates=120, store=False, percap_dir=None):
+    cases_dates, read_cases = make_reader(cases_path, store)
+    deaths_dates, read_deaths = make_reader(deaths_path, store)
+    dates = select_dates(cases_dates, None, start, end)
+    missing = sorted(set(dates) - set(deaths_dates))
+    if missing:
+        raise ValueError(f"dates missing from {deaths_path}: {missing[:5]}")
+
+    census_df, census_report = load_census(census_path)
+    cases_rows, cases_report = keyed_rows(read_cases)
+    deaths_rows, deaths_report = keyed_rows(read_deaths)
+    unmatched = {cases_path: cases_report, deaths_path: deaths_report, census_path: census_report}
+    join_df = align(cases_rows, deaths_rows, census_df)
+    xmean = join_df[COVARIATES].mean()
+    if percap_dir is not None:
+        ids = read_cases([], ('County Name', 'State')).iloc[join_df['row']]
+        ids = ids.reset_index(drop=True).assign(key=join_df.index.to_numpy(), row=np.arange(len(join_df)))
+
+    totals = {}
+    for part, first in enumerate(range(0, len(dates), block_dates)):
+        block = dates[first:first + block_dates]
+        metrics = block_metrics(read_cases(block), read_deaths(block), join_df)
+        if part == 0:
+            ymean = metric_means(metrics)  # one shift for the whole series
+        for pair, sums in block_sums(metrics, join_df, xmean, ymean).items():
+            for k, v in sums.items():
+                totals.setdefault(pair, {}).setdefault(k, []).append(v)
+        if percap_dir is not None:
+            long_df = ids.iloc[np.tile(np.arange(len(ids)), len(block))].reset_index(drop=True)
+            long_df['date'] = np.repeat(np.array(block, dtype=object), len(ids))
+            for name in ('CasesPerCap', 'DeathsPerCap'):
+                long_df[name] = metrics[name].T.reshape(-1)
+            write_long(long_df, percap_dir, part)
+
+    frames = []
+    for (metric, cov), sums in totals.items():
+        sums = {k: np.concatenate(v) for k, v in sums.items()}
+        for window in windows:
+            frames.append(pd.DataFrame({'date': dates, 'metric': metric, 'covariate': cov,
+                                        'window': window, 'corr': window_corr(sums, window)}))
+    return pd.concat(frames, ignore_index=True), unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--cases", default="covid_confirmed_usafacts.csv")
+    parser.add_argument("-d", "--deaths", default="covid_deaths_usafacts.csv")
+    parser.add_argument("--census", default="acs2017_county_data.csv")
+    parser.add_argument("--store", action="store_true",
+                        help="--cases and --deaths are long stores made by usafacts.py")
+    parser.add_argument("--start", default=None, help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="last date, YYYY-MM-DD")
+    parser.add_argument("-w", "--windows", type=int, nargs="+", default=[1, 7, 28],
+                        help="rolling window lengths in dates (1 is the per-date correlation)")
+    parser.add_argument("-b", "--block-dates", type=int, default=120, help="dates held in memory at once")
+    parser.add_argument("-p", "--percap", default=None,
+                        help="write CasesPerCap/DeathsPerCap per county and date to this store")
+    parser.add_argument("-o", "--output", default="series_corr.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    corr, unmatched = series_metrics(args.cases, args.deaths, args.census, args.windows, args.start,
+                                     args.end, args.block_dates, args.store, args.percap)
+    for label, report in unmatched.items():
+        print_unmatched(report, label)
+    corr.to_csv(args.output, index=False)
+    print(f"{corr['date'].nunique():,} dates, {len(corr):,} correlations written to {args.output} "
+          f"in {time.perf_counter() - start:0.3f} seconds")
+
+    last = corr[corr['date'] == corr['date'].max()]
+    print(last.pivot_table(index=['window', 'metric'], columns='covariate', values='corr').round(3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# DataEng S25 - Data Integration: state name normalization
+# one lookup takes two-letter codes, full names and a few common variants of
+# the states, DC and the territories to the full name used by the census
+# (us_state_abbrev.py); columns are factorized first, so each distinct value
+# is looked up once per file instead of once per row, and values that do not
+# map are reported instead of turning into NaN join keys
+import numpy as np
+import pandas as pd
+
+from us_state_abbrev import us_state_to_abbrev
+
+ALIASES = {
+    'DC': ['D.C.', 'Washington DC', 'Washington D.C.', 'Washington, D.C.'],
+    'VI': ['Virgin Islands', 'U.S. Virgin Islands', 'US Virgin Islands'],
+    'MP': ['Northern Marianas'],
+    'UM': ['U.S. Minor Outlying Islands'],
+}
+
+
+# the form every lookup key is compared in: trimmed, single spaces, casefolded
+def lookup_key(text):
+    return ' '.join(str(text).split()).casefold()
+
+
+# lookup key -> full name, for codes, full names and ALIASES
+def build_lookup():
+    lookup = {}
+    for name, code in us_state_to_abbrev.items():
+        for text in [name, code] + ALIASES.get(code, []):
+            lookup[lookup_key(text)] = name
+    return lookup
+
+
+STATE_LOOKUP = build_lookup()
+
+
+# values mapped through mapper once per distinct value, as a categorical;
+# missing and unmapped (None) values come out missing
+# returns the categorical Series and the distinct values that did not map
+def map_distinct(values, mapper):
+    codes, uniques = pd.factorize(values)
+    mapped = pd.Index([mapper(u) for u in uniques], dtype=object)
+    categories = pd.Index(mapped.dropna().unique())
+    new_codes = categories.get_indexer(mapped)
+    out = pd.Categorical.from_codes(np.where(codes >= 0, new_codes[codes], -1), categories)
+    return pd.Series(out, index=values.index, name=values.name), uniques[new_codes < 0]
+
+
+# full state names of a column of codes and/or names
+# returns the names (categorical) and the distinct values that did not map
+def normalize_states(values):
+    return map_distinct(values, lambda v: STATE_LOOKUP.get(lookup_key(v)))
+
+
+# text values with surrounding whitespace removed, as a categorical
+def strip_names(values):
+    return map_distinct(values, str.strip)[0]
+
+
+# rows, and a few of the counties, of each state value that did not map;
+# empty when every non-missing value mapped
+def unmatched_states(raw, unmatched, counties=None, examples=3):
+    rows = raw[raw.isin(unmatched)]
+    report = pd.DataFrame({'rows': rows.value_counts()})
+    if counties is not None:
+        names = counties[rows.index].astype(str).groupby(rows).unique()
+        report['counties'] = names.map(lambda c: ', '.join(c[:examples]) + (', ...' if len(c) > examples else ''))
+    report.index.name = 'state'
+    return report
+
+
+# print the report of unmatched_states, if there is anything to report
+def print_unmatched(report, label):
+    if len(report):
+        print(f"{label}: {report['rows'].sum()} rows with a state that does not map; "
+              f"their county keys will not join")
+        print(report.to_string())
@@ -0,0 +1,49 @@
+# DataEng S25 - Data Integration: tests of the integer county keys
+#   python -m pytest test_county_join.py
+import pandas as pd
+
+from county_join import clean_usafacts, county_key
+from state_normalize import strip_names
+
+
+def test_county_key_is_int64_index_named_key():
+    key = county_key(pd.Series(['Lane County', 'Linn County']), pd.Series(['Oregon', 'Oregon']))
+    assert key.dtype == 'int64'
+    assert key.name == 'key'
+    assert len(key) == 2
+
+
+# equal "County, State" pairs get equal codes in any frame, order or run,
+# and surrounding whitespace does not count
+def test_county_key_is_the_same_for_equal_names():
+    first = county_key(pd.Series(['Lane County', ' Benton County ', 'Lane County']),
+                       pd.Series(['Oregon', 'Oregon ', 'Oregon']))
+    second = county_key(pd.Series(['Benton County', 'Lane County']), pd.Series(['Oregon', 'Oregon']))
+    assert first[0] == first[2] == second[1]
+    assert first[1] == second[0]
+
+
+def test_county_key_tells_counties_and_states_apart():
+    county = pd.Series(['Washington County'] * 3 + ['Lane County'])
+    state = pd.Series(['Oregon', 'Iowa', 'Utah', 'Oregon'])
+    assert county_key(county, state).is_unique
+
+
+# categorical columns, as strip_names and normalize_states make them, give the
+# same codes as plain strings
+def test_county_key_of_categoricals_matches_strings():
+    county = pd.Series(['Lane County', 'Linn County', 'Lane County'])
+    state = pd.Series(['Oregon', 'Oregon', 'Oregon'])
+    categorical = county_key(strip_names(county), state.astype('category'))
+    assert categorical.equals(county_key(county, state))
+
+
+# cases and census rows of the same county meet on the key after cleaning
+def test_clean_usafacts_keys_join_the_census():
+    cases = pd.DataFrame({'County Name': ['Lane County ', 'Statewide Unallocated', 'Polk County'],
+                          'State': ['OR', 'OR', 'Iowa'], '2023-07-23': [10, 1, 5]})
+    cleaned, unmatched = clean_usafacts(cases, rename={'2023-07-23': 'Cases'})
+    census_key = county_key(pd.Series(['Lane County', 'Polk County']), pd.Series(['Oregon', 'Iowa']))
+    assert list(cleaned.index) == list(census_key)
+    assert list(cleaned['Cases']) == [10, 5]
+    assert len(unmatched) == 0
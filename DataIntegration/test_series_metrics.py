@@ -0,0 +1,87 @@
+# DataEng S25 - Data Integration: tests of the whole-series correlations
+# a window of one date has to give the number data_integration.py gets from
+# integrate().corr() for that date; the tolerance is absolute since the
+# correlations are near 0, and sums of uncentred counts miss it by about 1e-6
+#   python -m pytest test_series_metrics.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from county_join import clean_usafacts, integrate, load_census
+from series_metrics import COVARIATES, series_metrics
+from usafacts import read_usafacts
+
+pytest.importorskip('pyarrow')
+
+STATES = [('OR', 'Oregon', 41), ('IA', 'Iowa', 19), ('TX', 'Texas', 48)]
+METRICS = ['Cases', 'Deaths', 'CasesPerCap', 'DeathsPerCap']
+
+
+# a census csv and USAFacts cases/deaths csvs of `counties` counties over
+# `days` dates; counts are cumulative, large, and close to each other, so
+# their squares are far bigger than their spread; deaths leave some cells
+# blank and one census county has no USAFacts rows
+def write_files(path, counties=60, days=40, seed=5):
+    rng = np.random.default_rng(seed)
+    places = [(f'County {i} County', STATES[i % 3]) for i in range(counties)]
+    pd.DataFrame({
+        'County': [county for county, _ in places] + ['Lonely County'],
+        'State': [state for _, (_, state, _) in places] + ['Oregon'],
+        'TotalPop': rng.integers(5_000, 2_000_000, counties + 1),
+        'IncomePerCap': rng.integers(20_000, 60_000, counties + 1),
+        'Poverty': rng.uniform(5, 30, counties + 1).round(1),
+        'Unemployment': rng.uniform(2, 12, counties + 1).round(1),
+    }).to_csv(path / 'census.csv', index=False)
+
+    dates = pd.date_range('2022-01-01', periods=days).strftime('%Y-%m-%d')
+    for name, base, blank in [('cases', 5e6, 0.0), ('deaths', 8e4, 0.05)]:
+        growth = np.cumsum(rng.integers(0, 40, (counties + 1, days)), axis=1)
+        counts = pd.DataFrame(base + growth, columns=dates).astype('Int64')
+        counts = counts.mask(rng.random(counts.shape) < blank)
+        ids = pd.DataFrame({
+            'countyFIPS': np.arange(counties + 1),
+            'County Name': [f' {county} ' for county, _ in places] + ['Statewide Unallocated'],
+            'State': [abbrev for _, (abbrev, _, _) in places] + ['OR'],
+            'StateFIPS': [fips for _, (_, _, fips) in places] + [41],
+        })
+        pd.concat([ids, counts], axis=1).to_csv(path / f'{name}.csv', index=False)
+    return list(dates)
+
+
+def test_window_of_one_matches_integrate_corr(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dates = write_files(tmp_path)
+    corr, unmatched = series_metrics('cases.csv', 'deaths.csv', 'census.csv', windows=(1,), block_dates=7)
+    assert all(len(report) == 0 for report in unmatched.values())
+    corr = corr.set_index(['date', 'metric', 'covariate'])['corr']
+
+    census_df, _ = load_census('census.csv')
+    for date in dates[::9] + dates[-1:]:
+        cases_df, _ = clean_usafacts(read_usafacts('cases.csv', dates=[date]), rename={date: 'Cases'})
+        deaths_df, _ = clean_usafacts(read_usafacts('deaths.csv', dates=[date]), rename={date: 'Deaths'})
+        expected = integrate(cases_df, deaths_df, census_df).astype({'Cases': 'float64', 'Deaths': 'float64'})
+        expected = expected.corr(numeric_only=True)
+        for metric in METRICS:
+            for cov in COVARIATES:
+                assert corr[date, metric, cov] == pytest.approx(expected.loc[metric, cov], abs=1e-9), \
+                    (date, metric, cov)
+
+
+# a window pools every (county, date) pair of its dates, across blocks
+def test_rolling_window_pools_its_dates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dates = write_files(tmp_path, days=12)
+    corr, _ = series_metrics('cases.csv', 'deaths.csv', 'census.csv', windows=(1, 5), block_dates=4)
+    five = corr[corr['window'] == 5].set_index(['date', 'metric', 'covariate'])['corr']
+    assert np.isnan(five[dates[3], 'Cases', 'Poverty'])  # no full window yet
+
+    census_df, _ = load_census('census.csv')
+    frames = []
+    for date in dates[2:7]:
+        cases_df, _ = clean_usafacts(read_usafacts('cases.csv', dates=[date]), rename={date: 'Cases'})
+        deaths_df, _ = clean_usafacts(read_usafacts('deaths.csv', dates=[date]), rename={date: 'Deaths'})
+        frames.append(integrate(cases_df, deaths_df, census_df))
+    pooled = pd.concat(frames).astype({'Cases': 'float64', 'Deaths': 'float64'})
+    for metric in METRICS:
+        expected = pooled[[metric, 'Unemployment']].corr().iloc[0, 1]
+        assert five[dates[6], metric, 'Unemployment'] == pytest.approx(expected, abs=1e-9)
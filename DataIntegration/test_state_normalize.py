@@ -0,0 +1,48 @@
+# DataEng S25 - Data Integration: tests of the state name lookup
+#   python -m pytest test_state_normalize.py
+import pandas as pd
+
+from county_join import normalize_places
+from state_normalize import normalize_states, print_unmatched, strip_names, unmatched_states
+
+
+def test_codes_names_and_aliases_map_to_census_names():
+    raw = pd.Series(['OR', 'or', ' Oregon ', 'OREGON', 'Washington  D.C.', 'D.C.', 'DC',
+                     'US Virgin Islands', 'Northern Marianas', None])
+    names, unmatched = normalize_states(raw)
+    assert list(names[:9]) == ['Oregon'] * 4 + ['District of Columbia'] * 3 + \
+        ['Virgin Islands, U.S.', 'Northern Mariana Islands']
+    assert pd.isna(names[9])
+    assert len(unmatched) == 0
+    assert names.dtype == 'category'
+
+
+# unknown states come out missing and are reported with their rows and a few
+# of their counties, instead of failing or joining silently on NaN keys
+def test_unknown_states_are_reported():
+    df = pd.DataFrame({'County Name': ['Lane County', 'Polk County', 'Story County', 'Linn County',
+                                       'Cass County', 'Clay County', 'Knox County'],
+                       'State': ['OR', 'Iowa', 'Iwoa', 'Iwoa', 'XX', 'Iwoa', 'Iwoa']})
+    normalized, report = normalize_places(df, 'County Name')
+    assert list(normalized['State'].isna()) == [False, False, True, True, True, True, True]
+    assert report.loc['Iwoa', 'rows'] == 4
+    assert report.loc['Iwoa', 'counties'] == 'Story County, Linn County, Clay County, ...'
+    assert report.loc['XX'].to_dict() == {'rows': 1, 'counties': 'Cass County'}
+
+
+def test_nothing_to_report_prints_nothing(capsys):
+    raw = pd.Series(['OR', 'IA'])
+    _, unmatched = normalize_states(raw)
+    print_unmatched(unmatched_states(raw, unmatched), 'cases')
+    assert capsys.readouterr().out == ''
+
+    raw = pd.Series(['OR', 'Oregn'])
+    _, unmatched = normalize_states(raw)
+    print_unmatched(unmatched_states(raw, unmatched), 'cases')
+    assert capsys.readouterr().out.startswith('cases: 1 rows with a state that does not map')
+
+
+def test_strip_names_is_categorical_and_stripped():
+    names = strip_names(pd.Series([' Lane County', 'Lane County ', 'Polk County']))
+    assert list(names) == ['Lane County', 'Lane County', 'Polk County']
+    assert list(names.cat.categories) == ['Lane County', 'Polk County']
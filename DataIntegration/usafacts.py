@@ -0,0 +1,138 @@
+# DataEng S25 - Data Integration: USAFacts time series ingest
+# the USAFacts files are wide, one column per day; this reads only the date
+# columns asked for, as narrow integers, or converts a file once into a long
+# Parquet store partitioned by date so later reads touch only those dates
+#   python usafacts.py -i covid_confirmed_usafacts.csv -o usafacts_cases --value Cases
+# run it with -h to see the command line options
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS = ['countyFIPS', 'County Name', 'State', 'StateFIPS']
+ID_TYPES = {'countyFIPS': 'int32', 'County Name': 'str', 'State': 'str', 'StateFIPS': 'int16'}
+VALUE_TYPE = 'Int32'  # cumulative counts; nullable in case a day is blank
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+# the date columns of a USAFacts file, in file order
+def file_dates(path):
+    return [c for c in pd.read_csv(path, nrows=0).columns if DATE_RE.match(c)]
+
+
+# date columns picked by an explicit list and/or an inclusive start..end range
+# (YYYY-MM-DD strings); no selection picks every date
+def select_dates(dates, pick=None, start=None, end=None):
+    chosen = [d for d in dates if (start is None or d >= start) and (end is None or d <= end)]
+    if pick is not None:
+        missing = sorted(set(pick) - set(dates))
+        if missing:
+            raise ValueError(f"dates not in the file: {missing}")
+        chosen = [d for d in chosen if d in set(pick)]
+    return chosen
+
+
+# the id columns plus only the selected date columns of a USAFacts file,
+# every date as VALUE_TYPE
+def read_usafacts(path, dates=None, start=None, end=None, id_columns=('County Name', 'State')):
+    columns = list(id_columns) + select_dates(file_dates(path), dates, start, end)
+    dtype = {c: ID_TYPES.get(c, VALUE_TYPE) for c in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtype)[columns]
+
+
+def _date_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+
+# convert a wide USAFacts file into a long Parquet store, one date=<YYYY-MM-DD>
+# partition per day with one row per county (row is its line in the wide file);
+# dates are read block_dates columns at a time so memory stays at one block
+# returns the number of rows written
+def to_long_store(path, outdir, value='value', block_dates=120):
+    ids = pd.read_csv(path, usecols=ID_COLUMNS, dtype=ID_TYPES)[ID_COLUMNS]
+    ids.insert(0, 'row', np.arange(len(ids), dtype='int32'))
+    dates = file_dates(path)
+    total = 0
+    for part, first in enumerate(range(0, len(dates), block_dates)):
+        block = dates[first:first + block_dates]
+        wide = pd.read_csv(path, usecols=block, dtype={d: VALUE_TYPE for d in block})[block]
+        long_df = ids.iloc[np.tile(np.arange(len(ids)), len(block))].reset_index(drop=True)
+        long_df[value] = pd.array(wide.to_numpy().T.reshape(-1), dtype=VALUE_TYPE)
+        long_df['date'] = np.repeat(np.array(block, dtype=object), len(ids))
+        write_long(long_df, outdir, part)
+        total += len(long_df)
+    return total
+
+
+# write a long frame (with a date column) to a date-partitioned store; the
+# partitions of its dates are replaced, so every row of a date must come in
+# one call (other dates are left alone); part keeps the file names of
+# successive blocks apart
+def write_long(long_df, outdir, part):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    ds.write_dataset(
+        pa.Table.from_pandas(long_df, preserve_index=False),
+        outdir,
+        format='parquet',
+        partitioning=_date_partitioning(),
+        basename_template=f'part-{part}-{{i}}.parquet',
+        existing_data_behavior='delete_matching',
+        max_partitions=long_df['date'].nunique() + 1,
+    )
+
+
+# dates held by a long store
+def store_dates(outdir):
+    return sorted(name[5:] for name in os.listdir(outdir) if name.startswith('date='))
+
+
+# rows of a long store for the chosen dates only (list and/or inclusive range);
+# the date directories are picked by name so no other partition is opened
+def read_long(outdir, dates=None, start=None, end=None, columns=None):
+    import pyarrow.dataset as ds
+
+    files = []
+    for date in select_dates(store_dates(outdir), dates, start, end):
+        part = os.path.join(outdir, f'date={date}')
+        files += sorted(os.path.join(part, name) for name in os.listdir(part))
+    dataset = ds.dataset(files, format='parquet', partitioning=_date_partitioning(),
+                         partition_base_dir=outdir)
+    return dataset.to_table(columns=columns).to_pandas()
+
+
+# the same frame read_usafacts gives (id columns plus one column per date)
+# rebuilt from a long store
+def read_long_wide(outdir, value='value', dates=None, start=None, end=None,
+                   id_columns=('County Name', 'State')):
+    long_df = read_long(outdir, dates, start, end, columns=['row', *id_columns, 'date', value])
+    wide = long_df.pivot(index='row', columns='date', values=value)
+    wide.columns.name = None
+    ids = long_df.drop_duplicates('row').set_index('row')[list(id_columns)]
+    wide = ids.join(wide).sort_index()
+    wide.index.name = None
+    return wide.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", required=True, help="wide USAFacts csv file")
+    parser.add_argument("-o", "--outdir", required=True, help="long, date-partitioned Parquet store")
+    parser.add_argument("--value", default="value", help="name of the value column, e.g. Cases")
+    parser.add_argument("-b", "--block-dates", type=int, default=120,
+                        help="date columns converted per pass")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = to_long_store(args.input, args.outdir, args.value, args.block_dates)
+    print(f"{rows:,} rows written to {args.outdir} in {time.perf_counter() - start:0.3f} seconds")
+
+
+if __name__ == "__main__":
+    main()
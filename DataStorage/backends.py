@@ -0,0 +1,205 @@
+# DataEng S25 - Data Storage: pluggable storage backends for census loads
+# every backend runs the same create / load / index / validate steps
+#   backend = make_backend("sqlite", "censusdata", Schema, dbfile="censusdata.sqlite")
+#   backend.create_table(); backend.load("acs2017_census_tract_data.csv")
+#   backend.add_indexes(); print(backend.validate())
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+
+from db import Database
+from load_inserts import (ValidateQueries, add_indexes_constraints, createTable,
+                          load_copy_stream, transform_rows)
+
+# Schema types in each embedded engine
+SQLITE_TYPES = {'TEXT': 'TEXT', 'SMALLINT': 'INTEGER', 'INTEGER': 'INTEGER', 'BIGINT': 'INTEGER',
+                'DECIMAL': 'REAL', 'NUMERIC': 'INTEGER', 'REAL': 'REAL', 'DOUBLE PRECISION': 'REAL'}
+DUCKDB_TYPES = {'TEXT': 'VARCHAR', 'SMALLINT': 'SMALLINT', 'INTEGER': 'INTEGER', 'BIGINT': 'BIGINT',
+                'DECIMAL': 'DOUBLE', 'NUMERIC': 'BIGINT', 'REAL': 'REAL', 'DOUBLE PRECISION': 'DOUBLE'}
+
+# faster bulk loads at the cost of durability, which a reloadable copy does not need
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",  # 256 MB
+]
+
+
+def _create_sql(types, table, schema):
+    columns = ",\n".join(f"    {name:<20}{types[sqltype]}" for name, sqltype in schema)
+    return f"CREATE TABLE {table} (\n{columns}\n)"
+
+
+# create / load / index / validate steps of one storage engine, for the
+# table `table` with columns and types `schema` ([(column, type)], see
+# load_inserts.Schema); both are given by the caller rather than read from
+# load_inserts, whose globals initialize() may have changed in another copy
+class Backend(ABC):
+    name = None
+
+    def __init__(self, table, schema):
+        self.table = table
+        self.schema = list(schema)
+
+    # ValidateQueries run against this backend's table
+    def queries(self):
+        return {label: sql.replace("censusdata", self.table) for label, sql in ValidateQueries.items()}
+
+    # (re)create the empty table
+    @abstractmethod
+    def create_table(self):
+        pass
+
+    # load an ACS csv file, returns the number of rows loaded
+    @abstractmethod
+    def load(self, fname, zerofill=False):
+        pass
+
+    # TractId key and State index
+    @abstractmethod
+    def add_indexes(self):
+        pass
+
+    # run the validate queries, returns {label: (answer, seconds)}
+    @abstractmethod
+    def validate(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Postgres through the connection pool and the streaming COPY loader
+class PostgresBackend(Backend):
+    name = "postgres"
+
+    def __init__(self, table, schema, config=None, chunk_rows=50000):
+        super().__init__(table, schema)
+        self.db = Database(config)
+        self.chunk_rows = chunk_rows
+
+    def create_table(self):
+        with self.db.connection() as conn:
+            createTable(conn, self.schema, self.table)
+
+    def load(self, fname, zerofill=False):
+        with self.db.connection() as conn:
+            return load_copy_stream(conn, fname, self.chunk_rows, zerofill,
+                                    table=self.table, schema=self.schema)
+
+    def add_indexes(self):
+        with self.db.connection() as conn:
+            add_indexes_constraints(conn, self.table)
+
+    def validate(self):
+        return {label: (rows[0][0], elapsed)
+                for label, (rows, elapsed) in self.db.run_queries(self.queries()).items()}
+
+    def close(self):
+        self.db.close()
+
+
+# SQLite file database; typed rows are inserted with executemany in a
+# single transaction with journaling and syncs turned off
+class SQLiteBackend(Backend):
+    name = "sqlite"
+
+    def __init__(self, table, schema, dbfile="censusdata.sqlite"):
+        super().__init__(table, schema)
+        self.conn = sqlite3.connect(dbfile, isolation_level=None)
+        for pragma in SQLITE_PRAGMAS:
+            self.conn.execute(pragma)
+
+    def create_table(self):
+        self.conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.conn.execute(_create_sql(SQLITE_TYPES, self.table, self.schema))
+
+    def load(self, fname, zerofill=False):
+        placeholders = ", ".join("?" * len(self.schema))
+        before = self.conn.execute(f"SELECT count(*) FROM {self.table}").fetchone()[0]
+        self.conn.execute("BEGIN")
+        try:
+            # values arrive as text; the column types convert them to numbers
+            self.conn.executemany(f"INSERT INTO {self.table} VALUES ({placeholders})",
+                                  transform_rows(fname, zerofill, schema=self.schema))
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return self.conn.execute(f"SELECT count(*) FROM {self.table}").fetchone()[0] - before
+
+    def add_indexes(self):
+        self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table}_TractId ON {self.table}(TractId)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_State ON {self.table}(State)")
+        self.conn.execute("ANALYZE")
+
+    def validate(self):
+        results = {}
+        for label, sql in self.queries().items():
+            start = time.perf_counter()
+            answer = self.conn.execute(sql).fetchone()[0]
+            results[label] = (answer, time.perf_counter() - start)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+# DuckDB file database; the csv file is read by DuckDB's own parallel reader
+# with the column types given up front, so empty fields load as NULL
+class DuckDBBackend(Backend):
+    name = "duckdb"
+
+    def __init__(self, table, schema, dbfile="censusdata.duckdb"):
+        super().__init__(table, schema)
+        import duckdb
+        self.conn = duckdb.connect(dbfile)
+
+    def create_table(self):
+        self.conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+        self.conn.execute(_create_sql(DUCKDB_TYPES, self.table, self.schema))
+
+    def load(self, fname, zerofill=False):
+        columns = ", ".join(f"'{name}': '{DUCKDB_TYPES[sqltype]}'" for name, sqltype in self.schema)
+        if zerofill:
+            select = ", ".join(name if sqltype == 'TEXT' else f"coalesce({name}, 0)"
+                               for name, sqltype in self.schema)
+        else:
+            select = "*"
+        rows = self.conn.execute(f"""
+            INSERT INTO {self.table}
+            SELECT {select} FROM read_csv(?, header = true, columns = {{{columns}}})
+        """, [fname]).fetchone()[0]
+        return rows
+
+    def add_indexes(self):
+        self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table}_TractId ON {self.table}(TractId)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_State ON {self.table}(State)")
+
+    def validate(self):
+        results = {}
+        for label, sql in self.queries().items():
+            start = time.perf_counter()
+            answer = self.conn.execute(sql).fetchone()[0]
+            results[label] = (answer, time.perf_counter() - start)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+    "duckdb": DuckDBBackend,
+}
+
+
+# a backend by name for `table` with columns `schema`; dbfile is used by the
+# embedded engines, config by Postgres
+def make_backend(name, table, schema, dbfile=None, config=None):
+    if name == "postgres":
+        return PostgresBackend(table, schema, config)
+    cls = BACKENDS[name]
+    return cls(table, schema, dbfile) if dbfile else cls(table, schema)
@@ -0,0 +1,68 @@
+# DataEng S25 - Data Storage: storage backend benchmark
+# loads the same ACS csv file into each backend and compares load, index and
+# query times; Postgres settings come from the same options/env as load_inserts.py
+# run it with -h to see the command line options
+import argparse
+import os
+import tempfile
+import time
+
+from backends import BACKENDS, make_backend
+from db import add_db_arguments, db_config
+from load_inserts import Schema, TableName
+
+
+def bench(name, fname, dbfile, config, repeat):
+    backend = make_backend(name, TableName, Schema, dbfile, config)
+    try:
+        backend.create_table()
+        start = time.perf_counter()
+        rows = backend.load(fname)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        backend.add_indexes()
+        index_time = time.perf_counter() - start
+
+        # best of `repeat` runs of each validate query
+        query_times = {}
+        for _ in range(repeat):
+            for label, (_answer, elapsed) in backend.validate().items():
+                query_times[label] = min(elapsed, query_times.get(label, elapsed))
+    finally:
+        backend.close()
+    return rows, load_time, index_time, query_times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--datafile", required=True)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="runs of each query; the fastest one is reported")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the sqlite/duckdb files in the current directory")
+    add_db_arguments(parser)
+    args = parser.parse_args()
+    config = db_config(args)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        outdir = "." if args.keep else tmpdir
+        results = []
+        for name in args.backends:
+            dbfile = os.path.join(outdir, f"censusdata.{name}")
+            if os.path.exists(dbfile):
+                os.remove(dbfile)
+            try:
+                results.append((name, *bench(name, args.datafile, dbfile, config, args.repeat)))
+            except Exception as e:
+                print(f"{name}: skipped ({type(e).__name__}: {e})")
+
+    print(f"\n{'backend':<10} {'rows':>10} {'load s':>9} {'rows/sec':>12} {'index s':>9}  query ms (best of {args.repeat})")
+    for name, rows, load_time, index_time, query_times in results:
+        queries = "  ".join(f"{elapsed * 1000:7.2f}" for elapsed in query_times.values())
+        print(f"{name:<10} {rows:>10,} {load_time:9.3f} {rows / load_time:12,.0f} {index_time:9.3f}  {queries}")
+
+
+if __name__ == "__main__":
+    main()
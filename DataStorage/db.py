@@ -0,0 +1,110 @@
+# DataEng S25 - Data Storage: pooled Postgres access
+# connection settings come from the command line, then the standard libpq
+# environment variables (PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD),
+# then the lab defaults
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.pool
+
+DEFAULTS = {
+    'host': 'localhost',
+    'port': '5432',
+    'dbname': 'postgres',
+    'user': 'postgres',
+    'password': 'coding',
+}
+ENV_VARS = {
+    'host': 'PGHOST',
+    'port': 'PGPORT',
+    'dbname': 'PGDATABASE',
+    'user': 'PGUSER',
+    'password': 'PGPASSWORD',
+}
+
+
+# add --host/--port/--dbname/--user/--password to an argparse parser
+def add_db_arguments(parser):
+    group = parser.add_argument_group("database", "defaults come from PGHOST, PGPORT, "
+                                      "PGDATABASE, PGUSER and PGPASSWORD")
+    for key in DEFAULTS:
+        group.add_argument(f"--{key}", default=None)
+    return parser
+
+
+# connection settings from parsed arguments (if any), the environment and DEFAULTS
+def db_config(args=None):
+    config = {}
+    for key, default in DEFAULTS.items():
+        value = getattr(args, key, None) if args is not None else None
+        config[key] = value or os.environ.get(ENV_VARS[key]) or default
+    return config
+
+
+# a plain autocommit connection outside any pool, e.g. for a worker process
+def connect(config):
+    conn = psycopg2.connect(**config)
+    conn.autocommit = True
+    return conn
+
+
+# a thread-safe connection pool that runs queries concurrently and keeps the
+# latency of every query it runs
+#   db = Database(db_config(args))
+#   results = db.run_queries({"states": "select count(distinct state) from censusdata"})
+class Database:
+    def __init__(self, config=None, minconn=1, maxconn=4):
+        self.config = config or db_config()
+        self.maxconn = maxconn
+        self.pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **self.config)
+        # callers wait here instead of getting PoolError when every connection is out
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.timings = []  # (label, seconds) of every query run through query()
+
+    # borrow a pooled connection; it is rolled back if left inside a failed
+    # transaction and returned to the pool afterwards
+    @contextmanager
+    def connection(self, autocommit=True):
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                conn.autocommit = autocommit
+                yield conn
+            finally:
+                if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+                self.pool.putconn(conn)
+
+    # run one statement on a pooled connection; returns its rows (None if it
+    # returns none) and the seconds it took, which are also kept in timings
+    def query(self, sql, params=None, label=None):
+        with self.connection() as conn, conn.cursor() as cursor:
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description is not None else None
+            elapsed = time.perf_counter() - start
+        self.timings.append((label or sql, elapsed))
+        return rows, elapsed
+
+    # run {label: sql or (sql, params)} concurrently, one pooled connection per
+    # query in flight; returns {label: (rows, seconds)} in the given order
+    def run_queries(self, queries, workers=None):
+        workers = min(workers or self.maxconn, self.maxconn, max(len(queries), 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for label, query in queries.items():
+                sql, params = query if isinstance(query, tuple) else (query, None)
+                futures[label] = pool.submit(self.query, sql, params, label)
+            return {label: future.result() for label, future in futures.items()}
+
+    # per-query latencies collected so far
+    def report(self):
+        for label, elapsed in self.timings:
+            print(f"{elapsed * 1000:10.1f} ms  {label}")
+
+    def close(self):
+        self.pool.closeall()
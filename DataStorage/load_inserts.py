@@ -1,19 +1,80 @@
 # Vlad Chevdar | DataEng S25 - Data Storage Lab Assignment
-# this program loads Census ACS data using basic, slow INSERTs 
+# this program loads Census ACS data using basic, slow INSERTs, batched
+# parameterized INSERTs or COPY
 # run it with -h to see the command line options
 
 import time
+from decimal import Decimal
 import psycopg2
+import psycopg2.extras
 import argparse
 import re
 import csv
+import hashlib
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 
-DBname = "postgres"
-DBuser = "postgres"
-DBpwd = "coding"
+from db import Database, add_db_arguments, connect, db_config
+
+DBConfig = db_config()  # connection settings, see db.py
 TableName = 'censusdata'
+HashTable = f'{TableName}_hashes'  # TractId -> content hash of the loaded row, for incremental loads
 Datafile = "filedoesnotexist"  # name of the data file to be loaded
 CreateDB = False  # indicates whether the DB table should be (re)-created
+LoadMode = "copy"  # rows, batched or copy
+PageSize = 1000  # rows per multi-row INSERT in batched mode
+Benchmark = False  # time every load strategy instead of loading once
+BenchRows = 10000  # rows given to the slow per-row strategy when benchmarking
+
+ChunkRows = 50000  # rows per in-memory COPY chunk
+ZeroFill = False  # load empty numeric values as 0 (like row2vals) instead of NULL
+Workers = None  # worker processes in parallel mode, None for one per CPU
+BackendName = "postgres"  # postgres, or an embedded engine from backends.py
+DBFile = None  # database file of an embedded backend
+
+# censusdata columns and their SQL types, in table and csv file order
+Schema = [
+	('TractId', 'NUMERIC'),
+	('State', 'TEXT'),
+	('County', 'TEXT'),
+	('TotalPop', 'INTEGER'),
+	('Men', 'INTEGER'),
+	('Women', 'INTEGER'),
+	('Hispanic', 'DECIMAL'),
+	('White', 'DECIMAL'),
+	('Black', 'DECIMAL'),
+	('Native', 'DECIMAL'),
+	('Asian', 'DECIMAL'),
+	('Pacific', 'DECIMAL'),
+	('VotingAgeCitizen', 'DECIMAL'),
+	('Income', 'DECIMAL'),
+	('IncomeErr', 'DECIMAL'),
+	('IncomePerCap', 'DECIMAL'),
+	('IncomePerCapErr', 'DECIMAL'),
+	('Poverty', 'DECIMAL'),
+	('ChildPoverty', 'DECIMAL'),
+	('Professional', 'DECIMAL'),
+	('Service', 'DECIMAL'),
+	('Office', 'DECIMAL'),
+	('Construction', 'DECIMAL'),
+	('Production', 'DECIMAL'),
+	('Drive', 'DECIMAL'),
+	('Carpool', 'DECIMAL'),
+	('Transit', 'DECIMAL'),
+	('Walk', 'DECIMAL'),
+	('OtherTransp', 'DECIMAL'),
+	('WorkAtHome', 'DECIMAL'),
+	('MeanCommute', 'DECIMAL'),
+	('Employed', 'INTEGER'),
+	('PrivateWork', 'DECIMAL'),
+	('PublicWork', 'DECIMAL'),
+	('SelfEmployed', 'DECIMAL'),
+	('FamilyWork', 'DECIMAL'),
+	('Unemployment', 'DECIMAL'),
+]
+Columns = [name for name, _ in Schema]
 
 def row2vals(row):
 	for key in row:
@@ -63,28 +124,98 @@ def row2vals(row):
 
 	return ret
 
+# convert a data row into a tuple of query parameters in table column order
+# empty values become NULL and psycopg2 does the quoting, so County is kept as is
+def row2params(row):
+	return tuple(row[col] if row[col] else None for col in Columns)
+
 
 def initialize():
   parser = argparse.ArgumentParser()
   parser.add_argument("-d", "--datafile", required=True)
   parser.add_argument("-c", "--createtable", action="store_true")
+  parser.add_argument("-m", "--mode",
+                      choices=["rows", "batched", "copy", "copyfrom", "parallel", "incremental"],
+                      default="copy",
+                      help="per-row INSERTs, batched parameterized INSERTs, streaming COPY, "
+                           "COPY of the raw file (breaks on quoted commas), parallel COPY "
+                           "through a staging table (always recreates the table) or an "
+                           "upsert of only the new and changed rows")
+  parser.add_argument("-w", "--workers", type=int, default=None,
+                      help="worker processes in parallel mode (default: one per CPU)")
+  parser.add_argument("-p", "--pagesize", type=int, default=1000,
+                      help="rows per multi-row INSERT in batched mode")
+  parser.add_argument("-b", "--benchmark", action="store_true",
+                      help="load the file with every strategy and report rows/sec")
+  parser.add_argument("--benchrows", type=int, default=10000,
+                      help="rows given to the slow per-row strategy when benchmarking")
+  parser.add_argument("--chunkrows", type=int, default=50000,
+                      help="rows per in-memory chunk in copy mode")
+  parser.add_argument("-z", "--zerofill", action="store_true",
+                      help="load empty numeric values as 0 instead of NULL")
+  parser.add_argument("--backend", choices=["postgres", "sqlite", "duckdb"], default="postgres",
+                      help="storage engine; sqlite and duckdb load into --dbfile and "
+                           "ignore the mode options")
+  parser.add_argument("--dbfile", default=None,
+                      help="database file of the sqlite/duckdb backends "
+                           "(default: censusdata.sqlite / censusdata.duckdb)")
+  parser.add_argument("-i", "--inferschema", action="store_true",
+                      help="create the table with the narrowest types that fit the data "
+                           "(see schema_infer.py) instead of the DECIMAL schema")
+  parser.add_argument("--samplerows", type=int, default=None,
+                      help="infer the schema from this many randomly picked rows "
+                           "instead of the whole file; columns that are whole numbers "
+                           "in the sample keep their DECIMAL schema type and decimal "
+                           "columns become DOUBLE PRECISION")
+  add_db_arguments(parser)
   args = parser.parse_args()
 
+  global DBConfig
+  DBConfig = db_config(args)
   global Datafile
   Datafile = args.datafile
   global CreateDB
   CreateDB = args.createtable
+  global LoadMode
+  LoadMode = args.mode
+  global PageSize
+  PageSize = args.pagesize
+  global Benchmark
+  Benchmark = args.benchmark
+  global BenchRows
+  BenchRows = args.benchrows
+  global ChunkRows
+  ChunkRows = args.chunkrows
+  global ZeroFill
+  ZeroFill = args.zerofill
+  global Workers
+  Workers = args.workers
+  global BackendName
+  BackendName = args.backend
+  global DBFile
+  DBFile = args.dbfile
+  if args.inferschema:
+    from schema_infer import infer_schema
+    global Schema, Columns
+    Schema = infer_schema(Datafile, args.samplerows)
+    Columns = [name for name, _ in Schema]
 
-def validate(conn):
-    with conn.cursor() as cursor:
-        cursor.execute("select count(distinct state) from censusdata;")
-        print("Number of states:", cursor.fetchone()[0])
-
-        cursor.execute("select count(distinct county) from censusdata where state = 'Oregon';")
-        print("Number of counties in Oregon:", cursor.fetchone()[0])
+# check queries run after every load, by label
+ValidateQueries = {
+    "Number of states":
+        "select count(distinct state) from censusdata;",
+    "Number of counties in Oregon":
+        "select count(distinct county) from censusdata where state = 'Oregon';",
+    "Number of counties in Iowa":
+        "select count(distinct county) from censusdata where state = 'Iowa';",
+}
 
-        cursor.execute("select count(distinct county) from censusdata where state = 'Iowa';")
-        print("Number of counties in Iowa:", cursor.fetchone()[0])
+# run the check queries concurrently over the connection pool and print
+# their answers with each query's latency
+def validate(db):
+    results = db.run_queries(ValidateQueries)
+    for label, (rows, elapsed) in results.items():
+        print(f"{label}: {rows[0][0]}  ({elapsed * 1000:.1f} ms)")
 
 
 # read the input data file into a list of row strings
@@ -109,65 +240,28 @@ def getSQLcmnds(rowlist):
 	return cmdlist
 
 # connect to the database
-def dbconnect():
-	connection = psycopg2.connect(
-		host="localhost",
-		database=DBname,
-		user=DBuser,
-		password=DBpwd,
-	)
-	connection.autocommit = True
-	return connection
+def dbconnect(config=None):
+	return connect(config or DBConfig)
+
+# DROP/CREATE statements for a table with the censusdata Schema (or another schema)
+def table_ddl(table, unlogged=False, schema=None):
+	columns = ",\n".join(f"\t\t\t{name:<20}{sqltype}" for name, sqltype in schema or Schema)
+	return f"""
+		DROP TABLE IF EXISTS {table};
+		CREATE {'UNLOGGED ' if unlogged else ''}TABLE {table} (
+{columns}
+		);
+	"""
 
 # create the target table 
 # assumes that conn is a valid, open connection to a Postgres database
-def createTable(conn):
+def createTable(conn, schema=None, table=TableName):
 
 	with conn.cursor() as cursor:
-		cursor.execute(f"""
-			DROP TABLE IF EXISTS {TableName};
-			CREATE TABLE {TableName} (
-				TractId             NUMERIC,
-				State               TEXT,
-				County              TEXT,
-				TotalPop            INTEGER,
-				Men                 INTEGER,
-				Women               INTEGER,
-				Hispanic            DECIMAL,
-				White               DECIMAL,
-				Black               DECIMAL,
-				Native              DECIMAL,
-				Asian               DECIMAL,
-				Pacific             DECIMAL,
-				VotingAgeCitizen    DECIMAL,
-				Income              DECIMAL,
-				IncomeErr           DECIMAL,
-				IncomePerCap        DECIMAL,
-				IncomePerCapErr     DECIMAL,
-				Poverty             DECIMAL,
-				ChildPoverty        DECIMAL,
-				Professional        DECIMAL,
-				Service             DECIMAL,
-				Office              DECIMAL,
-				Construction        DECIMAL,
-				Production          DECIMAL,
-				Drive               DECIMAL,
-				Carpool             DECIMAL,
-				Transit             DECIMAL,
-				Walk                DECIMAL,
-				OtherTransp         DECIMAL,
-				WorkAtHome          DECIMAL,
-				MeanCommute         DECIMAL,
-				Employed            INTEGER,
-				PrivateWork         DECIMAL,
-				PublicWork          DECIMAL,
-				SelfEmployed        DECIMAL,
-				FamilyWork          DECIMAL,
-				Unemployment        DECIMAL
-			);	
-		""")
-
-		print(f"Created {TableName}")
+		cursor.execute(table_ddl(table, schema=schema))
+		cursor.execute(f"DROP TABLE IF EXISTS {table}_hashes;")  # its hashes describe the old rows
+
+		print(f"Created {table}")
 
 def load(conn, icmdlist):
 
@@ -181,6 +275,26 @@ def load(conn, icmdlist):
 		elapsed = time.perf_counter() - start
 		print(f'Finished Loading. Elapsed Time: {elapsed:0.4} seconds')
 
+# load the rows with multi-row parameterized INSERTs, page_size rows per
+# statement, inside one explicit transaction that is rolled back on error
+def load_batched(conn, rowlist, page_size=1000):
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn, conn.cursor() as cursor:
+            print(f"Loading {len(rowlist)} rows in pages of {page_size}")
+            start = time.perf_counter()
+            psycopg2.extras.execute_values(
+                cursor,
+                f"INSERT INTO {TableName} VALUES %s",
+                (row2params(row) for row in rowlist),
+                page_size=page_size,
+            )
+        elapsed = time.perf_counter() - start
+        print(f'Finished Loading. Elapsed Time: {elapsed:0.4} seconds')
+    finally:
+        conn.autocommit = autocommit
+
 def load_with_copy_from(conn, csv_file):
     with conn.cursor() as cursor:
         with open(csv_file, 'r') as f:
@@ -194,26 +308,401 @@ def load_with_copy_from(conn, csv_file):
             )
         print("Data loaded using copy_from().")
 
-def add_indexes_constraints(conn):
+# csv text of an INTEGER value; "12.0" is accepted, "12.5" is not
+def coerce_integer(val):
+    try:
+        return str(int(val))
+    except ValueError:
+        num = float(val)
+        if not num.is_integer():
+            raise
+        return str(int(num))
+
+# csv text of a DECIMAL/NUMERIC value, checked but passed through unchanged
+# so no precision is lost; "inf" and "nan" are rejected since NUMERIC columns
+# would fail on them in the middle of a COPY
+def coerce_decimal(val):
+    if not math.isfinite(float(val)):
+        raise ValueError(f"non-finite value {val!r}")
+    return val
+
+Coercers = {
+    'TEXT': str,
+    'SMALLINT': coerce_integer,
+    'INTEGER': coerce_integer,
+    'BIGINT': coerce_integer,
+    'DECIMAL': coerce_decimal,
+    'NUMERIC': coerce_decimal,
+    'REAL': coerce_decimal,
+    'DOUBLE PRECISION': coerce_decimal,
+}
+
+# the lines of a file from byte offset start up to end, decoded
+# start and end must fall on line boundaries (see split_file)
+def byte_range_lines(fname, start, end):
+    with open(fname, mode="rb") as fil:
+        fil.seek(start)
+        pos = start
+        while pos < end:
+            line = fil.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode()
+
+# yield the rows of an ACS csv file as lists of typed values in Schema order
+# empty values become None (NULL), or 0 in numeric columns when zerofill is set
+# with start/end only the rows in that byte range are read (see split_file)
+# schema overrides Schema, e.g. with one from schema_infer.py
+# raises ValueError naming the line and column of a value that does not fit its
+# type, or the line of a row with too few fields
+def transform_rows(fname, zerofill=False, start=None, end=None, schema=None):
+    schema = schema or Schema
+    with open(fname, mode="r", newline="") as fil:
+        header = next(csv.reader(fil))
+        missing = [name for name, _ in schema if name not in header]
+        if missing:
+            raise ValueError(f"{fname} is missing columns {missing}")
+        fields = [(header.index(name), name, Coercers[sqltype], sqltype != 'TEXT')
+                  for name, sqltype in schema]
+        width = max(idx for idx, _, _, _ in fields) + 1
+
+        if start is None:
+            reader = csv.reader(fil)
+            where, skipped = fname, 1  # the header was read by another reader
+        else:
+            reader = csv.reader(byte_range_lines(fname, start, end))
+            where, skipped = f"{fname} bytes {start}-{end}", 0
+
+        for row in reader:
+            if not row:
+                continue  # blank line
+            if len(row) < width:
+                raise ValueError(f"{where} line {skipped + reader.line_num}: {len(row)} fields, "
+                                 f"expected {len(header)}")
+            out = []
+            for idx, name, coerce, numeric in fields:
+                val = row[idx].strip()
+                if not val:
+                    out.append('0' if zerofill and numeric else None)
+                    continue
+                try:
+                    out.append(coerce(val))
+                except ValueError:
+                    raise ValueError(f"{where} line {skipped + reader.line_num}: bad {name} value {val!r}") from None
+            yield out
+
+# load an ACS csv file with COPY ... (FORMAT csv); the transformed rows are
+# written to an in-memory buffer and copied chunk_rows at a time, all in one
+# transaction, so memory stays bounded for any file size
+# start/end restrict the load to one byte range of the file, table and schema
+# override the target table and its Schema; returns the number of rows loaded
+def load_copy_stream(conn, csv_file, chunk_rows=50000, zerofill=False,
+                     table=TableName, start=None, end=None, schema=None):
+    columns = [name for name, _ in schema or Schema]
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn, conn.cursor() as cursor:
+            began = time.perf_counter()
+            total = 0
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            for row in transform_rows(csv_file, zerofill, start, end, schema):
+                writer.writerow(row)  # None is written as an unquoted empty field, i.e. NULL
+                total += 1
+                if total % chunk_rows == 0:
+                    buf.seek(0)
+                    cursor.copy_expert(copy_sql, buf)
+                    buf.seek(0)
+                    buf.truncate()
+            if buf.tell():
+                buf.seek(0)
+                cursor.copy_expert(copy_sql, buf)
+        elapsed = time.perf_counter() - began
+        print(f"Data loaded using COPY: {total} rows in {elapsed:0.4} seconds")
+        return total
+    finally:
+        conn.autocommit = autocommit
+
+# split the data rows of a csv file into about `parts` byte ranges that start
+# and end on line boundaries; assumes no quoted field spans a line break,
+# which holds for the ACS files
+def split_file(fname, parts):
+    size = os.path.getsize(fname)
+    with open(fname, mode="rb") as fil:
+        fil.readline()  # header
+        bounds = [fil.tell()]
+        for i in range(1, parts):
+            target = bounds[0] + (size - bounds[0]) * i // parts
+            if target <= bounds[-1]:
+                continue
+            fil.seek(target - 1)
+            fil.readline()  # move to the start of the next line
+            if bounds[-1] < fil.tell() < size:
+                bounds.append(fil.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# process pool worker: COPY one byte range of the file over its own connection
+def copy_partition(config, fname, start, end, table, chunk_rows, zerofill, schema):
+    conn = dbconnect(config)
+    try:
+        return load_copy_stream(conn, fname, chunk_rows, zerofill, table, start, end, schema)
+    finally:
+        conn.close()
+
+# recreate censusdata and load it in parallel: byte-range partitions of the file
+# are COPYed concurrently into an UNLOGGED staging table, moved into censusdata
+# with one INSERT ... SELECT, and only then are the key and index built
+# prints and returns the seconds spent in each phase
+def load_parallel(db, fname, workers=None, chunk_rows=50000, zerofill=False):
+    workers = workers or os.cpu_count()
+    staging = f"{TableName}_staging"
+    phases = {}
+
+    began = time.perf_counter()
+    partitions = split_file(fname, workers)
+    phases["split"] = time.perf_counter() - began
+
+    began = time.perf_counter()
+    db.query(table_ddl(staging, unlogged=True))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # the schema goes along since a worker's own module may not have run initialize()
+        futures = [pool.submit(copy_partition, db.config, fname, start, end, staging,
+                               chunk_rows, zerofill, Schema)
+                   for start, end in partitions]
+        total = sum(future.result() for future in futures)
+    phases["load"] = time.perf_counter() - began
+
+    began = time.perf_counter()
+    with db.connection() as conn:
+        createTable(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TableName} SELECT * FROM {staging}; DROP TABLE {staging};")
+    phases["move"] = time.perf_counter() - began
+
+    began = time.perf_counter()
+    with db.connection() as conn:
+        add_indexes_constraints(conn)
+    phases["index"] = time.perf_counter() - began
+
+    began = time.perf_counter()
+    validate(db)
+    phases["validate"] = time.perf_counter() - began
+
+    print(f"\nLoaded {total} rows from {len(partitions)} partitions with {workers} workers")
+    for name, elapsed in phases.items():
+        print(f"{name:<10} {elapsed:8.3f} s")
+    print(f"{'total':<10} {sum(phases.values()):8.3f} s")
+    return phases
+
+def add_indexes_constraints(conn, table=TableName):
     with conn.cursor() as cursor:
         cursor.execute(f"""
-            ALTER TABLE {TableName} ADD PRIMARY KEY (TractId);
-            CREATE INDEX idx_{TableName}_State ON {TableName}(State);
+            ALTER TABLE {table} ADD PRIMARY KEY (TractId);
+            CREATE INDEX idx_{table}_State ON {table}(State);
         """)
         print("Indexes and constraints created.")
 
+# content hash of a transformed row; None and '' hash differently
+def row_hash(row):
+    text = "\x1f".join("\\N" if val is None else val for val in row)
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+# TractId text as a comparable key: "01001020100", "1001020100.0" and the
+# NUMERIC's own text all give the same key
+def tract_key(val):
+    return format(Decimal(val).normalize(), 'f')
+
+# make sure censusdata, its primary key and State index, and the hash table exist
+# a table without the key (e.g. loaded twice in copy mode) is repaired first:
+# of rows sharing a TractId only the last one loaded is kept, rows without a
+# TractId are dropped, and their stored hashes are forgotten so the file's
+# version of those tracts is upserted again
+def ensure_incremental_tables(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", (TableName,))
+        if cursor.fetchone()[0] is None:
+            createTable(conn)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {HashTable} (
+                TractId     NUMERIC PRIMARY KEY,
+                RowHash     BYTEA NOT NULL
+            );
+        """)
+        cursor.execute(f"""
+            SELECT count(*) FROM pg_constraint
+            WHERE conrelid = '{TableName}'::regclass AND contype = 'p'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"""
+                WITH dropped AS (
+                    DELETE FROM {TableName}
+                    WHERE ctid IN (
+                        SELECT ctid FROM (
+                            SELECT ctid, TractId, row_number() OVER (
+                                PARTITION BY TractId ORDER BY ctid DESC) AS newest
+                            FROM {TableName}) ranked
+                        WHERE TractId IS NULL OR newest > 1)
+                    RETURNING TractId
+                ), forgotten AS (
+                    DELETE FROM {HashTable} WHERE TractId IN (SELECT TractId FROM dropped)
+                )
+                SELECT count(*) FROM dropped
+            """)
+            dropped = cursor.fetchone()[0]
+            if dropped:
+                print(f"Removed {dropped} duplicate or keyless rows from {TableName}.")
+            cursor.execute(f"ALTER TABLE {TableName} ADD PRIMARY KEY (TractId);")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TableName}_State ON {TableName}(State);")
+
+# load only the new or changed rows of the data file: each row's content hash
+# is compared with the one stored for its TractId and the rows that differ are
+# upserted in batches with INSERT ... ON CONFLICT (TractId) DO UPDATE, together
+# with their new hashes, in one transaction
+# TractIds are compared and stored in tract_key form, so a reformatted TractId
+# is the same tract and the same row
+# a TractId repeated in the file ends up with its last row; repeats are merged
+# before each batch since one INSERT cannot update the same row twice
+# TractIds missing from the file are left in the table, rows without a
+# TractId are skipped and counted
+# returns the number of new, changed, unchanged and skipped rows
+def load_incremental(conn, fname, page_size=1000, chunk_rows=50000, zerofill=False):
+    ensure_incremental_tables(conn)
+    began = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT TractId::text, RowHash FROM {HashTable}")
+        known = {tract_key(tract): bytes(rowhash) for tract, rowhash in cursor}
+
+    upsert_sql = f"""
+        INSERT INTO {TableName} ({', '.join(Columns)}) VALUES %s
+        ON CONFLICT (TractId) DO UPDATE SET
+        {', '.join(f"{col} = EXCLUDED.{col}" for col in Columns[1:])}
+    """
+    hash_sql = f"""
+        INSERT INTO {HashTable} (TractId, RowHash) VALUES %s
+        ON CONFLICT (TractId) DO UPDATE SET RowHash = EXCLUDED.RowHash
+    """
+    tract = Columns.index('TractId')
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "skipped": 0}
+
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    def flush(cursor, pending):
+        rows = [row for row, _ in pending.values()]
+        hashes = [(key, rowhash) for key, (_, rowhash) in pending.items()]
+        psycopg2.extras.execute_values(cursor, upsert_sql, rows, page_size=page_size)
+        psycopg2.extras.execute_values(cursor, hash_sql, hashes, page_size=page_size)
+
+    try:
+        with conn, conn.cursor() as cursor:
+            pending = {}  # TractId -> (row, hash), the last row of a TractId wins
+            for row in transform_rows(fname, zerofill):
+                if row[tract] is None:
+                    counts["skipped"] += 1
+                    continue
+                key = row[tract] = tract_key(row[tract])
+                rowhash = row_hash(row)
+                old = known.get(key)
+                if old == rowhash:
+                    counts["unchanged"] += 1
+                    continue
+                counts["new" if old is None else "changed"] += 1
+                known[key] = rowhash
+                pending[key] = (row, rowhash)
+                if len(pending) == chunk_rows:
+                    flush(cursor, pending)
+                    pending = {}
+            if pending:
+                flush(cursor, pending)
+    finally:
+        conn.autocommit = autocommit
+
+    elapsed = time.perf_counter() - began
+    print(f"Incremental load: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged rows in {elapsed:0.4} seconds")
+    if counts["skipped"]:
+        print(f"Skipped {counts['skipped']} rows without a TractId.")
+    return counts
+
+# load the data file with each strategy into a freshly created table and
+# report rows/sec side by side; the per-row strategy only gets BenchRows rows
+def benchmark(conn, fname):
+    rowlist = readdata(fname)
+    strategies = [
+        ("per-row", len(rowlist[:BenchRows]),
+         lambda: load(conn, getSQLcmnds([dict(row) for row in rowlist[:BenchRows]]))),
+        (f"batched ({PageSize})", len(rowlist),
+         lambda: load_batched(conn, rowlist, PageSize)),
+        ("copy", len(rowlist),
+         lambda: load_copy_stream(conn, fname, ChunkRows, ZeroFill)),
+    ]
+
+    results = []
+    for name, nrows, run in strategies:
+        createTable(conn)
+        start = time.perf_counter()
+        run()
+        results.append((name, nrows, time.perf_counter() - start))
+
+    print()
+    for name, nrows, elapsed in results:
+        print(f"{name:<16} {nrows:>10,} rows  {elapsed:8.3f} s  {nrows / elapsed:12,.0f} rows/sec")
+
+# create / load / index / validate through one of the embedded backends
+def load_embedded():
+    from backends import make_backend
+    backend = make_backend(BackendName, TableName, Schema, DBFile)
+    if CreateDB:
+        backend.create_table()
+    start = time.perf_counter()
+    rows = backend.load(Datafile, ZeroFill)
+    print(f"Loaded {rows} rows into {BackendName} in {time.perf_counter() - start:0.4} seconds")
+    backend.add_indexes()
+    for label, (answer, elapsed) in backend.validate().items():
+        print(f"{label}: {answer}  ({elapsed * 1000:.1f} ms)")
+    backend.close()
+
 def main():
     initialize()
-    conn = dbconnect()
+    if BackendName != "postgres":
+        load_embedded()
+        return
 
-    if CreateDB:
-        createTable(conn)
+    db = Database(DBConfig)
+
+    if Benchmark:
+        with db.connection() as conn:
+            benchmark(conn, Datafile)
+        db.close()
+        return
+
+    if LoadMode == "parallel":
+        load_parallel(db, Datafile, Workers, ChunkRows, ZeroFill)
+        db.close()
+        return
+
+    with db.connection() as conn:
+        if CreateDB:
+            createTable(conn)
 
-    load_with_copy_from(conn, Datafile)
+        if LoadMode == "incremental":
+            load_incremental(conn, Datafile, PageSize, ChunkRows, ZeroFill)
+        else:
+            if LoadMode == "rows":
+                load(conn, getSQLcmnds(readdata(Datafile)))
+            elif LoadMode == "batched":
+                load_batched(conn, readdata(Datafile), PageSize)
+            elif LoadMode == "copyfrom":
+                load_with_copy_from(conn, Datafile)
+            else:
+                load_copy_stream(conn, Datafile, ChunkRows, ZeroFill)
+            add_indexes_constraints(conn)
 
-    add_indexes_constraints(conn)
-    validate(conn)
-    conn.close()
+    validate(db)
+    db.close()
 
 if __name__ == "__main__":
 	main()
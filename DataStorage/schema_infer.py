@@ -0,0 +1,196 @@
+# DataEng S25 - Data Storage: load-time schema inference for censusdata
+# scans an ACS csv file (or a random sample of its rows) and picks the
+# narrowest Postgres type that holds every value of each column:
+#   whole numbers   SMALLINT, INTEGER or BIGINT by range
+#   decimals        REAL when no value has more than 6 significant digits,
+#                   else DOUBLE PRECISION (always, when only a sample is scanned)
+#   anything else   TEXT
+# with --compare the file is loaded under both the DECIMAL schema and the
+# inferred one and their on-disk size and query latency are reported
+# run it with -h to see the command line options
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+
+from db import Database, add_db_arguments, db_config
+from load_inserts import Schema, TableName, ValidateQueries, load_copy_stream, table_ddl
+
+INT_TYPES = [
+    ('SMALLINT', -2**15, 2**15 - 1),
+    ('INTEGER', -2**31, 2**31 - 1),
+    ('BIGINT', -2**63, 2**63 - 1),
+]
+REAL_DIGITS = 6  # significant decimal digits a 4-byte REAL always keeps
+SCAN_BATCH = 10000  # rows scanned per batch
+
+
+# what has been seen of one column's values so far
+class ColumnScan:
+    def __init__(self):
+        self.seen = 0
+        self.numeric = True
+        self.integral = True
+        self.lo = 0
+        self.hi = 0
+        self.digits = 0
+
+    # take in a batch of non-empty values; whole batches are converted with
+    # map() and only fall back to a slower path when a conversion fails
+    def add(self, vals):
+        if not self.numeric or not vals:
+            return
+        if self.integral:
+            try:
+                nums = list(map(int, vals))
+            except ValueError:
+                self.integral = False
+            else:
+                lo, hi = min(nums), max(nums)
+                self.lo = lo if not self.seen else min(self.lo, lo)
+                self.hi = hi if not self.seen else max(self.hi, hi)
+                self.seen += len(nums)
+                return
+        try:
+            list(map(float, vals))
+        except ValueError:
+            self.numeric = False
+            return
+        for val in vals:
+            if 'e' in val or 'E' in val:
+                self.digits = 17
+                break
+            mantissa = val.lstrip('+-').replace('.', '').lstrip('0')
+            self.digits = max(self.digits, len(mantissa))
+        # whole numbers seen earlier must also fit the decimal type
+        if self.seen:
+            self.digits = max(self.digits, len(str(max(abs(self.lo), abs(self.hi)))))
+
+    # narrowest type for the values seen; from a sample, a column of whole
+    # numbers keeps its fallback type (DOUBLE PRECISION if that is TEXT) and a
+    # decimal column gets DOUBLE PRECISION, since the rows left out may hold
+    # fractions, wider values or more digits than a REAL keeps
+    def sqltype(self, sampled=False, fallback='TEXT'):
+        if not self.numeric:
+            return 'TEXT'
+        if not self.integral:
+            if sampled:
+                return 'DOUBLE PRECISION'
+            return 'REAL' if self.digits <= REAL_DIGITS else 'DOUBLE PRECISION'
+        if not self.seen:
+            return fallback
+        if sampled:
+            return 'DOUBLE PRECISION' if fallback == 'TEXT' else fallback
+        for name, lo, hi in INT_TYPES:
+            if lo <= self.lo and self.hi <= hi:
+                return name
+        return 'DOUBLE PRECISION'
+
+
+# `n` data lines picked at random byte offsets, each moved to the start of the
+# following line (so a line's chance grows with the length of the one before it)
+def sample_lines(fname, n, seed=42):
+    size = os.path.getsize(fname)
+    rng = random.Random(seed)
+    lines = []
+    with open(fname, mode="rb") as fil:
+        fil.readline()  # header
+        first = fil.tell()
+        for offset in sorted(rng.randrange(first, size) for _ in range(n)):
+            fil.seek(max(offset - 1, first - 1))
+            fil.readline()
+            line = fil.readline()
+            if line:
+                lines.append(line.decode())
+    return lines
+
+
+# [(column, type)] in file order for every column of an ACS csv file, from all
+# of its rows or from sample_rows randomly picked ones
+def infer_schema(fname, sample_rows=None, seed=42):
+    known = dict(Schema)
+    with open(fname, mode="r", newline="") as fil:
+        reader = csv.reader(fil)
+        header = next(reader)
+        rows = reader if sample_rows is None else csv.reader(sample_lines(fname, sample_rows, seed))
+        scans = [ColumnScan() for _ in header]
+        while True:
+            batch = list(itertools.islice(rows, SCAN_BATCH))
+            if not batch:
+                break
+            for scan, col in zip(scans, zip(*batch)):
+                scan.add([val.strip() for val in col if val.strip()])
+    return [(name, scan.sqltype(sample_rows is not None, known.get(name, 'TEXT')))
+            for name, scan in zip(header, scans)]
+
+
+# best of `repeat` runs of each query against `table`, in ms
+def query_latency(db, table, queries, repeat):
+    best = {}
+    for _ in range(repeat):
+        for label, sql in queries.items():
+            _rows, elapsed = db.query(sql.replace(TableName, table), label=f"{table}: {label}")
+            best[label] = min(elapsed, best.get(label, elapsed))
+    return {label: elapsed * 1000 for label, elapsed in best.items()}
+
+
+# load the file into <table>_decimal and <table>_inferred and compare their
+# total on-disk size (table, toast and indexes) and query latency
+def compare(db, fname, schema, repeat=5):
+    queries = dict(ValidateQueries)
+    queries["Population and income by state"] = \
+        "select state, sum(totalpop), avg(income), avg(poverty) from censusdata group by state;"
+
+    results = {}
+    for label, table, table_schema in [("decimal", f"{TableName}_decimal", Schema),
+                                       ("inferred", f"{TableName}_inferred", schema)]:
+        db.query(table_ddl(table, schema=table_schema))
+        with db.connection() as conn:
+            start = time.perf_counter()
+            load_copy_stream(conn, fname, table=table, schema=table_schema)
+            load_time = time.perf_counter() - start
+        db.query(f"ALTER TABLE {table} ADD PRIMARY KEY (TractId); "
+                 f"CREATE INDEX ON {table}(State);")
+        db.query(f"VACUUM ANALYZE {table};")
+        (size,), = db.query("select pg_total_relation_size(%s)", (table,))[0]
+        results[label] = (size, load_time, query_latency(db, table, queries, repeat))
+
+    print(f"\n{'':<34}{'decimal':>14}{'inferred':>14}")
+    print(f"{'total relation size (MB)':<34}" +
+          "".join(f"{size / 2**20:14.2f}" for size, _, _ in results.values()))
+    print(f"{'load (s)':<34}" + "".join(f"{load:14.3f}" for _, load, _ in results.values()))
+    for label in queries:
+        print(f"{label + ' (ms)':<34}" +
+              "".join(f"{latency[label]:14.2f}" for _, _, latency in results.values()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--datafile", required=True)
+    parser.add_argument("-s", "--samplerows", type=int, default=None,
+                        help="infer from this many randomly picked rows instead of the whole file; "
+                             "columns that are whole numbers in the sample keep their DECIMAL schema type "
+                             "and decimal columns become DOUBLE PRECISION")
+    parser.add_argument("--compare", action="store_true",
+                        help="load both schemas and compare table size and query latency")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="runs of each query when comparing; the fastest one is reported")
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    schema = infer_schema(args.datafile, args.samplerows)
+    print(f"-- inferred in {time.perf_counter() - start:0.3f} seconds")
+    print(table_ddl(TableName, schema=schema))
+
+    if args.compare:
+        db = Database(db_config(args))
+        compare(db, args.datafile, schema, args.repeat)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
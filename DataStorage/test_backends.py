@@ -0,0 +1,67 @@
+# DataEng S25 - Data Storage: tests of the embedded storage backends
+# SQLite and DuckDB need no server, so these always run
+#   python -m pytest test_backends.py
+import sqlite3
+
+import pytest
+
+import load_inserts
+from backends import make_backend
+from test_load_inserts import COUNTIES, write_acs
+
+
+# the answers load_embedded printed, {label: answer}
+def printed_answers(out):
+    answers = {}
+    for line in out.splitlines():
+        label, sep, rest = line.partition(": ")
+        if sep and label in load_inserts.ValidateQueries:
+            answers[label] = int(rest.split()[0])
+    return answers
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'duckdb'])
+def test_load_embedded_answers_the_validate_queries(backend, tmp_path, monkeypatch, capsys):
+    if backend == 'duckdb':
+        pytest.importorskip('duckdb')
+    fname = tmp_path / 'acs.csv'
+    dbfile = tmp_path / f'census.{backend}'
+    write_acs(fname, rows=500)
+    for name, value in {'BackendName': backend, 'Datafile': str(fname), 'DBFile': str(dbfile),
+                        'CreateDB': True, 'ZeroFill': False}.items():
+        monkeypatch.setattr(load_inserts, name, value)
+
+    load_inserts.load_embedded()
+    out = capsys.readouterr().out
+    assert f"Loaded 500 rows into {backend}" in out
+    assert printed_answers(out) == {
+        "Number of states": len(COUNTIES),
+        "Number of counties in Oregon": len(COUNTIES['Oregon']) + 1,  # with 'Lane, County'
+        "Number of counties in Iowa": len(COUNTIES['Iowa']),
+    }
+
+    # empty fields were loaded as NULL, the quoted comma kept
+    backend = make_backend(backend, load_inserts.TableName, load_inserts.Schema, str(dbfile))
+    try:
+        rows, nulls = backend.conn.execute(
+            "SELECT count(*), count(*) - count(TotalPop) FROM censusdata").fetchone()
+        county, = backend.conn.execute("SELECT County FROM censusdata WHERE TractId = 1000006").fetchone()
+    finally:
+        backend.close()
+    assert (rows, nulls, county) == (500, 50, 'Lane, County')
+
+
+# a second load into the keyed table fails instead of duplicating tracts
+def test_sqlite_key_rejects_a_second_load(tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=50)
+    backend = make_backend('sqlite', 'censusdata', load_inserts.Schema, str(tmp_path / 'census.sqlite'))
+    try:
+        backend.create_table()
+        assert backend.load(str(fname)) == 50
+        backend.add_indexes()
+        with pytest.raises(sqlite3.IntegrityError):
+            backend.load(str(fname))
+        assert backend.conn.execute("SELECT count(*) FROM censusdata").fetchone()[0] == 50
+    finally:
+        backend.close()
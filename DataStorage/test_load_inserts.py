@@ -0,0 +1,235 @@
+# DataEng S25 - Data Storage: tests of the census loader
+# the tests using the db fixture need a server: set PGHOST (and
+# PGPORT/PGDATABASE/PGUSER/PGPASSWORD as needed, see db.py), otherwise they
+# are skipped; everything is created in a scratch schema that is dropped afterwards
+#   PGHOST=localhost python -m pytest test_load_inserts.py
+import argparse
+import csv
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from db import DEFAULTS, Database, add_db_arguments, connect, db_config
+from load_inserts import (Schema, TableName, ValidateQueries, byte_range_lines, coerce_decimal,
+                          load_copy_stream, load_incremental, load_parallel, split_file, table_ddl,
+                          tract_key, transform_rows)
+
+SCHEMA = "dataeng_test"
+COUNTIES = {'Oregon': ['Lane County', 'Linn County', 'Benton County'],
+            'Iowa': ['Polk County', 'Story County'],
+            'Texas': ['Travis County']}
+
+
+# an ACS csv file of `rows` tracts over COUNTIES; every 10th row leaves its
+# numbers empty (NULL) and one county name holds a quoted comma
+def write_acs(path, rows=2000):
+    states = [(state, county) for state, counties in COUNTIES.items() for county in counties]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in Schema])
+        for i in range(rows):
+            state, county = states[i % len(states)]
+            if i == 6:
+                county = 'Lane, County'
+            row = [str(1000000 + i), state, county]
+            for _name, sqltype in Schema[3:]:
+                if i % 10 == 9:
+                    row.append('')
+                elif sqltype == 'INTEGER':
+                    row.append(str(i % 5000))
+                else:
+                    row.append(f"{(i % 997) / 10:.1f}")
+            writer.writerow(row)
+
+
+# rewrite data line `line` (1-based, after the header) of a csv file with edit(fields)
+def edit_line(path, line, edit):
+    with open(path, newline='') as f:
+        lines = list(csv.reader(f))
+    lines[line] = edit(lines[line])
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(lines)
+
+
+def test_transform_rows_types_and_nulls(tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=10)
+    rows = list(transform_rows(str(fname)))
+    assert len(rows) == 10
+    assert rows[6][:4] == ['1000006', 'Oregon', 'Lane, County', '6']
+    assert rows[9][3:] == [None] * (len(Schema) - 3)
+    assert list(transform_rows(str(fname), zerofill=True))[9][3:] == ['0'] * (len(Schema) - 3)
+
+
+# a short row names the file and line instead of raising a bare IndexError
+def test_transform_rows_rejects_short_rows(tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=20)
+    edit_line(fname, 4, lambda fields: fields[:4])
+    with pytest.raises(ValueError, match=r"acs.csv line 5: 4 fields, expected 37"):
+        list(transform_rows(str(fname)))
+
+
+# PostgreSQL NUMERIC rejects these, so they must not reach a COPY
+@pytest.mark.parametrize('value', ['inf', '-Infinity', 'nan', 'NaN'])
+def test_non_finite_decimals_are_rejected(tmp_path, value):
+    with pytest.raises(ValueError):
+        coerce_decimal(value)
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=3)
+    edit_line(fname, 2, lambda fields: fields[:6] + [value] + fields[7:])
+    with pytest.raises(ValueError, match=rf"line 3: bad {Schema[6][0]} value '{value}'"):
+        list(transform_rows(str(fname)))
+
+
+# connection settings whose search_path is the scratch schema, so censusdata,
+# its staging table and hash table never touch the real ones
+@pytest.fixture
+def config():
+    if not os.environ.get("PGHOST"):
+        pytest.skip("no Postgres server configured (set PGHOST)")
+    base = db_config()
+    conn = connect(base)
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    yield {**base, 'options': f'-c search_path={SCHEMA}'}
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+    conn.close()
+
+
+@pytest.fixture
+def db(config):
+    db = Database(config, maxconn=3)
+    yield db
+    db.close()
+
+
+# the byte ranges cover every data line exactly once, whatever the part count
+@pytest.mark.parametrize('parts', [1, 3, 7, 5000])
+def test_split_file_ranges_cover_the_data_lines(tmp_path, parts):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=300)
+    with open(fname, newline='') as f:
+        data = f.readlines()[1:]
+    ranges = split_file(str(fname), parts)
+    assert len(ranges) <= parts
+    assert all(start < end for start, end in ranges)
+    assert [line for start, end in ranges for line in byte_range_lines(str(fname), start, end)] == data
+
+
+def test_parallel_load_matches_the_file(db, tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname)
+    phases = load_parallel(db, str(fname), workers=3, chunk_rows=300)
+    assert set(phases) == {'split', 'load', 'move', 'index', 'validate'}
+
+    (count, distinct, nulls), = db.query(
+        f"SELECT count(*), count(DISTINCT TractId), count(*) - count(TotalPop) FROM {TableName}")[0]
+    assert (count, distinct, nulls) == (2000, 2000, 200)
+    (county,), = db.query(f"SELECT County FROM {TableName} WHERE TractId = 1000006")[0]
+    assert county == 'Lane, County'
+    (constraints,), = db.query(
+        "SELECT count(*) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+        (TableName,))[0]
+    assert constraints == 1
+    (staging,), = db.query("SELECT to_regclass(%s)", (f"{TableName}_staging",))[0]
+    assert staging is None
+
+
+# the parallel load gives the same answers as a single streaming COPY
+def test_parallel_and_single_copy_agree(db, tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname)
+    load_parallel(db, str(fname), workers=2, chunk_rows=500)
+    parallel = {label: rows for label, (rows, _) in db.run_queries(ValidateQueries).items()}
+
+    db.query(table_ddl(TableName))
+    with db.connection() as conn:
+        assert load_copy_stream(conn, str(fname)) == 2000
+    single = {label: rows for label, (rows, _) in db.run_queries(ValidateQueries).items()}
+
+    assert parallel == single
+    assert parallel["Number of states"][0][0] == len(COUNTIES)
+    assert parallel["Number of counties in Oregon"][0][0] == len(COUNTIES['Oregon']) + 1
+    assert parallel["Number of counties in Iowa"][0][0] == len(COUNTIES['Iowa'])
+
+
+def test_tract_key_ignores_formatting():
+    assert tract_key('01001020100') == tract_key('1001020100.0') == tract_key('1001020100') == '1001020100'
+    assert tract_key('41039000100') != tract_key('4103900010')
+
+
+# a second run of the same file changes nothing; a changed row, a reformatted
+# TractId and a row without a TractId are told apart
+def test_incremental_load_counts(db, tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=100)
+    with db.connection() as conn:
+        assert load_incremental(conn, str(fname), page_size=7, chunk_rows=30) == \
+            {"new": 100, "changed": 0, "unchanged": 0, "skipped": 0}
+        assert load_incremental(conn, str(fname)) == {"new": 0, "changed": 0, "unchanged": 100, "skipped": 0}
+
+        edit_line(fname, 1, lambda fields: fields[:3] + ['12345'] + fields[4:])
+        edit_line(fname, 2, lambda fields: ['0' + fields[0]] + fields[1:])
+        edit_line(fname, 3, lambda fields: [fields[0] + '.0'] + fields[1:])
+        edit_line(fname, 4, lambda fields: [''] + fields[1:])
+        counts = load_incremental(conn, str(fname))
+
+    assert counts == {"new": 0, "changed": 1, "unchanged": 98, "skipped": 1}
+    (count, pop), = db.query(
+        f"SELECT count(*), sum(TotalPop) FILTER (WHERE TractId = 1000000) FROM {TableName}")[0]
+    assert (count, pop) == (100, 12345)
+    with db.connection() as conn:
+        assert load_incremental(conn, str(fname)) == {"new": 0, "changed": 0, "unchanged": 99, "skipped": 1}
+
+
+# more queries, and threads, than pooled connections: callers wait for a free
+# connection instead of getting PoolError
+def test_pool_runs_more_queries_than_connections(db):
+    queries = {f"q{i}": ("SELECT pg_sleep(0.05), %s", (i,)) for i in range(10)}
+    results = db.run_queries(queries, workers=10)
+    assert [rows[0][1] for rows, _ in results.values()] == list(range(10))
+    assert len(db.timings) == 10
+
+    answers, errors = [], []
+
+    def borrow(i):
+        try:
+            with db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("SELECT pg_sleep(0.05), %s", (i,))
+                answers.append(cursor.fetchone()[1])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=borrow, args=(i,)) for i in range(3 * db.maxconn)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(answers) == list(range(3 * db.maxconn))
+
+
+# a failed statement leaves no aborted transaction behind on the pooled connection
+def test_pool_rolls_back_failed_transactions(db):
+    with pytest.raises(Exception):
+        with db.connection(autocommit=False) as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT 1 / 0")
+    (answer,), = db.query("SELECT 42")[0]
+    assert answer == 42
+
+
+# command line arguments win over the libpq environment, which wins over DEFAULTS
+def test_db_config_precedence(monkeypatch):
+    for var in ('PGHOST', 'PGPORT', 'PGDATABASE', 'PGUSER', 'PGPASSWORD'):
+        monkeypatch.delenv(var, raising=False)
+    assert db_config() == DEFAULTS
+
+    monkeypatch.setenv('PGHOST', 'envhost')
+    monkeypatch.setenv('PGPORT', '6543')
+    args = add_db_arguments(argparse.ArgumentParser()).parse_args(['--host', 'arghost', '--dbname', 'census'])
+    assert db_config(args) == {**DEFAULTS, 'host': 'arghost', 'port': '6543', 'dbname': 'census'}
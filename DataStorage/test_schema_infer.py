@@ -0,0 +1,64 @@
+# DataEng S25 - Data Storage: tests of load-time schema inference
+# the compare test needs a server (see test_load_inserts.py), the others do not
+#   python -m pytest test_schema_infer.py
+import csv
+
+import pytest
+
+from load_inserts import Schema
+from schema_infer import infer_schema, sample_lines
+from test_load_inserts import config, db, write_acs  # noqa: F401 (fixtures)
+
+
+# a csv file with one column per type infer_schema picks; `wide` rows of the
+# Decimal column get a value with more digits than a REAL keeps
+def write_typed(path, rows=1000, wide=()):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Small', 'Medium', 'Large', 'Decimal', 'Name', 'Empty', 'TotalPop'])
+        for i in range(rows):
+            writer.writerow([i % 300 - 150, i * 10_000, i * 10**10, '123456.7' if i in wide else f'{i % 97}.5',
+                             f'tract {i}', '', i])
+
+
+def test_full_scan_picks_the_narrowest_types(tmp_path):
+    fname = tmp_path / 'typed.csv'
+    write_typed(fname)
+    assert infer_schema(str(fname)) == [('Small', 'SMALLINT'), ('Medium', 'INTEGER'), ('Large', 'BIGINT'),
+                                        ('Decimal', 'REAL'), ('Name', 'TEXT'), ('Empty', 'TEXT'),
+                                        ('TotalPop', 'SMALLINT')]
+    write_typed(fname, wide={500})
+    assert dict(infer_schema(str(fname)))['Decimal'] == 'DOUBLE PRECISION'
+
+
+# a sample that misses the one wide decimal must not pick REAL for its column,
+# nor narrow whole numbers below their schema type
+def test_sample_that_misses_a_wide_value(tmp_path):
+    fname = tmp_path / 'typed.csv'
+    write_typed(fname, wide={500})
+    assert not any('123456.7' in line for line in sample_lines(str(fname), 20))
+    assert infer_schema(str(fname), sample_rows=20) == [
+        ('Small', 'DOUBLE PRECISION'), ('Medium', 'DOUBLE PRECISION'), ('Large', 'DOUBLE PRECISION'),
+        ('Decimal', 'DOUBLE PRECISION'), ('Name', 'TEXT'), ('Empty', 'TEXT'), ('TotalPop', 'INTEGER')]
+
+
+def test_acs_file_columns_keep_their_order(tmp_path):
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=300)
+    schema = infer_schema(str(fname))
+    assert [name for name, _ in schema] == [name for name, _ in Schema]
+    assert schema[:4] == [('TractId', 'INTEGER'), ('State', 'TEXT'), ('County', 'TEXT'), ('TotalPop', 'SMALLINT')]
+    assert all(sqltype == 'REAL' for (_, sqltype), (_, known) in zip(schema, Schema) if known == 'DECIMAL')
+
+
+def test_compare_loads_both_schemas(db, tmp_path):
+    from schema_infer import compare
+    fname = tmp_path / 'acs.csv'
+    write_acs(fname, rows=2000)
+    results = compare(db, str(fname), infer_schema(str(fname)), repeat=1)
+    assert set(results) == {'decimal', 'inferred'}
+    (decimal_size, _, latency), (inferred_size, _, _) = results['decimal'], results['inferred']
+    assert inferred_size < decimal_size
+    assert "Population and income by state" in latency
+    (rows,), = db.query("SELECT count(*) FROM censusdata_inferred")[0]
+    assert rows == 2000
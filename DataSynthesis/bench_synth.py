@@ -0,0 +1,40 @@
+# DataEng S25 - Data Synthesis: employee generation benchmark
+# compares the vectorized batch generator against the original per-row loop
+# run it with -h to see the command line options
+import argparse
+import time
+
+from role_lookup import compile_lookup, load_tables
+from synth import generate_employees, generate_employees_loop
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=1_000_000)
+    parser.add_argument("--loop-rows", type=int, default=10_000,
+                        help="rows given to the slow per-row loop")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    departments_df, roles_df = load_tables()
+    lookup = compile_lookup(departments_df, roles_df)
+
+    start = time.perf_counter()
+    generate_employees_loop(args.loop_rows, departments_df, roles_df, args.seed)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emp_df = generate_employees(args.rows, lookup, args.seed)
+    batch_time = time.perf_counter() - start
+
+    # same seed, same rows
+    again = generate_employees(args.rows, lookup, args.seed)
+    assert emp_df.equals(again)
+
+    print(f"loop:   {args.loop_rows:>12,} rows  {loop_time:8.3f} s  {args.loop_rows / loop_time:12,.0f} rows/sec")
+    print(f"batch:  {args.rows:>12,} rows  {batch_time:8.3f} s  {args.rows / batch_time:12,.0f} rows/sec")
+    print(f"speedup: {(args.rows / batch_time) / (args.loop_rows / loop_time):,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
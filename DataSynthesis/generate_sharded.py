@@ -0,0 +1,48 @@
+# DataEng S25 - Data Synthesis: parallel sharded employee generation
+# writes NUM_EMPLOYEES synthetic employees as one CSV per shard using every core
+# run it with -h to see the command line options
+import argparse
+import time
+
+from role_lookup import build_lookup
+from summary_stats import FrameSummary
+from synth import DEFAULT_SHARDS, generate_sharded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-employees", type=int, required=True)
+    parser.add_argument("-o", "--outdir", default="employee_shards")
+    parser.add_argument("-s", "--shards", type=int,
+                        help=f"output files; the rows are the same for any number "
+                             f"(default: {DEFAULT_SHARDS} or one per worker, whichever is more)")
+    parser.add_argument("-w", "--workers", type=int, help="default: all cores")
+    parser.add_argument("-b", "--batch-size", type=int, default=500_000,
+                        help="rows held in memory per worker at a time")
+    parser.add_argument("-f", "--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stats", action="store_true",
+                        help="print summary statistics merged from all shards")
+    args = parser.parse_args()
+
+    lookup = build_lookup()
+
+    start = time.perf_counter()
+    results = generate_sharded(args.num_employees, args.outdir, lookup,
+                               seed=args.seed, shards=args.shards, workers=args.workers,
+                               batch_size=args.batch_size, fmt=args.format, stats=args.stats)
+    elapsed = time.perf_counter() - start
+
+    total = sum(rows for _, rows, _ in results)
+    print(f"Wrote {total:,} employees to {len(results)} shard files in {args.outdir}")
+    print(f"Elapsed Time: {elapsed:0.4} seconds ({total / elapsed:,.0f} rows/sec)")
+
+    if args.stats:
+        summary = FrameSummary()
+        for _, _, shard_summary in results:
+            summary.merge(shard_summary)
+        print(summary.describe())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# DataEng S25 - Data Synthesis: streaming employee generation
+# writes the employee, perturbed-salary and age-biased sample files batch by
+# batch, so memory stays flat as the number of employees grows
+# run it with -h to see the command line options
+import argparse
+import time
+
+from report import EmployeeAggregates, render_report
+from summary_stats import FrameSummary
+from role_lookup import build_lookup
+from synth import synthesize_stream
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num-employees", type=int, default=10_000)
+    parser.add_argument("-f", "--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("-b", "--batch-size", type=int, default=100_000)
+    parser.add_argument("--sample-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-p", "--plots", metavar="DIR",
+                        help="also render the report plots into DIR")
+    parser.add_argument("--stats", action="store_true",
+                        help="print one-pass summary statistics of the three outputs")
+    args = parser.parse_args()
+
+    lookup = build_lookup()
+
+    aggregates = EmployeeAggregates() if args.plots else None
+    summaries = {name: FrameSummary() for name in ['emp', 'prtrb', 'smpl']} if args.stats else {}
+    observers = {name: [s] for name, s in summaries.items()}
+    if aggregates is not None:
+        observers.setdefault('emp', []).append(aggregates)
+
+    start = time.perf_counter()
+    rows = synthesize_stream(args.num_employees, lookup,
+                             emp_path=f"employee_data.{args.format}",
+                             prtrb_path=f"perturbed_data.{args.format}",
+                             smpl_path=f"sampled_data.{args.format}",
+                             sample_size=args.sample_size, seed=args.seed,
+                             batch_size=args.batch_size, observers=observers)
+    if aggregates is not None:
+        render_report(aggregates, args.plots)
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {rows:,} employees (+ perturbed copy and {args.sample_size}-row sample)")
+    print(f"Elapsed Time: {elapsed:0.4} seconds ({rows / elapsed:,.0f} rows/sec)")
+
+    for name, summary in summaries.items():
+        print(f"\n--- {name} summary ---")
+        print(summary.describe())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# DataEng S25 - Data Synthesis: headless, parallel plot report
+# plots are drawn from small mergeable aggregates (counts and binned salary
+# histograms) instead of raw rows, so rendering cost does not grow with N
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+SALARY_BIN = 500  # dollars per salary histogram bin
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+HASH_FILE = '.report_hash'
+
+
+# counts and histograms behind the six report plots; update() it batch by
+# batch or merge() the aggregates of several shards
+class EmployeeAggregates:
+    def __init__(self):
+        self.rows = 0
+        self.country = pd.Series(dtype='int64')
+        self.department = pd.Series(dtype='int64')
+        self.hire_day = pd.Series(0, index=DAYS_ORDER, dtype='int64')
+        self.birth_year = pd.Series(dtype='int64')
+        # department x salary bin counts, bin i covers [i * SALARY_BIN, (i + 1) * SALARY_BIN)
+        self.salary_hist = pd.DataFrame(dtype='int64')
+
+    @staticmethod
+    def _add(a, b):
+        return a.add(b, fill_value=0).astype('int64')
+
+    def update(self, emp_df):
+        self.rows += len(emp_df)
+        self.country = self._add(self.country, emp_df['CountryOfBirth'].value_counts())
+        self.department = self._add(self.department, emp_df['department'].value_counts())
+        hire = pd.to_datetime(emp_df['hiredate'])
+        self.hire_day = self._add(self.hire_day, hire.dt.day_name().value_counts())
+        self.birth_year = self._add(self.birth_year, pd.to_datetime(emp_df['birthdate']).dt.year.value_counts())
+
+        bins = (emp_df['salary'].to_numpy() // SALARY_BIN).astype('int64')
+        hist = pd.crosstab(np.asarray(emp_df['department'], dtype=object), bins)
+        self.salary_hist = self.salary_hist.add(hist, fill_value=0).fillna(0).astype('int64')
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for name in ['country', 'department', 'hire_day', 'birth_year']:
+            setattr(self, name, self._add(getattr(self, name), getattr(other, name)))
+        self.salary_hist = self.salary_hist.add(other.salary_hist, fill_value=0).fillna(0).astype('int64')
+        return self
+
+    # stable fingerprint of everything the plots are drawn from
+    def digest(self):
+        parts = [self.country.sort_index(), self.department.sort_index(), self.hire_day,
+                 self.birth_year.sort_index(), self.salary_hist.sort_index().sort_index(axis=1)]
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        h.update(repr(list(self.salary_hist.sort_index(axis=1).columns)).encode())
+        return h.hexdigest()
+
+
+# Gaussian KDE evaluated on the bin centers of a histogram; the bandwidth is
+# Scott's rule (std * n^-1/5) like seaborn's default, computed from the bins
+def binned_kde(counts, bin_width):
+    counts = np.asarray(counts, dtype='float64')
+    n = counts.sum()
+    centers = (np.arange(len(counts)) + 0.5) * bin_width
+    if n < 2:
+        return centers, np.zeros_like(centers)
+    mean = (counts * centers).sum() / n
+    std = np.sqrt((counts * (centers - mean) ** 2).sum() / (n - 1))
+    bw = max(std * n ** -0.2, bin_width) / bin_width  # in bins
+    half = int(np.ceil(4 * bw))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) / bw) ** 2)
+    kernel /= kernel.sum() * bin_width
+    padded = np.concatenate([np.zeros(half), counts, np.zeros(half)])
+    x = (np.arange(len(padded)) - half + 0.5) * bin_width
+    return x, np.convolve(padded, kernel, mode='same') / n
+
+
+# salary histogram with every bin between the lowest and highest filled one,
+# plus the salary where its first bin starts
+def _salary_axis(salary_hist):
+    cols = salary_hist.columns.astype('int64')
+    if len(cols) == 0:
+        return 0, salary_hist
+    full = np.arange(cols.min(), cols.max() + 1)
+    return full[0] * SALARY_BIN, salary_hist.reindex(columns=full, fill_value=0)
+
+
+def _bar(counts, title, fname, figsize=(12, 6)):
+    plt.figure(figsize=figsize)
+    sns.barplot(x=counts.index, y=counts.values)
+    plt.title(title)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(fname)
+    plt.close()
+
+
+# A. Country of Birth bar chart
+def plot_country(aggs, outdir):
+    _bar(aggs.country.sort_values(ascending=False), 'Employee Count by Country of Birth',
+         os.path.join(outdir, 'country_of_birth.png'))
+
+
+# B. Department bar chart
+def plot_department(aggs, outdir):
+    _bar(aggs.department.sort_values(ascending=False), 'Employee Count by Department',
+         os.path.join(outdir, 'department_counts.png'))
+
+
+# C. Day of week hiring bar chart
+def plot_hire_day(aggs, outdir):
+    _bar(aggs.hire_day.reindex(DAYS_ORDER), 'Employee Hires by Day of Week',
+         os.path.join(outdir, 'hire_day_counts.png'))
+
+
+# D. Salary KDE plot
+def plot_salary_kde(aggs, outdir):
+    offset, hist = _salary_axis(aggs.salary_hist)
+    x, density = binned_kde(hist.sum(axis=0).to_numpy(), SALARY_BIN)
+    plt.figure(figsize=(12, 6))
+    plt.plot(x + offset, density)
+    plt.title('Salary Distribution')
+    plt.xlabel('Salary')
+    plt.ylabel('Density')
+    plt.tight_layout()
+    plt.savefig(os.path.join(outdir, 'salary_kde.png'))
+    plt.close()
+
+
+# E. Birth year line plot
+def plot_birth_year(aggs, outdir):
+    counts = aggs.birth_year.sort_index()
+    plt.figure(figsize=(12, 6))
+    plt.plot(counts.index, counts.values)
+    plt.title('Employee Birth Years Distribution')
+    plt.xlabel('Birth Year')
+    plt.ylabel('Number of Employees')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(os.path.join(outdir, 'birth_year_distribution.png'))
+    plt.close()
+
+
+# F. Department salary KDE plots; like seaborn's hue KDE each curve is scaled
+# by its department's share so the areas add up to one
+def plot_department_salary_kde(aggs, outdir):
+    offset, hist = _salary_axis(aggs.salary_hist)
+    total = hist.to_numpy().sum()
+    plt.figure(figsize=(15, 8))
+    for dept, counts in hist.iterrows():
+        x, density = binned_kde(counts.to_numpy(), SALARY_BIN)
+        plt.plot(x + offset, density * counts.sum() / total, label=dept)
+    plt.title('Salary Distribution by Department')
+    plt.xlabel('Salary')
+    plt.ylabel('Density')
+    plt.legend(title='Department', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig(os.path.join(outdir, 'department_salary_kde.png'))
+    plt.close()
+
+
+PLOTS = {
+    'country_of_birth.png': plot_country,
+    'department_counts.png': plot_department,
+    'hire_day_counts.png': plot_hire_day,
+    'salary_kde.png': plot_salary_kde,
+    'birth_year_distribution.png': plot_birth_year,
+    'department_salary_kde.png': plot_department_salary_kde,
+}
+
+
+def _render(plot, aggs, outdir):
+    plt.style.use('default')
+    plot(aggs, outdir)
+
+
+# render every plot in a process pool; unless `force` is set the plots are
+# left alone when the aggregates hash to the value stored by the last run
+# returns True if the plots were (re)rendered
+def render_report(aggs, outdir='plots', workers=None, force=False):
+    os.makedirs(outdir, exist_ok=True)
+    digest = aggs.digest()
+    hash_path = os.path.join(outdir, HASH_FILE)
+    if not force and os.path.exists(hash_path) and \
+            all(os.path.exists(os.path.join(outdir, f)) for f in PLOTS):
+        with open(hash_path) as f:
+            if f.read().strip() == digest:
+                return False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(_render, plot, aggs, outdir) for plot in PLOTS.values()]:
+            future.result()
+
+    with open(hash_path, 'w') as f:
+        f.write(digest)
+    return True
@@ -0,0 +1,109 @@
+# DataEng S25 - Data Synthesis: compiled department/role/salary lookup
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# read the two input tables and turn percentages/dollar amounts into floats
+def load_tables(departments_csv='departments_roles.csv', roles_csv='roles_and_salaries.csv'):
+    departments_df = pd.read_csv(departments_csv)
+    roles_df = pd.read_csv(roles_csv)
+    departments_df['% of employees'] = departments_df['% of employees'].str.rstrip('%').astype(float) / 100.0
+    roles_df['Lower'] = roles_df['Lower'].replace(r'[\$,]', '', regex=True).astype(float)
+    roles_df['Upper'] = roles_df['Upper'].replace(r'[\$,]', '', regex=True).astype(float)
+    return departments_df, roles_df
+
+
+# integer-coded departments and roles with array-backed salary bounds
+# roles are stored grouped by department: the roles of department d are
+# role_names[role_start[d]:role_start[d] + role_count[d]]
+@dataclass(frozen=True)
+class RoleLookup:
+    dept_names: np.ndarray
+    dept_p: np.ndarray
+    role_names: np.ndarray
+    role_dept: np.ndarray
+    role_start: np.ndarray
+    role_count: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+    # department codes by distribution, then a role code of that department uniformly
+    def assign(self, rng, n):
+        dept = rng.choice(len(self.dept_names), size=n, p=self.dept_p)
+        role = self.role_start[dept] + (rng.random(n) * self.role_count[dept]).astype('int64')
+        return dept, role
+
+    # whole-dollar salary drawn uniformly from each role's bounds
+    def salaries(self, rng, role):
+        return rng.uniform(self.lower[role], self.upper[role]).astype('int64')
+
+    # expected salary of one employee: department share x mean of its roles' range midpoints
+    def expected_salary(self):
+        midpoint = (self.lower + self.upper) / 2
+        per_dept = np.bincount(self.role_dept, weights=midpoint) / self.role_count
+        return float((self.dept_p * per_dept).sum())
+
+
+# check the cleaned tables and raise ValueError describing every problem found
+def validate_tables(departments_df, roles_df, tol=1e-6):
+    problems = []
+    for name, df, cols in [('departments', departments_df, ['Department', '% of employees']),
+                           ('roles', roles_df, ['Department', 'Role', 'Lower', 'Upper'])]:
+        missing = [c for c in cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"{name} table is missing columns {missing}")
+
+    total = departments_df['% of employees'].sum()
+    if abs(total - 1.0) > tol:
+        problems.append(f"department percentages sum to {total:.4%}, not 100%")
+    if departments_df['% of employees'].isna().any() or (departments_df['% of employees'] < 0).any():
+        problems.append("department percentages must be present and non-negative")
+    if departments_df['Department'].duplicated().any():
+        problems.append(f"duplicate departments: {sorted(departments_df.loc[departments_df['Department'].duplicated(), 'Department'])}")
+
+    if roles_df['Role'].duplicated().any():
+        problems.append(f"duplicate roles: {sorted(roles_df.loc[roles_df['Role'].duplicated(), 'Role'])}")
+    no_bounds = roles_df[roles_df[['Lower', 'Upper']].isna().any(axis=1)]
+    if len(no_bounds):
+        problems.append(f"roles without salary bounds: {sorted(no_bounds['Role'])}")
+    inverted = roles_df[roles_df['Lower'] > roles_df['Upper']]
+    if len(inverted):
+        problems.append(f"roles with Lower > Upper: {sorted(inverted['Role'])}")
+
+    depts = set(departments_df['Department'])
+    unknown = sorted(set(roles_df['Department']) - depts)
+    if unknown:
+        problems.append(f"roles reference unknown departments: {unknown}")
+    empty = sorted(depts - set(roles_df['Department']))
+    if empty:
+        problems.append(f"departments without roles: {empty}")
+
+    if problems:
+        raise ValueError("invalid synthesis tables:\n  " + "\n  ".join(problems))
+
+
+# build the lookup once from the cleaned tables
+def compile_lookup(departments_df, roles_df):
+    validate_tables(departments_df, roles_df)
+    dept_names = departments_df['Department'].to_numpy()
+    role_dept = pd.Categorical(roles_df['Department'], categories=dept_names).codes
+    order = np.argsort(role_dept, kind='stable')
+    role_dept = role_dept[order].astype('int64')
+    role_count = np.bincount(role_dept, minlength=len(dept_names))
+    return RoleLookup(
+        dept_names=dept_names,
+        dept_p=departments_df['% of employees'].to_numpy(dtype='float64'),
+        role_names=roles_df['Role'].to_numpy()[order],
+        role_dept=role_dept,
+        role_start=np.concatenate([[0], np.cumsum(role_count)[:-1]]),
+        role_count=role_count,
+        lower=roles_df['Lower'].to_numpy(dtype='float64')[order],
+        upper=roles_df['Upper'].to_numpy(dtype='float64')[order],
+    )
+
+
+# load, validate and compile departments_roles.csv + roles_and_salaries.csv
+def build_lookup(departments_csv='departments_roles.csv', roles_csv='roles_and_salaries.csv'):
+    return compile_lookup(*load_tables(departments_csv, roles_csv))
@@ -0,0 +1,184 @@
+# DataEng S25 - Data Synthesis: one-pass, mergeable summary statistics
+# a stand-in for describe(include='all') that scans each batch once and can be
+# merged across batches/shards:
+#   count, mean, std, min, max   exact (Chan/Welford moment merging)
+#   quantiles                    approximate, from a bottom-k random sample
+#   unique                       approximate, HyperLogLog
+import numpy as np
+import pandas as pd
+
+HLL_P = 14            # 2**14 registers, ~0.8% relative error on distinct counts
+QUANTILE_SAMPLE = 8192
+STATS_STREAM = 5      # random stream tag, kept apart from the ones in synth.py
+
+
+# HyperLogLog distinct-count sketch over 64-bit pandas hashes
+class HyperLogLog:
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype='uint8')
+
+    # categoricals hash their categories once and broadcast through the codes
+    def update(self, values):
+        if len(values) == 0:
+            return
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            h = pd.util.hash_array(np.asarray(values.cat.categories))[values.cat.codes.to_numpy()]
+        else:
+            h = pd.util.hash_array(values.to_numpy())
+        idx = (h >> np.uint64(64 - self.p)).astype('int64')
+        w = h & np.uint64((1 << (64 - self.p)) - 1)
+        # bit length of w via bit smearing + popcount; rank = leading zeros + 1
+        for shift in (1, 2, 4, 8, 16, 32):
+            w |= w >> np.uint64(shift)
+        rank = (64 - self.p) - np.bitwise_count(w).astype('int64') + 1
+        np.maximum.at(self.registers, idx, rank.astype('uint8'))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(2.0 ** -self.registers.astype('float64'))
+        zeros = np.count_nonzero(self.registers == 0)
+        if est <= 2.5 * m and zeros:
+            est = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(est))
+
+
+# uniform sample of at most k values kept by smallest random priority; two
+# samples merge exactly by keeping the k smallest priorities of their union
+class BottomKSample:
+    def __init__(self, k=QUANTILE_SAMPLE, rng=None):
+        self.k = k
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.values = np.empty(0)
+        self.priority = np.empty(0)
+
+    def _keep(self, values, priority):
+        if len(priority) > self.k:
+            keep = np.argpartition(priority, self.k)[:self.k]
+            values, priority = values[keep], priority[keep]
+        self.values, self.priority = values, priority
+
+    def update(self, values):
+        priority = self.rng.random(len(values))
+        if len(self.priority) == self.k:
+            keep = priority < self.priority.max()
+            values, priority = values[keep], priority[keep]
+        self._keep(np.concatenate([self.values, values]), np.concatenate([self.priority, priority]))
+
+    def merge(self, other):
+        self._keep(np.concatenate([self.values, other.values]),
+                   np.concatenate([self.priority, other.priority]))
+
+    def quantiles(self, qs):
+        if len(self.values) == 0:
+            return [np.nan] * len(qs)
+        return np.quantile(self.values, qs).tolist()
+
+
+# running statistics of one column
+class ColumnStats:
+    def __init__(self, kind, rng):
+        self.kind = kind  # 'numeric', 'datetime' or 'other'
+        self.count = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.distinct = HyperLogLog()
+        self.sample = BottomKSample(rng=rng) if kind != 'other' else None
+
+    def _merge_moments(self, n, mean, m2, lo, hi):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    def update(self, series):
+        present = series.dropna()
+        self.count += len(present)
+        self.distinct.update(present)
+        if self.kind == 'other' or len(present) == 0:
+            return
+        if self.kind == 'datetime':
+            x = present.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+        else:
+            x = present.to_numpy(dtype='float64')
+        mean = x.mean()
+        self._merge_moments(len(x), mean, ((x - mean) ** 2).sum(), x.min(), x.max())
+        self.sample.update(x)
+
+    def merge(self, other):
+        self.count += other.count
+        self.distinct.merge(other.distinct)
+        if self.kind != 'other':
+            self._merge_moments(other.n, other.mean, other.m2, other.min, other.max)
+            self.sample.merge(other.sample)
+
+    def describe(self, percentiles):
+        out = {'count': self.count, 'unique': self.distinct.estimate()}
+        if self.kind == 'other' or self.n == 0:
+            return out
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+        values = [self.mean, self.min] + self.sample.quantiles(percentiles) + [self.max]
+        if self.kind == 'datetime':
+            values = [pd.Timestamp(int(v)) for v in values]
+            std = pd.Timedelta(int(std)) if not np.isnan(std) else pd.NaT
+        out['mean'], out['min'] = values[0], values[1]
+        out['std'] = std
+        for p, v in zip(percentiles, values[2:-1]):
+            out[f'{p:.0%}'] = v
+        out['max'] = values[-1]
+        return out
+
+
+def _kind(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'other'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    return 'other'
+
+
+# one-pass summary of a whole (possibly batched) DataFrame
+#   stats = FrameSummary(); for batch in batches: stats.update(batch)
+#   print(stats.describe())
+class FrameSummary:
+    def __init__(self, percentiles=(.25, .5, .75), seed=42):
+        self.percentiles = list(percentiles)
+        self.rng = np.random.default_rng([seed, STATS_STREAM])
+        self.columns = {}
+
+    def update(self, df):
+        for name in df.columns:
+            if name not in self.columns:
+                self.columns[name] = ColumnStats(_kind(df[name].dtype), self.rng)
+            self.columns[name].update(df[name])
+        return self
+
+    def merge(self, other):
+        for name, col in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(col)
+            else:
+                self.columns[name] = col
+        return self
+
+    # describe()-shaped table; quantiles and unique counts are approximate
+    def describe(self):
+        index = ['count', 'unique', 'mean', 'std', 'min'] + \
+            [f'{p:.0%}' for p in self.percentiles] + ['max']
+        table = pd.DataFrame({name: col.describe(self.percentiles)
+                              for name, col in self.columns.items()}, dtype=object)
+        return table.reindex(index)
@@ -0,0 +1,408 @@
+# DataEng S25 - Data Synthesis: vectorized employee generation
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+from faker.providers.person.en_US import Provider as PersonProvider
+
+from summary_stats import FrameSummary
+
+FIRST_ID = 100000000
+GENDERS = ['female', 'male', 'nonbinary']
+GENDER_P = [0.49, 0.49, 0.02]
+COUNTRIES = ['USA', 'India', 'China', 'Mexico', 'Canada', 'Philippines', 'Taiwan', 'South Korea']
+COUNTRY_P = [0.6, 0.1, 0.08, 0.06, 0.05, 0.04, 0.04, 0.03]
+MAX_HIRE_DATE = pd.Timestamp("2025-06-01")
+CURRENT_DATE = pd.Timestamp("2024-06-01")  # reference date for ages
+MIN_AGE, MAX_AGE = 20, 65
+
+# Faker's en_US name tables, drawn from with their own frequencies; the email
+# local part is precomputed per table entry the same way the loop builds it
+FIRST_NAMES = np.array(list(PersonProvider.first_names))
+FIRST_NAME_P = np.array(list(PersonProvider.first_names.values()))
+FIRST_NAME_P /= FIRST_NAME_P.sum()
+LAST_NAMES = np.array(list(PersonProvider.last_names))
+LAST_NAME_P = np.array(list(PersonProvider.last_names.values()))
+LAST_NAME_P /= LAST_NAME_P.sum()
+FIRST_EMAIL = np.strings.replace(np.strings.lower(FIRST_NAMES), ' ', '.')
+LAST_EMAIL = np.strings.replace(np.strings.lower(LAST_NAMES), ' ', '.')
+
+# independent random streams derived from one seed: default_rng([seed, STREAM, ...]);
+# the tags are non-zero because SeedSequence treats [seed, 0] like plain seed
+ROWS_STREAM, SSN_STREAM, NOISE_STREAM, SAMPLE_STREAM = 1, 2, 3, 4
+
+# rows are drawn in fixed blocks of ROW_BLOCK employees, block b from
+# default_rng([seed, ROWS_STREAM, b]), so a row depends only on the seed and
+# its position, never on batch sizes, shard counts or workers; changing it
+# changes every generated dataset
+ROW_BLOCK = 10_000
+
+# fewest shards written by generate_sharded when none are asked for; with
+# more workers than that it writes one shard per worker so every core is busy
+# (the rows are the same either way, only the file split changes)
+DEFAULT_SHARDS = 8
+
+# valid SSNs: area 001-899 except 666, group 01-99, serial 0001-9999
+SSN_AREAS = np.array([a for a in range(1, 900) if a != 666])
+SSN_SPACE = len(SSN_AREAS) * 99 * 9999
+
+
+# zero-padded decimal strings for a non-negative integer array, built digit by
+# digit as code points and viewed as a fixed-width unicode array
+def _digits(values, width):
+    v = np.asarray(values, dtype='int64')
+    out = np.empty((len(v), width), dtype='uint32')
+    for i in range(width - 1, -1, -1):
+        v, d = np.divmod(v, 10)
+        out[:, i] = d + ord('0')
+    return out.view(f'U{width}').ravel()
+
+
+# elementwise concatenation of string arrays and literals
+def _concat(*parts):
+    out = parts[0]
+    for part in parts[1:]:
+        out = np.strings.add(out, part)
+    return out
+
+
+# n distinct SSNs for the employee numbers `seq` (0, 1, 2, ...)
+# seq -> (seq * mult + shift) mod SSN_SPACE is a bijection because mult is
+# coprime to the space size, so distinct employees never share an SSN and no
+# set of already-issued numbers has to be kept (for up to SSN_SPACE employees)
+def ssn_for(seq, seed):
+    seq = np.asarray(seq, dtype='int64')
+    if len(seq) and seq.max() >= SSN_SPACE:
+        raise ValueError(f"at most {SSN_SPACE:,} employees can get distinct SSNs")
+    rng = np.random.default_rng([seed, SSN_STREAM])
+    mult = int(rng.integers(SSN_SPACE // 3, SSN_SPACE))
+    while np.gcd(mult, SSN_SPACE) != 1:
+        mult += 1
+    shift = int(rng.integers(0, SSN_SPACE))
+
+    # seq and mult are both below ~9e8, so the product fits in int64
+    code = (seq * mult + shift) % SSN_SPACE
+    code, serial = np.divmod(code, 9999)
+    area, group = np.divmod(code, 99)
+    return _concat(_digits(SSN_AREAS[area], 3), '-', _digits(group + 1, 2), '-',
+                   _digits(serial + 1, 4))
+
+
+# one phone number per row in a few common US layouts
+def phones(rng, n):
+    area = _digits(rng.integers(200, 1000, size=n), 3)
+    exchange = _digits(rng.integers(200, 1000, size=n), 3)
+    line = _digits(rng.integers(0, 10000, size=n), 4)
+    layouts = [
+        _concat(area, '-', exchange, '-', line),
+        _concat('(', area, ')', exchange, '-', line),
+        _concat(area, '.', exchange, '.', line),
+        _concat('+1-', area, '-', exchange, '-', line),
+    ]
+    pick = rng.integers(0, len(layouts), size=n)
+    return np.choose(pick, [l.astype('U15') for l in layouts])
+
+
+# employees start..start+n-1, every column drawn as a whole array per
+# ROW_BLOCK block; employee i is the same row whichever range it is asked in,
+# so batches and shards of one dataset line up with a single generate call
+# ssn_seed picks the SSN mapping and must be shared by every batch/shard of
+# one dataset (it defaults to seed)
+def generate_employees(n, lookup, seed=42, start=0, today=None, ssn_seed=None):
+    today = pd.Timestamp(today or date.today())
+    ssn_seed = seed if ssn_seed is None else ssn_seed
+    first, stop = start // ROW_BLOCK, max(-(-(start + n) // ROW_BLOCK), start // ROW_BLOCK + 1)
+    parts = []
+    for block in range(first, stop):
+        rows = _employee_block(np.random.default_rng([seed, ROWS_STREAM, block]), lookup,
+                               block * ROW_BLOCK, today, ssn_seed)
+        lo = max(start - block * ROW_BLOCK, 0)
+        hi = min(start + n - block * ROW_BLOCK, ROW_BLOCK)
+        parts.append(rows.iloc[lo:hi])
+    return pd.concat(parts, ignore_index=True)
+
+
+# all ROW_BLOCK employees of the block starting at employee number `start`
+def _employee_block(rng, lookup, start, today, ssn_seed):
+    n = ROW_BLOCK
+    seq = np.arange(start, start + n, dtype='int64')
+    employee_id = FIRST_ID + seq
+
+    # department by distribution, a role of that department, then its salary
+    dept, role = lookup.assign(rng, n)
+    salary = lookup.salaries(rng, role)
+
+    # birthdate between MAX_AGE+1 years ago (exclusive) and MIN_AGE years ago,
+    # hire date between the 20th birthday and MAX_HIRE_DATE
+    oldest = today - pd.DateOffset(years=MAX_AGE + 1) + pd.Timedelta(days=1)
+    youngest = today - pd.DateOffset(years=MIN_AGE)
+    birth = oldest + pd.to_timedelta(rng.integers(0, (youngest - oldest).days + 1, size=n), unit='D')
+    min_hire = pd.DatetimeIndex(birth) + pd.DateOffset(years=20)
+    min_hire = min_hire.where(min_hire <= MAX_HIRE_DATE, MAX_HIRE_DATE - pd.DateOffset(years=1))
+    span = (MAX_HIRE_DATE - min_hire).days.to_numpy()
+    hire = min_hire + pd.to_timedelta((rng.random(n) * (span + 1)).astype('int64'), unit='D')
+
+    # low-cardinality columns stay categorical, no per-row strings are built
+    gender = pd.Categorical.from_codes(rng.choice(len(GENDERS), size=n, p=GENDER_P), GENDERS)
+    country = pd.Categorical.from_codes(rng.choice(len(COUNTRIES), size=n, p=COUNTRY_P), COUNTRIES)
+
+    first = rng.choice(len(FIRST_NAMES), size=n, p=FIRST_NAME_P)
+    last = rng.choice(len(LAST_NAMES), size=n, p=LAST_NAME_P)
+    name = _concat(FIRST_NAMES[first], ' ', LAST_NAMES[last])
+    email = _concat(FIRST_EMAIL[first], '.', LAST_EMAIL[last],
+                    (employee_id % 10000).astype('U4'), '@example.com')
+
+    return pd.DataFrame({
+        'employeeID': employee_id,
+        'CountryOfBirth': country,
+        'name': name,
+        'phone': phones(rng, n),
+        'email': email,
+        'gender': gender,
+        'birthdate': pd.DatetimeIndex(birth).normalize(),
+        'hiredate': pd.DatetimeIndex(hire).normalize(),
+        'department': pd.Categorical.from_codes(dept, lookup.dept_names),
+        'role': pd.Categorical.from_codes(role, lookup.role_names),
+        'salary': salary,
+        'SSID': ssn_for(seq, ssn_seed),
+    })
+
+
+# split n employees into `shards` contiguous (start, count) ranges
+def shard_ranges(n, shards):
+    bounds = np.linspace(0, n, shards + 1).astype('int64')
+    return [(int(a), int(b - a)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+# appends DataFrame batches to one CSV or Parquet file (picked by extension)
+# so that only the current batch is ever held in memory
+class BatchWriter:
+    def __init__(self, fname):
+        self.fname = fname
+        self.parquet = fname.endswith('.parquet')
+        self.writer = None
+        self.rows = 0
+
+    def write(self, batch):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.fname, table.schema)
+            self.writer.write_table(table.cast(self.writer.schema))
+        else:
+            batch.to_csv(self.fname, mode='w' if self.rows == 0 else 'a',
+                         header=self.rows == 0, index=False)
+        self.rows += len(batch)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# employees `batch_size` rows at a time; the rows do not depend on batch_size
+def iter_employee_batches(n, lookup, seed=42, batch_size=100_000,
+                          start=0, today=None, ssn_seed=None):
+    today = pd.Timestamp(today or date.today())
+    for offset in range(0, n, batch_size):
+        yield generate_employees(min(batch_size, n - offset), lookup,
+                                 seed=seed, start=start + offset, today=today,
+                                 ssn_seed=ssn_seed)
+
+
+# one shard: generate its employee range batch by batch and append to its own file
+# with `stats` the shard also returns its FrameSummary for merging
+def _write_shard(fname, start, count, seed, summary_seed, batch_size, lookup, today, stats):
+    summary = FrameSummary(seed=summary_seed) if stats else None
+    with BatchWriter(fname) as out:
+        for batch in iter_employee_batches(count, lookup, seed=seed,
+                                           batch_size=batch_size, start=start, today=today):
+            out.write(batch)
+            if summary is not None:
+                summary.update(batch)
+    return fname, out.rows, summary
+
+
+# generate n employees in a process pool, one output file per shard
+# each shard is a contiguous range of the same row blocks a single process
+# would generate, so the rows (in shard order) depend only on n and seed, not
+# on the shard count, batch size or number of workers
+# shards defaults to max(DEFAULT_SHARDS, workers)
+# returns (file, rows, FrameSummary or None) per shard
+def generate_sharded(n, outdir, lookup, seed=42, shards=None,
+                     workers=None, batch_size=500_000, today=None, fmt='csv', stats=False):
+    workers = workers or os.cpu_count()
+    shards = shards or max(DEFAULT_SHARDS, workers)
+    today = pd.Timestamp(today or date.today())
+    summary_seeds = [int(ss.generate_state(1)[0]) for ss in np.random.SeedSequence(seed).spawn(shards)]
+    os.makedirs(outdir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_write_shard, os.path.join(outdir, f'employees-{i:05d}.{fmt}'),
+                        start, count, seed, summary_seeds[i], batch_size, lookup, today, stats)
+            for i, (start, count) in enumerate(shard_ranges(n, shards))
+        ]
+        return [f.result() for f in futures]
+
+
+# whole years between each birthdate and `current_date`
+def ages(birthdates, current_date=CURRENT_DATE):
+    return ((current_date - pd.to_datetime(birthdates)).dt.days / 365.25).astype(int)
+
+
+# the age-biased sampling weights used for smpl_df: 40-49 year olds count 3x
+def age_weights(batch, current_date=CURRENT_DATE):
+    age = ages(batch['birthdate'], current_date).to_numpy()
+    weights = np.ones(len(batch))
+    weights[(age >= 40) & (age < 50)] = 3
+    return weights
+
+
+# weighted sampling without replacement over a stream of batches
+# (Efraimidis-Spirakis A-ES: keep the k rows with the largest log(u)/w), so
+# the sample is drawn like DataFrame.sample(weights=...) without holding
+# more than k rows plus one batch
+class WeightedReservoir:
+    def __init__(self, k, seed=42):
+        self.k = k
+        self.rng = np.random.default_rng([seed, SAMPLE_STREAM])
+        self.rows = None
+        self.keys = np.empty(0)
+
+    def update(self, batch, weights):
+        keys = np.log(self.rng.random(len(batch))) / np.asarray(weights, dtype='float64')
+        if len(self.keys) == self.k:
+            # only rows that beat the current k-th key can enter
+            keep = keys > self.keys.min()
+            batch, keys = batch[keep], keys[keep]
+        if len(batch) == 0:
+            return
+        rows = batch if self.rows is None else pd.concat([self.rows, batch])
+        keys = np.concatenate([self.keys, keys])
+        if len(keys) > self.k:
+            top = np.argpartition(keys, len(keys) - self.k)[len(keys) - self.k:]
+            rows, keys = rows.iloc[top], keys[top]
+        self.rows, self.keys = rows, keys
+
+    def sample(self):
+        if self.rows is None:
+            return pd.DataFrame()
+        return self.rows.iloc[np.argsort(-self.keys, kind='stable')]
+
+
+# stream n employees straight to emp_path, producing the perturbed-salary
+# copy (prtrb_path) and the age-biased sample (smpl_path) from the same
+# batches; peak memory is one batch plus the sample, whatever n is
+# the salary noise is N(0, noise * mean salary); the mean is the expected
+# salary from the role tables so the perturbed rows can be written before the
+# whole stream has been seen (it matches the sample mean to well under 1%)
+# `observers` maps 'emp', 'prtrb' and 'smpl' to objects with an update(frame)
+# method (report.EmployeeAggregates, summary_stats.FrameSummary) that see
+# every batch of that output
+def synthesize_stream(n, lookup, emp_path, prtrb_path=None,
+                      smpl_path=None, sample_size=500, seed=42, batch_size=100_000,
+                      noise=0.05, current_date=CURRENT_DATE, today=None, observers=None):
+    observers = observers or {}
+    std_dev = lookup.expected_salary() * noise
+    noise_rng = np.random.default_rng([seed, NOISE_STREAM])
+    reservoir = WeightedReservoir(sample_size, seed)
+    emp_out = BatchWriter(emp_path)
+    prtrb_out = BatchWriter(prtrb_path) if prtrb_path else None
+
+    try:
+        for batch in iter_employee_batches(n, lookup, seed=seed,
+                                           batch_size=batch_size, today=today):
+            emp_out.write(batch)
+            for obs in observers.get('emp', []):
+                obs.update(batch)
+            if prtrb_out:
+                prtrb = batch.copy()
+                prtrb['salary'] = (prtrb['salary'] + noise_rng.normal(0, std_dev, size=len(batch))).round(2)
+                prtrb_out.write(prtrb)
+                for obs in observers.get('prtrb', []):
+                    obs.update(prtrb)
+            if smpl_path:
+                batch['age'] = ages(batch['birthdate'], current_date)
+                reservoir.update(batch, age_weights(batch, current_date))
+    finally:
+        emp_out.close()
+        if prtrb_out:
+            prtrb_out.close()
+
+    if smpl_path:
+        smpl_df = reservoir.sample()
+        with BatchWriter(smpl_path) as smpl_out:
+            smpl_out.write(smpl_df)
+        for obs in observers.get('smpl', []):
+            obs.update(smpl_df)
+    return emp_out.rows
+
+
+# original per-employee loop, kept for benchmarks and comparisons
+def generate_employees_loop(n, departments_df, roles_df, seed=42):
+    faker = Faker('en_US')
+    Faker.seed(seed)
+    np.random.seed(seed)
+    random.seed(seed)
+
+    department_choices = np.random.choice(
+        departments_df['Department'],
+        size=n,
+        p=departments_df['% of employees'].values
+    )
+    dept_roles_map = roles_df.groupby('Department')['Role'].apply(list).to_dict()
+    salary_bounds = roles_df.set_index('Role')[['Lower', 'Upper']].to_dict(orient='index')
+
+    employees = []
+    for i in range(n):
+        employee_id = FIRST_ID + i
+        department = department_choices[i]
+        role = random.choice(dept_roles_map[department])
+        salary_range = salary_bounds[role]
+        salary = int(np.random.uniform(salary_range['Lower'], salary_range['Upper']))
+
+        birthdate = faker.date_of_birth(minimum_age=MIN_AGE, maximum_age=MAX_AGE)
+        min_hire_date = pd.to_datetime(birthdate) + pd.DateOffset(years=20)
+        max_hire_date = MAX_HIRE_DATE
+
+        if min_hire_date > max_hire_date:
+            min_hire_date = max_hire_date - pd.DateOffset(years=1)
+
+        hiredate = faker.date_between_dates(date_start=min_hire_date,
+                                            date_end=max_hire_date)
+
+        gender = np.random.choice(GENDERS, p=GENDER_P)
+        country = np.random.choice(COUNTRIES, p=COUNTRY_P)
+
+        name = faker.name()
+        phone = faker.phone_number()
+        ssid = faker.unique.ssn()
+        email = f"{name.lower().replace(' ', '.').replace(',', '')}{employee_id % 10000}@example.com"
+
+        employees.append({
+            'employeeID': employee_id,
+            'CountryOfBirth': country,
+            'name': name,
+            'phone': phone,
+            'email': email,
+            'gender': gender,
+            'birthdate': birthdate,
+            'hiredate': hiredate,
+            'department': department,
+            'role': role,
+            'salary': salary,
+            'SSID': ssid
+        })
+    return pd.DataFrame(employees)
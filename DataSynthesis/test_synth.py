@@ -0,0 +1,55 @@
+# DataEng S25 - Data Synthesis: tests of the seeded, sharded employee generation
+# the same seed has to give the same rows however they are batched or sharded
+#   python -m pytest test_synth.py
+import os
+
+import pandas as pd
+import pytest
+
+from role_lookup import build_lookup
+from synth import DEFAULT_SHARDS, ROW_BLOCK, generate_employees, generate_sharded, iter_employee_batches
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TODAY = '2025-01-15'
+N = 2 * ROW_BLOCK + 1234  # spans three row blocks, the last one partly
+
+
+@pytest.fixture(scope='module')
+def lookup():
+    return build_lookup(os.path.join(HERE, 'departments_roles.csv'),
+                        os.path.join(HERE, 'roles_and_salaries.csv'))
+
+
+@pytest.fixture(scope='module')
+def whole(lookup):
+    return generate_employees(N, lookup, seed=7, today=TODAY).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('batch_size', [999, ROW_BLOCK, 3 * ROW_BLOCK])
+def test_batches_give_the_same_rows(lookup, whole, batch_size):
+    batches = pd.concat(iter_employee_batches(N, lookup, seed=7, batch_size=batch_size, today=TODAY),
+                        ignore_index=True)
+    pd.testing.assert_frame_equal(batches, whole)
+
+
+# shard files read back in shard order hold the rows of one unsharded run
+@pytest.mark.parametrize('shards,batch_size', [(1, 50_000), (3, 4_000), (7, 1_111)])
+def test_shards_give_the_same_rows(lookup, whole, tmp_path, shards, batch_size):
+    results = generate_sharded(N, str(tmp_path), lookup, seed=7, shards=shards, workers=2,
+                               batch_size=batch_size, today=TODAY, fmt='parquet')
+    assert len(results) == shards
+    sharded = pd.concat([pd.read_parquet(fname) for fname, _, _ in results], ignore_index=True)
+    pd.testing.assert_frame_equal(sharded, whole, check_dtype=False)
+
+
+# without a shard count every worker gets at least one shard
+@pytest.mark.parametrize('workers', [2, DEFAULT_SHARDS + 4])
+def test_default_shards_keep_every_worker_busy(lookup, tmp_path, workers):
+    results = generate_sharded(200, str(tmp_path), lookup, seed=7, workers=workers, today=TODAY)
+    assert len(results) == max(DEFAULT_SHARDS, workers)
+    assert sum(rows for _, rows, _ in results) == 200
+
+
+def test_other_seed_gives_other_rows(lookup, whole):
+    other = generate_employees(N, lookup, seed=8, today=TODAY).reset_index(drop=True)
+    assert not other.equals(whole)
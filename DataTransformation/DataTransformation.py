@@ -1,46 +1,58 @@
 # Vlad Chevdar | DataEng S25 - Data Transformation Lab Assignment
+# run it with -h to see the command line options
+import argparse
 import pandas as pd
-
-# 2. Filter
-trip_df = pd.read_csv(
-    'bc_trip259172515_230215.csv',
-    usecols=['EVENT_NO_TRIP', 
-             'OPD_DATE', 
-             'VEHICLE_ID', 
-             'METERS', 
-             'ACT_TIME', 
-             'GPS_LONGITUDE', 
-             'GPS_LATITUDE'
-            ]
-)
-
-print(f"Number of records: {len(trip_df)}")
-
-# 3. Decode
-trip_df['TIMESTAMP'] = (
-    pd.to_datetime(trip_df['OPD_DATE'].str[:9], format='%d%b%Y') +
-    pd.to_timedelta(trip_df['ACT_TIME'], unit='s')
-)
-
-trip_df = trip_df.drop(columns=['OPD_DATE', 'ACT_TIME'])
-
-# 3. Decode (cont)
-
-# 4. Enhance
-trip_df['dMETERS'] = trip_df['METERS'].diff()
-trip_df['dTIMESTAMP'] = trip_df['TIMESTAMP'].diff().dt.total_seconds()
-
-trip_df['SPEED'] = trip_df.apply(
-    lambda row: row['dMETERS'] / row['dTIMESTAMP'] if row['dTIMESTAMP'] and row['dTIMESTAMP'] > 0 else 0,
-    axis=1
-)
-
-trip_df = trip_df.drop(columns=['dMETERS', 'dTIMESTAMP'])
-
-min_speed = trip_df['SPEED'].min()
-max_speed = trip_df['SPEED'].max()
-avg_speed = trip_df['SPEED'].mean()
-
-print(f"Minimum speed: {min_speed} meters/second")
-print(f"Maximum speed: {max_speed} meters/second")
-print(f"Average speed: {avg_speed} meters/second")
+from breadcrumbs import (DTYPES, USECOLS, compute_speed, decode_timestamp, service_dates,
+                         stream_speed_stats, write_trips_parquet)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--datafile", default='bc_trip259172515_230215.csv')
+    parser.add_argument("-s", "--chunksize", type=int, default=0,
+                        help="stream the file this many rows at a time instead of loading it whole")
+    parser.add_argument("-i", "--interleaved", action="store_true",
+                        help="when streaming, carry every trip across chunks because the "
+                             "file does not keep each trip's rows together")
+    parser.add_argument("-o", "--outdir",
+                        help="write the enhanced trips to a Parquet dataset in this directory")
+    args = parser.parse_args()
+
+    if args.chunksize:
+        # Streaming: per-trip state is carried across chunks, only aggregates are kept
+        num_records, stats = stream_speed_stats(args.datafile, args.chunksize, args.outdir,
+                                                 sorted_input=not args.interleaved)
+        print(f"Number of records: {num_records}")
+        min_speed, max_speed, avg_speed = stats.min, stats.max, stats.mean
+    else:
+        # 2. Filter
+        trip_df = pd.read_csv(args.datafile, usecols=USECOLS, dtype=DTYPES)
+
+        print(f"Number of records: {len(trip_df)}")
+
+        # 3. Decode
+        service_date = service_dates(trip_df)
+        trip_df = decode_timestamp(trip_df)
+        trip_df['SERVICE_DATE'] = service_date
+
+        # 3. Decode (cont)
+
+        # 4. Enhance
+        # speeds are computed per trip and vehicle so they never leak across trips
+        trip_df['SPEED'] = compute_speed(trip_df)
+
+        min_speed = trip_df['SPEED'].min()
+        max_speed = trip_df['SPEED'].max()
+        avg_speed = trip_df['SPEED'].mean()
+
+        # 5. Store
+        if args.outdir:
+            write_trips_parquet(trip_df, args.outdir)
+
+    print(f"Minimum speed: {min_speed} meters/second")
+    print(f"Maximum speed: {max_speed} meters/second")
+    print(f"Average speed: {avg_speed} meters/second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# DataEng S25 - Data Transformation: TIMESTAMP decode microbenchmark
+# compares the cached OPD_DATE decode against the original per-row parse
+# run it with -h to see the command line options
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from breadcrumbs import decode_timestamp, decode_timestamp_rowwise
+
+
+# raw OPD_DATE/ACT_TIME columns as they appear in bc_trip*.csv
+def make_raw(nrows, ndates, categorical, seed=42):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2023-02-15', periods=ndates, freq='D')
+    labels = np.array([d.strftime('%d%b%Y').upper() + ':00:00:00' for d in days], dtype=object)
+    opd_date = labels[np.sort(rng.integers(0, ndates, size=nrows))]
+    return pd.DataFrame({
+        'OPD_DATE': pd.Categorical(opd_date) if categorical else opd_date,
+        'ACT_TIME': rng.integers(4 * 3600, 26 * 3600, size=nrows),
+    })
+
+
+def timed(fn, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(df.copy())
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument("--dates", type=int, default=2, help="distinct OPD_DATE values")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for nrows in args.rows:
+        raw = make_raw(nrows, args.dates, categorical=False)
+        cat = make_raw(nrows, args.dates, categorical=True)
+
+        old_time, old = timed(decode_timestamp_rowwise, raw, args.repeat)
+        new_time, new = timed(decode_timestamp, raw, args.repeat)
+        cat_time, cat_out = timed(decode_timestamp, cat, args.repeat)
+        assert (old['TIMESTAMP'].to_numpy() == new['TIMESTAMP'].to_numpy()).all()
+        assert (old['TIMESTAMP'].to_numpy() == cat_out['TIMESTAMP'].to_numpy()).all()
+
+        print(f"{nrows:,} rows")
+        for label, t in [("per-row parse", old_time),
+                         ("cached (strings)", new_time),
+                         ("cached (categorical)", cat_time)]:
+            print(f"  {label:<22} {t:8.3f} s  {nrows / t:14,.0f} rows/sec  {old_time / t:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# DataEng S25 - Data Transformation: SPEED benchmark
+# compares the vectorized per-trip speed kernel against the original apply()
+# run it with -h to see the command line options
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from breadcrumbs import compute_speed, compute_speed_apply
+
+
+# synthetic day of breadcrumbs: `trips` trips of roughly equal length,
+# one reading every ~5 seconds with a few duplicated timestamps
+def make_breadcrumbs(nrows, trips, seed=42):
+    rng = np.random.default_rng(seed)
+    trip_no = np.sort(rng.integers(0, trips, size=nrows))
+    step = rng.integers(0, 10, size=nrows)
+    meters = rng.uniform(0, 60, size=nrows)
+
+    df = pd.DataFrame({
+        'EVENT_NO_TRIP': 259000000 + trip_no,
+        'VEHICLE_ID': 3000 + trip_no % 700,
+        'METERS': meters,
+        'STEP': step,
+    })
+    df['METERS'] = df.groupby('EVENT_NO_TRIP')['METERS'].cumsum()
+    secs = df.groupby('EVENT_NO_TRIP')['STEP'].cumsum() + 4 * 3600
+    df['TIMESTAMP'] = pd.Timestamp('2023-02-15') + pd.to_timedelta(secs, unit='s')
+    return df.drop(columns=['STEP'])
+
+
+def timed(fn, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=2_000_000)
+    parser.add_argument("-t", "--trips", type=int, default=20_000)
+    parser.add_argument("--apply-rows", type=int, default=200_000,
+                        help="rows given to the slow apply() version")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_breadcrumbs(args.rows, args.trips)
+    small = df.head(args.apply_rows)
+
+    # single trip: both implementations must agree exactly
+    one = df[df['EVENT_NO_TRIP'] == df['EVENT_NO_TRIP'].iloc[0]].reset_index(drop=True)
+    assert np.allclose(compute_speed(one), compute_speed_apply(one), equal_nan=True)
+
+    apply_time = timed(compute_speed_apply, small, 1)
+    vec_time = timed(compute_speed, df, args.repeat)
+
+    print(f"apply():    {len(small):>12,} rows  {apply_time:8.3f} s  {len(small) / apply_time:14,.0f} rows/sec")
+    print(f"vectorized: {len(df):>12,} rows  {vec_time:8.3f} s  {len(df) / vec_time:14,.0f} rows/sec")
+    print(f"speedup: {(len(df) / vec_time) / (len(small) / apply_time):,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
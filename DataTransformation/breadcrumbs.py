@@ -0,0 +1,338 @@
+# DataEng S25 - Data Transformation: reusable breadcrumb helpers
+import os
+
+import numpy as np
+import pandas as pd
+
+# a trip is identified by its trip number and the vehicle that ran it
+TRIP_KEYS = ['EVENT_NO_TRIP', 'VEHICLE_ID']
+
+# columns kept from the raw bc_trip*.csv files
+USECOLS = ['EVENT_NO_TRIP',
+           'OPD_DATE',
+           'VEHICLE_ID',
+           'METERS',
+           'ACT_TIME',
+           'GPS_LONGITUDE',
+           'GPS_LATITUDE'
+          ]
+
+
+# a day file only has a handful of distinct OPD_DATE strings, so read them
+# as a categorical instead of materializing millions of string objects
+DTYPES = {'OPD_DATE': 'category'}
+
+
+# OPD_DATE + ACT_TIME -> TIMESTAMP, dropping the raw columns
+# every distinct OPD_DATE is parsed once and broadcast back through its code,
+# ACT_TIME (seconds past midnight) is then added as integer seconds
+def decode_timestamp(trip_df):
+    codes, dates = pd.factorize(trip_df['OPD_DATE'])
+    days = pd.to_datetime(pd.Index(dates, dtype=object).str[:9], format='%d%b%Y')
+    days = np.append(days.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    base = days[codes]  # code -1 (missing OPD_DATE) picks the trailing NaT
+
+    act_time = trip_df['ACT_TIME']
+    if pd.api.types.is_integer_dtype(act_time.dtype):
+        offset = act_time.to_numpy(dtype='int64').astype('timedelta64[s]')
+    else:
+        offset = pd.to_timedelta(act_time, unit='s').to_numpy(dtype='timedelta64[ns]')
+
+    trip_df['TIMESTAMP'] = base + offset
+    return trip_df.drop(columns=['OPD_DATE', 'ACT_TIME'])
+
+
+# service day of each breadcrumb as 'YYYY-MM-DD'; taken from OPD_DATE when it
+# is still there because ACT_TIME runs past midnight on late trips
+def service_dates(trip_df):
+    if 'OPD_DATE' in trip_df.columns:
+        codes, dates = pd.factorize(trip_df['OPD_DATE'])
+        days = pd.to_datetime(pd.Index(dates, dtype=object).str[:9], format='%d%b%Y')
+        return pd.Categorical.from_codes(codes, days.strftime('%Y-%m-%d'))
+    return trip_df['TIMESTAMP'].dt.strftime('%Y-%m-%d')
+
+
+# original decode: parses the OPD_DATE string on every row
+def decode_timestamp_rowwise(trip_df):
+    trip_df['TIMESTAMP'] = (
+        pd.to_datetime(trip_df['OPD_DATE'].str[:9], format='%d%b%Y') +
+        pd.to_timedelta(trip_df['ACT_TIME'], unit='s')
+    )
+    return trip_df.drop(columns=['OPD_DATE', 'ACT_TIME'])
+
+
+# integer group code per row, numbered in order of first appearance
+def trip_codes(trip_df, keys=TRIP_KEYS):
+    return trip_df.groupby(list(keys), sort=False, dropna=False).ngroup().to_numpy()
+
+
+# TIMESTAMP column as float seconds since the epoch (NaT -> NaN)
+def epoch_seconds(timestamps):
+    ts = pd.Series(timestamps).to_numpy(dtype='datetime64[ns]')
+    secs = ts.astype('int64') / 1e9
+    secs[np.isnat(ts)] = np.nan
+    return secs
+
+
+# core speed kernel on plain arrays
+# rows are grouped by `codes`; within a group the file order is kept, the first
+# row of each group has no predecessor and gets speed 0, as do rows whose time
+# delta is zero, negative or missing
+# prev_meters/prev_seconds (indexed by code, NaN when unknown) supply the
+# predecessor of each group's first row, e.g. the last row of the previous chunk
+def speed_from_arrays(codes, meters, seconds, prev_meters=None, prev_seconds=None):
+    n = len(codes)
+    speed = np.zeros(n, dtype='float64')
+    if n == 0:
+        return speed
+
+    # breadcrumbs usually arrive one trip after another, so the sort is
+    # only needed when trips are interleaved
+    if np.all(codes[1:] >= codes[:-1]):
+        order = None
+        c, m, t = codes, meters, seconds
+    else:
+        order = np.argsort(codes, kind='stable')
+        c, m, t = codes[order], meters[order], seconds[order]
+
+    dm = np.empty(n, dtype='float64')
+    dt = np.empty(n, dtype='float64')
+    dm[0] = dt[0] = np.nan
+    np.subtract(m[1:], m[:-1], out=dm[1:])
+    np.subtract(t[1:], t[:-1], out=dt[1:])
+    first = np.empty(n, dtype=bool)
+    first[0] = True
+    np.not_equal(c[1:], c[:-1], out=first[1:])
+    dt[first] = np.nan
+    if prev_meters is not None:
+        dm[first] = m[first] - prev_meters[c[first]]
+        dt[first] = t[first] - prev_seconds[c[first]]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(dm, dt, out=speed, where=dt > 0)
+
+    if order is not None:
+        out = np.empty(n, dtype='float64')
+        out[order] = speed
+        speed = out
+    return speed
+
+
+# SPEED (meters/second) for every breadcrumb, computed per trip and vehicle
+# expects METERS and a decoded TIMESTAMP column
+def compute_speed(trip_df, keys=TRIP_KEYS):
+    return speed_from_arrays(
+        trip_codes(trip_df, keys),
+        trip_df['METERS'].to_numpy(dtype='float64'),
+        epoch_seconds(trip_df['TIMESTAMP']),
+    )
+
+
+# original row-by-row implementation, kept for benchmarks and comparisons
+def compute_speed_apply(trip_df):
+    dmeters = trip_df['METERS'].diff()
+    dtimestamp = trip_df['TIMESTAMP'].diff().dt.total_seconds()
+    tmp = pd.DataFrame({'dMETERS': dmeters, 'dTIMESTAMP': dtimestamp})
+    return tmp.apply(
+        lambda row: row['dMETERS'] / row['dTIMESTAMP'] if row['dTIMESTAMP'] and row['dTIMESTAMP'] > 0 else 0,
+        axis=1
+    ).to_numpy(dtype='float64')
+
+
+# running min/max/mean of SPEED, NaNs are skipped like pandas does
+class SpeedStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, speed):
+        speed = np.asarray(speed, dtype='float64')
+        speed = speed[~np.isnan(speed)]
+        if len(speed) == 0:
+            return
+        self.count += len(speed)
+        self.total += speed.sum()
+        self.min = np.fmin(self.min, speed.min())
+        self.max = np.fmax(self.max, speed.max())
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+
+# last METERS/seconds of the trips that can continue in the next chunk
+# the bc_trip files keep each trip's rows together, so with sorted_input only
+# the trip running at the end of a chunk is carried and the state stays one
+# row however long the file; without it every trip seen so far is kept
+# with sorted_input a trip that comes back after another one started raises
+# ValueError, since its resumed first row would silently get SPEED 0
+class TripState:
+    def __init__(self, keys=TRIP_KEYS, sorted_input=True):
+        self.keys = list(keys)
+        self.sorted_input = sorted_input
+        self.last = pd.DataFrame(
+            {'METERS': [], 'SECONDS': []},
+            index=pd.MultiIndex.from_arrays([[]] * len(self.keys), names=self.keys)
+        )
+        self.finished = set()  # keys of the trips that ended, with sorted_input
+
+    # raise if a trip of this chunk already ended, in this chunk or an earlier one
+    def check_sorted(self, codes, groups):
+        if np.any(codes[1:] < codes[:-1]) or any(key in self.finished for key in groups):
+            raise ValueError(f"trips {self.keys} are interleaved; stream them with sorted_input=False "
+                             "(DataTransformation.py -i)")
+        self.finished.update(self.last.index)
+        self.finished.update(groups)
+        self.finished.discard(groups[-1])  # the trip running at the end goes on
+
+    # speed for one chunk, using and then updating the carried state
+    def speed(self, chunk):
+        codes = trip_codes(chunk, self.keys)
+        meters = chunk['METERS'].to_numpy(dtype='float64')
+        seconds = epoch_seconds(chunk['TIMESTAMP'])
+        if len(chunk) == 0:
+            return np.zeros(0, dtype='float64')
+
+        # chunk groups in code order (ngroup numbers them by first appearance)
+        groups = pd.MultiIndex.from_frame(chunk[self.keys].drop_duplicates())
+        prev = self.last.reindex(groups)
+        speed = speed_from_arrays(codes, meters, seconds,
+                                  prev['METERS'].to_numpy(dtype='float64'),
+                                  prev['SECONDS'].to_numpy(dtype='float64'))
+
+        if self.sorted_input:
+            self.check_sorted(codes, groups)
+            tail = codes[-1]
+            self.last = pd.DataFrame({'METERS': meters[-1:], 'SECONDS': seconds[-1:]},
+                                     index=groups[tail:tail + 1])
+            return speed
+
+        # last row of every group in this chunk
+        _, rev_idx = np.unique(codes[::-1], return_index=True)
+        last_rows = len(codes) - 1 - rev_idx
+        update = pd.DataFrame({'METERS': meters[last_rows], 'SECONDS': seconds[last_rows]},
+                              index=groups)
+        self.last = pd.concat([self.last[~self.last.index.isin(groups)], update])
+        return speed
+
+
+# read, decode and enhance a breadcrumb file `chunksize` rows at a time
+# yields each enhanced chunk; SPEED matches a full load of the file
+# pass sorted_input=False for files whose trips are interleaved
+def stream_breadcrumbs(fname, chunksize=500_000, usecols=USECOLS, sorted_input=True):
+    state = TripState(sorted_input=sorted_input)
+    for chunk in pd.read_csv(fname, usecols=usecols, dtype=DTYPES, chunksize=chunksize):
+        service_date = service_dates(chunk)
+        chunk = decode_timestamp(chunk)
+        chunk['SERVICE_DATE'] = service_date
+        chunk['SPEED'] = state.speed(chunk)
+        yield chunk
+
+
+# row count and SPEED aggregates over a whole file in bounded memory
+# with `outdir` every enhanced chunk is also written to the Parquet store
+def stream_speed_stats(fname, chunksize=500_000, outdir=None, sorted_input=True):
+    nrows = 0
+    stats = SpeedStats()
+    writer = TripWriter(outdir) if outdir else None
+    for chunk in stream_breadcrumbs(fname, chunksize, sorted_input=sorted_input):
+        nrows += len(chunk)
+        stats.update(chunk['SPEED'].to_numpy())
+        if writer:
+            writer.write(chunk)
+    if writer:
+        writer.close()
+    return nrows, stats
+
+
+# column types of the Parquet trip store; SERVICE_DATE and VEHICLE_ID are
+# hive partition columns (SERVICE_DATE=2023-02-15/VEHICLE_ID=3001/...)
+TRIP_TYPES = {
+    'EVENT_NO_TRIP': 'int64',
+    'VEHICLE_ID': 'int32',
+    'METERS': 'float64',
+    'GPS_LONGITUDE': 'float64',
+    'GPS_LATITUDE': 'float64',
+    'TIMESTAMP': 'datetime64[ns]',
+    'SPEED': 'float32',
+    'SERVICE_DATE': 'str',
+}
+
+
+def _trip_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(
+        pa.schema([('SERVICE_DATE', pa.string()), ('VEHICLE_ID', pa.int32())]),
+        flavor='hive'
+    )
+
+
+# writes enhanced breadcrumbs to the Parquet store, partitioned by service
+# date and vehicle; rows are buffered up to flush_rows so a vehicle gets one
+# file per flush rather than one per chunk, and a service date's partition is
+# emptied the first time a writer touches it, so rewriting a day (with any
+# chunk size) replaces its files instead of adding to them
+class TripWriter:
+    def __init__(self, outdir, flush_rows=2_000_000):
+        self.outdir = outdir
+        self.flush_rows = flush_rows
+        self.buffer = []
+        self.buffered = 0
+        self.flushes = 0
+        self.cleared = set()
+
+    def write(self, trip_df):
+        cols = [c for c in TRIP_TYPES if c in trip_df.columns]
+        out = trip_df[cols].astype({c: TRIP_TYPES[c] for c in cols})
+        if 'SERVICE_DATE' not in out.columns:
+            out['SERVICE_DATE'] = service_dates(out)
+        self.buffer.append(out)
+        self.buffered += len(out)
+        if self.buffered >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        import shutil
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not self.buffer:
+            return
+        out = pd.concat(self.buffer, ignore_index=True)
+        self.buffer, self.buffered = [], 0
+        for day in set(out['SERVICE_DATE'].unique()) - self.cleared:
+            shutil.rmtree(os.path.join(self.outdir, f'SERVICE_DATE={day}'), ignore_errors=True)
+            self.cleared.add(day)
+
+        ds.write_dataset(
+            pa.Table.from_pandas(out, preserve_index=False),
+            self.outdir,
+            format='parquet',
+            partitioning=_trip_partitioning(),
+            basename_template=f'part-{self.flushes}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            max_partitions=4096,
+        )
+        self.flushes += 1
+
+    def close(self):
+        self.flush()
+
+
+# write decoded, enhanced breadcrumbs to the Parquet store, replacing the
+# service dates they cover
+def write_trips_parquet(trip_df, outdir):
+    writer = TripWriter(outdir)
+    writer.write(trip_df)
+    writer.close()
+
+
+# read back only the needed columns/partitions, e.g.
+#   read_trips_parquet(d, ['TIMESTAMP', 'SPEED'], [('VEHICLE_ID', '=', 3001)])
+def read_trips_parquet(outdir, columns=None, filters=None):
+    import pyarrow.parquet as pq
+    return pq.read_table(outdir, columns=columns, filters=filters,
+                         partitioning=_trip_partitioning()).to_pandas()
@@ -0,0 +1,109 @@
+# DataEng S25 - Data Transformation: tests of the SPEED computation
+# the vectorized and chunked paths are checked against a per-trip reference
+#   python -m pytest test_breadcrumbs.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from breadcrumbs import (TripState, compute_speed, decode_timestamp, stream_breadcrumbs,
+                         stream_speed_stats, USECOLS)
+
+
+# a breadcrumb table of `trips` trips run one after another, as in the
+# bc_trip files; a few rows repeat a timestamp and the last trip runs past midnight
+def make_breadcrumbs(trips=30, seed=3):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for trip in range(trips):
+        rows = int(rng.integers(1, 60))
+        act_time = 80000 + 900 * trip + np.cumsum(rng.integers(0, 15, rows))
+        frames.append(pd.DataFrame({
+            'EVENT_NO_TRIP': 2000 + trip,
+            'OPD_DATE': '07DEC2022:00:00:00',
+            'VEHICLE_ID': 3000 + trip % 4,
+            'METERS': np.cumsum(rng.integers(0, 120, rows)),
+            'ACT_TIME': act_time,
+            'GPS_LONGITUDE': -122.6,
+            'GPS_LATITUDE': 45.5,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# the rows of make_breadcrumbs with trips interleaved at random, each trip's
+# own rows still in order
+def interleave(trip_df, seed=0):
+    rng = np.random.default_rng(seed)
+    key = pd.Series(rng.random(len(trip_df))).groupby(trip_df['EVENT_NO_TRIP']).transform(np.sort)
+    return trip_df.iloc[np.argsort(key.to_numpy(), kind='stable')].reset_index(drop=True)
+
+
+# speed the way the original script computed it, one trip at a time: the
+# first breadcrumb of a trip and any without a positive time step get 0
+def reference_speed(trip_df):
+    speed = pd.Series(0.0, index=trip_df.index)
+    for _, trip in trip_df.groupby(['EVENT_NO_TRIP', 'VEHICLE_ID'], sort=False):
+        dmeters = trip['METERS'].diff()
+        dseconds = trip['TIMESTAMP'].diff().dt.total_seconds()
+        ok = dseconds > 0
+        speed[trip.index[ok]] = dmeters[ok] / dseconds[ok]
+    return speed.to_numpy()
+
+
+def test_compute_speed_matches_per_trip_reference():
+    trip_df = decode_timestamp(make_breadcrumbs())
+    np.testing.assert_allclose(compute_speed(trip_df), reference_speed(trip_df))
+
+
+# chunk boundaries fall inside trips, so the first row of most chunks needs
+# the last row of the one before
+@pytest.mark.parametrize('chunksize', [1, 7, 50, 10_000])
+def test_trip_state_carries_trips_across_chunks(chunksize):
+    trip_df = decode_timestamp(make_breadcrumbs())
+    state = TripState()
+    speed = np.concatenate([state.speed(trip_df.iloc[start:start + chunksize])
+                            for start in range(0, len(trip_df), chunksize)])
+    np.testing.assert_allclose(speed, compute_speed(trip_df))
+    assert len(state.last) == 1  # only the trip running at the end is kept
+
+
+# with interleaved trips every trip seen so far has to be carried
+@pytest.mark.parametrize('chunksize', [1, 13, 10_000])
+def test_trip_state_with_interleaved_trips(chunksize):
+    trip_df = decode_timestamp(interleave(make_breadcrumbs()))
+    state = TripState(sorted_input=False)
+    speed = np.concatenate([state.speed(trip_df.iloc[start:start + chunksize])
+                            for start in range(0, len(trip_df), chunksize)])
+    np.testing.assert_allclose(speed, compute_speed(trip_df))
+
+
+# interleaved input given as sorted raises instead of resetting resumed trips to 0
+@pytest.mark.parametrize('chunksize', [1, 13, 10_000])
+def test_trip_state_rejects_interleaved_trips_as_sorted(chunksize):
+    trip_df = decode_timestamp(interleave(make_breadcrumbs()))
+    state = TripState()
+    with pytest.raises(ValueError, match='interleaved'):
+        for start in range(0, len(trip_df), chunksize):
+            state.speed(trip_df.iloc[start:start + chunksize])
+
+
+@pytest.mark.parametrize('sorted_input', [True, False])
+def test_stream_breadcrumbs_matches_full_load(tmp_path, sorted_input):
+    fname = tmp_path / 'bc.csv'
+    make_breadcrumbs().to_csv(fname, index=False)
+    full = decode_timestamp(pd.read_csv(fname, usecols=USECOLS))
+    streamed = pd.concat(stream_breadcrumbs(fname, chunksize=37, sorted_input=sorted_input),
+                         ignore_index=True)
+    np.testing.assert_allclose(streamed['SPEED'].to_numpy(), compute_speed(full))
+    assert (streamed['SERVICE_DATE'] == '2022-12-07').all()
+
+
+# the stream of an interleaved file has to be asked for as unsorted
+def test_stream_speed_stats_of_interleaved_file(tmp_path):
+    fname = tmp_path / 'bc.csv'
+    interleave(make_breadcrumbs(), seed=1).to_csv(fname, index=False)
+    speed = compute_speed(decode_timestamp(pd.read_csv(fname, usecols=USECOLS)))
+    with pytest.raises(ValueError, match='interleaved'):
+        stream_speed_stats(fname, chunksize=37)
+    nrows, stats = stream_speed_stats(fname, chunksize=37, sorted_input=False)
+    assert nrows == len(speed)
+    np.testing.assert_allclose([stats.min, stats.max, stats.mean], [speed.min(), speed.max(), speed.mean()])
@@ -0,0 +1,149 @@
+# DataEng S25 - Detecting Bias: bias detection over many service days
+# each day's trimet_stopevents_<date>.html and trimet_relpos_<date>.csv are
+# reduced (in a process pool) to per-vehicle sufficient statistics that are
+# saved next to the results, so the tests can be rerun per day, per week or
+# over the whole range without rereading the raw files
+# run it with -h to see the command line options
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from bias import biased_boarding, biased_gps, boarding_stats, merge_moments, relpos_stats
+from stop_events import read_stop_events
+
+STOPS_FILE = "trimet_stopevents_{date}.html"
+RELPOS_FILE = "trimet_relpos_{date}.csv"
+STATS_FILE = "stats_{date}.parquet"
+DATE_RE = re.compile(r"trimet_(?:stopevents|relpos)_(\d{4}-\d{2}-\d{2})\.(?:html|csv)$")
+STAT_COLUMNS = ['n', 'k', 'relpos_n', 'relpos_mean', 'relpos_m2']
+
+
+# service dates with a stop events or relpos file in indir, optionally
+# limited to start..end (inclusive, YYYY-MM-DD)
+def find_dates(indir, start=None, end=None):
+    dates = set()
+    for name in os.listdir(indir):
+        match = DATE_RE.match(name)
+        if match:
+            dates.add(match.group(1))
+    return sorted(d for d in dates if (start is None or d >= start) and (end is None or d <= end))
+
+
+# per-vehicle sufficient statistics of one day: stop events n, stops with
+# boarding k, and relpos count/mean/m2 (see relpos_stats); a row with a NaN
+# vehicle holds relpos values without one, which still count towards the fleet
+def day_stats(indir, date):
+    parts = []
+    stops_path = os.path.join(indir, STOPS_FILE.format(date=date))
+    if os.path.exists(stops_path):
+        stops_df, malformed = read_stop_events(stops_path, date)
+        if len(malformed):
+            print(f"{date}: dropped {len(malformed)} stop events with a value that is not a whole number")
+        parts.append(boarding_stats(stops_df))
+    relpos_path = os.path.join(indir, RELPOS_FILE.format(date=date))
+    if os.path.exists(relpos_path):
+        breadcrumb_df = pd.read_csv(relpos_path)
+        breadcrumb_df.columns = breadcrumb_df.columns.str.strip().str.lower()
+        parts.append(relpos_stats(breadcrumb_df).add_prefix('relpos_'))
+
+    for part in parts:
+        part.index = part.index.astype('float64')  # int and float vehicle keys line up
+    stats = pd.concat(parts, axis=1) if parts else pd.DataFrame(index=pd.Index([], dtype='float64'))
+    stats = stats.reindex(columns=STAT_COLUMNS).fillna(0)
+    stats[STAT_COLUMNS[:3]] = stats[STAT_COLUMNS[:3]].astype('int64')
+    stats.index.name = 'vehicle_number'
+    return stats.reset_index().assign(service_date=date)
+
+
+# the saved statistics of a day, recomputed when missing, older than an input
+# file or saved with other columns (an earlier version of STAT_COLUMNS)
+def cached_day_stats(indir, statsdir, date):
+    path = os.path.join(statsdir, STATS_FILE.format(date=date))
+    inputs = [os.path.join(indir, f.format(date=date)) for f in (STOPS_FILE, RELPOS_FILE)]
+    newest = max((os.path.getmtime(p) for p in inputs if os.path.exists(p)), default=0)
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        stats = pd.read_parquet(path)
+        if set(STAT_COLUMNS) <= set(stats.columns):
+            return stats
+    stats = day_stats(indir, date)
+    stats.to_parquet(path, index=False)
+    return stats
+
+
+# statistics of every date, days computed in parallel
+def collect_stats(indir, statsdir, dates, workers=None):
+    os.makedirs(statsdir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(cached_day_stats, [indir] * len(dates), [statsdir] * len(dates), dates))
+    return pd.concat(frames, ignore_index=True)
+
+
+# label of the day, week (its Monday) or whole range a service date belongs to
+def period_of(dates, by):
+    if by == "day":
+        return dates
+    if by == "week":
+        days = pd.to_datetime(dates)
+        return (days - pd.to_timedelta(days.dt.weekday, unit='D')).dt.strftime('week of %Y-%m-%d')
+    return pd.Series(f"{dates.min()} to {dates.max()}", index=dates.index)
+
+
+# merge the daily statistics into periods and run both tests on every period
+# returns period, test, vehicle_number and p_value of every biased vehicle
+def run_tests(stats, by="all", boarding_alpha=0.05, gps_alpha=0.005):
+    stats = stats.assign(period=period_of(stats['service_date'], by))
+    groups = stats.groupby(['period', 'vehicle_number'], dropna=False)
+    merged = groups[['n', 'k']].sum()
+    merged['relpos_n'], merged['relpos_mean'], merged['relpos_m2'] = merge_moments(
+        groups.ngroup().to_numpy(), stats['relpos_n'], stats['relpos_mean'], stats['relpos_m2'], len(merged))
+    merged['relpos_n'] = merged['relpos_n'].astype('int64')
+
+    results = []
+    for period, group in merged.groupby(level='period'):
+        group = group.droplevel('period')
+        board = group.loc[group['n'] > 0, ['n', 'k']]
+        gps = group.loc[group['relpos_n'] > 0, ['relpos_n', 'relpos_mean', 'relpos_m2']]
+        gps.columns = ['n', 'mean', 'm2']
+        if len(board):
+            results.append(biased_boarding(board, boarding_alpha).assign(period=period, test='boarding'))
+        if len(gps):
+            results.append(biased_gps(gps, gps_alpha).assign(period=period, test='gps'))
+    if not results:
+        return pd.DataFrame(columns=['period', 'test', 'vehicle_number', 'p_value'])
+    results = pd.concat(results, ignore_index=True)[['period', 'test', 'vehicle_number', 'p_value']]
+    return results.astype({'vehicle_number': 'Int64'})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--indir", default=".",
+                        help="directory with trimet_stopevents_<date>.html / trimet_relpos_<date>.csv files")
+    parser.add_argument("--start", default=None, help="first service date, YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="last service date, YYYY-MM-DD")
+    parser.add_argument("-g", "--groupby", choices=["day", "week", "all"], default="all")
+    parser.add_argument("-s", "--statsdir", default="bias_stats",
+                        help="where the per-day statistics are kept")
+    parser.add_argument("-o", "--output", default="bias_results.csv")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    dates = find_dates(args.indir, args.start, args.end)
+    if not dates:
+        print("No stop event or relpos files found.")
+        return
+    print(f"{len(dates)} service days: {dates[0]} to {dates[-1]}")
+
+    stats = collect_stats(args.indir, args.statsdir, dates, args.workers)
+    results = run_tests(stats, args.groupby)
+    results.to_csv(args.output, index=False)
+
+    summary = results.groupby(['period', 'test']).size().unstack(fill_value=0)
+    print(summary.reindex(columns=['boarding', 'gps'], fill_value=0).to_string())
+    print(f"{len(results)} biased vehicle results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
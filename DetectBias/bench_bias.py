@@ -0,0 +1,101 @@
+# DataEng S25 - Detecting Bias: bias detection benchmark
+# runs the vectorized tests in bias.py on a synthetic fleet and compares them
+# with the original per-vehicle scipy loops, which only get --loop-vehicles
+# vehicles since each GPS test rescans every breadcrumb
+# run it with -h to see the command line options
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import binomtest, ttest_ind
+
+from bias import biased_boarding, biased_gps, boarding_stats, relpos_stats
+
+
+# synthetic stop events and breadcrumbs; a few vehicles get a shifted
+# boarding rate or relpos mean so both tests have something to find
+def make_fleet(vehicles, stops, breadcrumbs, seed=42):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1000, 1000 + vehicles)
+    board_p = np.where(rng.random(vehicles) < 0.02, 0.35, 0.45)
+    shift = np.where(rng.random(vehicles) < 0.02, 0.5, 0.0)
+
+    veh = rng.integers(0, vehicles, stops)
+    stops_df = pd.DataFrame({
+        'vehicle_number': ids[veh],
+        'ons': rng.binomial(3, board_p[veh] / 3 * 1.2),
+    })
+    veh = rng.integers(0, vehicles, breadcrumbs)
+    relpos = rng.normal(shift[veh], 5.0)
+    relpos[rng.random(breadcrumbs) < 0.001] = np.nan
+    breadcrumb_df = pd.DataFrame({'vehicle_number': ids[veh], 'relpos': relpos})
+    return stops_df, breadcrumb_df
+
+
+# the loops from detect_bias.py, limited to the given vehicles
+def loop_boarding(stops_df, vehicles):
+    rate = (stops_df['ons'] >= 1).sum() / len(stops_df)
+    out = {}
+    for vehicle_id, group in stops_df[stops_df['vehicle_number'].isin(vehicles)].groupby('vehicle_number'):
+        out[vehicle_id] = binomtest((group['ons'] >= 1).sum(), len(group), rate).pvalue
+    return pd.Series(out)
+
+
+def loop_gps(breadcrumb_df, vehicles):
+    all_relpos = breadcrumb_df['relpos'].dropna().values
+    out = {}
+    for vehicle_id, group in breadcrumb_df[breadcrumb_df['vehicle_number'].isin(vehicles)].groupby('vehicle_number'):
+        vehicle_relpos = group['relpos'].dropna().values
+        if len(vehicle_relpos) < 2:
+            continue
+        out[vehicle_id] = ttest_ind(vehicle_relpos, all_relpos, equal_var=False).pvalue
+    return pd.Series(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--vehicles", type=int, default=5000)
+    parser.add_argument("-s", "--stops", type=int, default=5_000_000)
+    parser.add_argument("-b", "--breadcrumbs", type=int, default=20_000_000)
+    parser.add_argument("--loop-vehicles", type=int, default=50,
+                        help="vehicles given to the slow per-vehicle scipy loops")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    stops_df, breadcrumb_df = make_fleet(args.vehicles, args.stops, args.breadcrumbs, args.seed)
+
+    start = time.perf_counter()
+    board = boarding_stats(stops_df)
+    gps = relpos_stats(breadcrumb_df)
+    stats_time = time.perf_counter() - start
+    start = time.perf_counter()
+    all_board = biased_boarding(board, alpha=np.inf)  # keep every p-value
+    all_gps = biased_gps(gps, alpha=np.inf)
+    test_time = time.perf_counter() - start
+    vec_time = stats_time + test_time
+
+    sample = np.sort(stops_df['vehicle_number'].unique())[:args.loop_vehicles]
+    start = time.perf_counter()
+    loop_board = loop_boarding(stops_df, sample)
+    loop_gps_p = loop_gps(breadcrumb_df, sample)
+    loop_time = time.perf_counter() - start
+
+    # same p-values for the vehicles both ran
+    vec_board = all_board.set_index('vehicle_number')['p_value'].reindex(loop_board.index)
+    vec_gps = all_gps.set_index('vehicle_number')['p_value'].reindex(loop_gps_p.index)
+    assert np.array_equal(vec_board.to_numpy(), loop_board.to_numpy(), equal_nan=True)
+    assert np.allclose(vec_gps.to_numpy(), loop_gps_p.to_numpy(), rtol=1e-9, atol=0, equal_nan=True)
+
+    per_vehicle = loop_time / len(sample)
+    print(f"fleet: {args.vehicles:,} vehicles, {args.stops:,} stop events, {args.breadcrumbs:,} breadcrumbs")
+    print(f"vectorized:  {vec_time:8.3f} s  (grouped stats {stats_time:.3f} s, tests {test_time:.3f} s)")
+    print(f"loop:        {loop_time:8.3f} s for {len(sample)} vehicles, "
+          f"~{per_vehicle * args.vehicles:,.0f} s for the fleet")
+    print(f"speedup:     ~{per_vehicle * args.vehicles / vec_time:,.0f}x")
+    print(f"biased boarding (p < 0.05): {(all_board['p_value'] < 0.05).sum()}   "
+          f"biased GPS (p < 0.005): {(all_gps['p_value'] < 0.005).sum()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# DataEng S25 - Detecting Bias: vectorized bias tests for the whole fleet
+# per-vehicle sufficient statistics come from one grouped aggregation and every
+# vehicle is tested at once against the fleet-wide statistics:
+#   boarding  two-sided binomial test of stops with ons >= 1, same p-values as
+#             scipy.stats.binomtest
+#   GPS       Welch t-test of a vehicle's relpos against all relpos, same
+#             p-values as scipy.stats.ttest_ind(equal_var=False)
+# the statistics are counts, sums and per-vehicle moments, so tables from
+# several files or days can be merged before testing (see merge_moments)
+import numpy as np
+import pandas as pd
+from scipy.stats import binom, ttest_ind_from_stats
+
+BINOM_RERR = 1 + 1e-7  # relative tolerance scipy's binomtest uses to compare pmf values
+
+
+# per-vehicle sums of `columns` ({name: values}) plus a row count n, via one
+# factorize and a bincount per column; a NaN vehicle gets its own row
+def _grouped_sums(vehicle, columns):
+    codes, vehicles = pd.factorize(vehicle, use_na_sentinel=False, sort=True)
+    out = {'n': np.bincount(codes, minlength=len(vehicles))}
+    for name, values in columns.items():
+        out[name] = np.bincount(codes, weights=values, minlength=len(vehicles))
+    return pd.DataFrame(out, index=pd.Index(vehicles, name='vehicle_number'))
+
+
+# stops and stops with boarding (ons >= 1) per vehicle, columns n and k
+def boarding_stats(stops_df):
+    boarded = (stops_df['ons'].to_numpy() >= 1).astype('float64')
+    stats = _grouped_sums(stops_df['vehicle_number'].to_numpy(), {'k': boarded})
+    stats['k'] = stats['k'].astype('int64')
+    return stats
+
+
+# relpos count n, mean and sum of squared deviations from the mean m2 per
+# vehicle; sums are taken of the values shifted by the first one and m2 in a
+# second pass, so both keep their precision when the values are large next to
+# their spread; rows without a vehicle are kept (under a NaN key) since they
+# still count towards the fleet statistics
+def relpos_stats(breadcrumb_df):
+    relpos = breadcrumb_df['relpos'].to_numpy(dtype='float64')
+    present = ~np.isnan(relpos)
+    relpos = relpos[present]
+    codes, vehicles = pd.factorize(breadcrumb_df['vehicle_number'].to_numpy()[present],
+                                   use_na_sentinel=False, sort=True)
+    shift = relpos[0] if len(relpos) else 0.0
+    n = np.bincount(codes, minlength=len(vehicles))
+    mean = shift + np.bincount(codes, weights=relpos - shift, minlength=len(vehicles)) / n
+    m2 = np.bincount(codes, weights=(relpos - mean[codes]) ** 2, minlength=len(vehicles))
+    return pd.DataFrame({'n': n, 'mean': mean, 'm2': m2},
+                        index=pd.Index(vehicles, name='vehicle_number'))
+
+
+# count, mean and m2 of each group of parts (codes 0..groups-1), merged with
+# Chan et al.'s formula: m2 of the parts plus each part's squared distance to
+# the group mean; means are shifted by the first one before they are summed;
+# parts with n = 0 add nothing
+def merge_moments(codes, n, mean, m2, groups):
+    n = np.asarray(n, dtype='float64')
+    mean = np.asarray(mean, dtype='float64')
+    shift = mean[n > 0][0] if (n > 0).any() else 0.0
+    mean = np.where(n > 0, mean, shift)
+    total = np.bincount(codes, weights=n, minlength=groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        merged_mean = shift + np.bincount(codes, weights=n * (mean - shift), minlength=groups) / total
+        spread = np.where(n > 0, n * (mean - merged_mean[codes]) ** 2, 0)
+    merged_m2 = np.bincount(codes, weights=np.where(n > 0, m2, 0) + spread, minlength=groups)
+    return total, merged_mean, merged_m2
+
+
+# sample variance from count and m2
+def sample_variance(n, m2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(m2, dtype='float64') / (np.asarray(n, dtype='float64') - 1)
+
+
+# scipy's _binary_search_for_binom_tst run on every element at once: for each
+# element the index i in [lo, hi] with a(i) <= d < a(i + 1)
+def _binom_search(a, d, lo, hi):
+    lo, hi = lo.copy(), hi.copy()
+    result = np.empty_like(lo)
+    done = np.zeros(len(lo), dtype=bool)
+    while True:
+        active = ~done & (lo < hi)
+        if not active.any():
+            break
+        mid = lo + (hi - lo) // 2
+        midval = a(mid)
+        less = active & (midval < d)
+        greater = active & (midval > d)
+        equal = active & ~less & ~greater
+        lo = np.where(less, mid + 1, lo)
+        hi = np.where(greater, mid - 1, hi)
+        result[equal] = mid[equal]
+        done |= equal
+    rest = ~done
+    result[rest] = np.where(a(lo) <= d, lo, lo - 1)[rest]
+    return result
+
+
+# two-sided binomial test p-values of k successes in n trials with success
+# probability p, elementwise; follows scipy.stats.binomtest step for step
+def binomtest_pvalues(k, n, p):
+    k, n, p = np.broadcast_arrays(np.asarray(k, dtype='float64'), np.asarray(n, dtype='float64'),
+                                  np.asarray(p, dtype='float64'))
+    d = binom.pmf(k, n, p)
+    pval = np.ones(k.shape)
+
+    low = k < p * n
+    if low.any():
+        kl, nl, pl, dl = k[low], n[low], p[low], d[low]
+        ix = _binom_search(lambda x: -binom.pmf(x, nl, pl), -dl * BINOM_RERR, np.ceil(pl * nl), nl)
+        y = nl - ix + (dl * BINOM_RERR == binom.pmf(ix, nl, pl))
+        pval[low] = binom.cdf(kl, nl, pl) + binom.sf(nl - y, nl, pl)
+
+    high = k > p * n
+    if high.any():
+        kh, nh, ph, dh = k[high], n[high], p[high], d[high]
+        ix = _binom_search(lambda x: binom.pmf(x, nh, ph), dh * BINOM_RERR, np.zeros(len(kh)), np.floor(ph * nh))
+        pval[high] = binom.cdf(ix, nh, ph) + binom.sf(kh - 1, nh, ph)
+
+    return np.minimum(pval, 1.0)
+
+
+# Welch t-test p-values of each group against a reference sample, from counts,
+# means and sample variances
+def welch_pvalues(n, mean, var, ref_n, ref_mean, ref_var):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        _, pval = ttest_ind_from_stats(mean, np.sqrt(var), n, ref_mean, np.sqrt(ref_var), ref_n,
+                                       equal_var=False)
+    return np.asarray(pval, dtype='float64')
+
+
+# vehicles whose share of stops with boarding differs from the fleet's;
+# returns vehicle_number and p_value of those with p_value < alpha
+def biased_boarding(stats, alpha=0.05):
+    rate = stats['k'].sum() / stats['n'].sum()
+    stats = stats[stats.index.notna() & (stats['n'] > 0)]
+    pval = binomtest_pvalues(stats['k'].to_numpy(), stats['n'].to_numpy(), rate)
+    result = pd.DataFrame({'vehicle_number': stats.index.to_numpy(), 'p_value': pval})
+    return result[result['p_value'] < alpha].sort_values("p_value")
+
+
+# vehicles whose relpos mean differs from that of all relpos values; vehicles
+# with fewer than two values are not tested
+# returns vehicle_number and p_value of those with p_value < alpha
+def biased_gps(stats, alpha=0.005):
+    (ref_n,), (ref_mean,), (ref_m2,) = merge_moments(np.zeros(len(stats), dtype='intp'), stats['n'],
+                                                     stats['mean'], stats['m2'], 1)
+    stats = stats[stats.index.notna() & (stats['n'] >= 2)]
+    n = stats['n'].to_numpy()
+    pval = welch_pvalues(n, stats['mean'].to_numpy(), sample_variance(n, stats['m2'].to_numpy()),
+                         ref_n, ref_mean, sample_variance(ref_n, ref_m2))
+    result = pd.DataFrame({'vehicle_number': stats.index.to_numpy(), 'p_value': pval})
+    return result[result['p_value'] < alpha].sort_values("p_value")
@@ -1,93 +1,82 @@
 # Vlad Chevdar | DataEng S25 - Detecting Bias Lab Assignment
+# run it with -h to see the command line options
+import argparse
 import pandas as pd
 from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-from scipy.stats import binomtest, ttest_ind
-import io
+from datetime import datetime
+from stop_events import read_stop_events, write_stops_parquet
+from bias import biased_boarding, biased_gps, boarding_stats, relpos_stats
 
-# Transform the Data
-with open("trimet_stopevents_2022-12-07.html", "r") as f:
-    html_content = f.read()
 
-tables = pd.read_html(io.StringIO(html_content))
-valid_tables = [
-    t for t in tables if set(['vehicle_number', 'arrive_time', 'location_id', 'ons', 'offs', 'trip_number']).issubset(t.columns)
-]
-combined_df = pd.concat(valid_tables, ignore_index=True)
-service_date = datetime.strptime("2022-12-07", "%Y-%m-%d")
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--date", default="2022-12-07", help="service date, YYYY-MM-DD")
+    parser.add_argument("-s", "--stops", default=None,
+                        help="stop events page (default: trimet_stopevents_<date>.html)")
+    parser.add_argument("-r", "--relpos", default=None,
+                        help="breadcrumb relpos file (default: trimet_relpos_<date>.csv)")
+    parser.add_argument("-o", "--output", default="trimet_stops.csv")
+    parser.add_argument("-p", "--parquet", default=None,
+                        help="also write a Parquet copy partitioned by date and vehicle "
+                             "to this directory (needs pyarrow)")
+    args = parser.parse_args()
 
-stops_df = pd.DataFrame({
-    'trip_id': combined_df['trip_number'],
-    'vehicle_number': pd.to_numeric(combined_df['vehicle_number'], errors='coerce'),
-    'location_id': pd.to_numeric(combined_df['location_id'], errors='coerce'),
-    'ons': pd.to_numeric(combined_df['ons'], errors='coerce'),
-    'offs': pd.to_numeric(combined_df['offs'], errors='coerce'),
-    'tstamp': combined_df['arrive_time'].apply(lambda x: service_date + timedelta(seconds=int(x)) if pd.notna(x) and str(x).isdigit() else None)
-}).dropna()
+    # Transform the Data
+    # the page is streamed table by table, see stop_events.iter_stop_tables
+    service_date = datetime.strptime(args.date, "%Y-%m-%d")
+    stops_df, malformed = read_stop_events(args.stops or f"trimet_stopevents_{args.date}.html", service_date)
+    if len(malformed):
+        print(f"Dropped {len(malformed)} stop events with a value that is not a whole number:")
+        print(malformed.head(10).to_string())
 
-stops_df.to_csv("trimet_stops.csv", index=False)
+    stops_df.to_csv(args.output, index=False)
+    if args.parquet:
+        # typed, partitioned copy for downstream jobs that only need some columns/vehicles
+        write_stops_parquet(stops_df, args.parquet, service_date)
 
-# Validation
-print("How many vehicles?", stops_df['vehicle_number'].nunique())
-print("How many stop locations?", stops_df['location_id'].nunique())
-print("Min timestamp:", stops_df['tstamp'].min())
-print("Max timestamp:", stops_df['tstamp'].max())
+    # Validation
+    print("How many vehicles?", stops_df['vehicle_number'].nunique())
+    print("How many stop locations?", stops_df['location_id'].nunique())
+    print("Min timestamp:", stops_df['tstamp'].min())
+    print("Max timestamp:", stops_df['tstamp'].max())
 
-boarding_events = stops_df[stops_df['ons'] >= 1]
-print("Stop events with boarding:", len(boarding_events))
-print("Boarding percentage: {:.2f}%".format(len(boarding_events) / len(stops_df) * 100))
+    boarding_events = stops_df[stops_df['ons'] >= 1]
+    print("Stop events with boarding:", len(boarding_events))
+    print("Boarding percentage: {:.2f}%".format(len(boarding_events) / len(stops_df) * 100))
 
-loc_df = stops_df[stops_df['location_id'] == 6913]
-print("\nLocation 6913 - stops:", len(loc_df))
-print("Unique buses:", loc_df['vehicle_number'].nunique())
-print("Boarding %: {:.2f}%".format((loc_df['ons'] >= 1).sum() / len(loc_df) * 100 if len(loc_df) > 0 else 0))
+    loc_df = stops_df[stops_df['location_id'] == 6913]
+    print("\nLocation 6913 - stops:", len(loc_df))
+    print("Unique buses:", loc_df['vehicle_number'].nunique())
+    print("Boarding %: {:.2f}%".format((loc_df['ons'] >= 1).sum() / len(loc_df) * 100 if len(loc_df) > 0 else 0))
 
-veh_df = stops_df[stops_df['vehicle_number'] == 4062]
-print("\nVehicle 4062 - stops:", len(veh_df))
-print("Total boarded:", veh_df['ons'].sum())
-print("Total deboarded:", veh_df['offs'].sum())
-print("Boarding %: {:.2f}%".format((veh_df['ons'] >= 1).sum() / len(veh_df) * 100 if len(veh_df) > 0 else 0))
+    veh_df = stops_df[stops_df['vehicle_number'] == 4062]
+    print("\nVehicle 4062 - stops:", len(veh_df))
+    print("Total boarded:", veh_df['ons'].sum())
+    print("Total deboarded:", veh_df['offs'].sum())
+    print("Boarding %: {:.2f}%".format((veh_df['ons'] >= 1).sum() / len(veh_df) * 100 if len(veh_df) > 0 else 0))
 
-# Vehicles with biased boarding data (“ons”)
-total_stops = len(stops_df)
-total_boarding = (stops_df['ons'] >= 1).sum()
-overall_boarding_rate = total_boarding / total_stops
-biased_ons = []
+    # Vehicles with biased boarding data (“ons”)
+    # all vehicles are tested at once from grouped counts, see bias.py
+    df_biased_ons = biased_boarding(boarding_stats(stops_df), alpha=0.05)
 
-for vehicle_id, group in stops_df.groupby('vehicle_number'):
-    n = len(group)
-    k = (group['ons'] >= 1).sum()
-    if n == 0:
-        continue
-    p_value = binomtest(k, n, overall_boarding_rate).pvalue
-    if p_value < 0.05:
-        biased_ons.append({'vehicle_number': vehicle_id, 'p_value': p_value})
+    if len(df_biased_ons):
+        print("\nVehicles with biased boarding (p < 0.05):")
+        print(df_biased_ons[['vehicle_number', 'p_value']])
+    else:
+        print("No biased boarding vehicles found.")
 
-if biased_ons:
-    df_biased_ons = pd.DataFrame(biased_ons).sort_values("p_value")
-    print("\nVehicles with biased boarding (p < 0.05):")
-    print(df_biased_ons[['vehicle_number', 'p_value']])
-else:
-    print("No biased boarding vehicles found.")
+    # Vehicles with biased GPS data
+    breadcrumb_df = pd.read_csv(args.relpos or f"trimet_relpos_{args.date}.csv")
+    breadcrumb_df.columns = breadcrumb_df.columns.str.strip().str.lower()
 
-# Vehicles with biased GPS data
-breadcrumb_df = pd.read_csv("trimet_relpos_2022-12-07.csv")
-breadcrumb_df.columns = breadcrumb_df.columns.str.strip().str.lower()
+    df_biased_gps = biased_gps(relpos_stats(breadcrumb_df), alpha=0.005)
 
-all_relpos = breadcrumb_df['relpos'].dropna().values
-biased_gps = []
+    if len(df_biased_gps):
+        print("\nVehicles with biased GPS (p < 0.005):")
+        print(df_biased_gps.to_string(index=False))
+    else:
+        print("No GPS bias found.")
 
-for vehicle_id, group in breadcrumb_df.groupby('vehicle_number'):
-    vehicle_relpos = group['relpos'].dropna().values
-    if len(vehicle_relpos) < 2:
-        continue
-    _, p_value = ttest_ind(vehicle_relpos, all_relpos, equal_var=False)
-    if p_value < 0.005:
-        biased_gps.append({'vehicle_number': vehicle_id, 'p_value': p_value})
 
-if biased_gps:
-    df_biased_gps = pd.DataFrame(biased_gps).sort_values("p_value")
-    print("\nVehicles with biased GPS (p < 0.005):")
-    print(df_biased_gps.to_string(index=False))
-else:
-    print("No GPS bias found.")
+if __name__ == "__main__":
+    main()
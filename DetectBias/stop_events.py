@@ -0,0 +1,157 @@
+# DataEng S25 - Detecting Bias: stop event parsing and storage helpers
+import os
+import shutil
+
+import pandas as pd
+
+# column types of the Parquet stop-event store; service_date and
+# vehicle_number are hive partition columns
+STOP_TYPES = {
+    'trip_id': 'int64',
+    'vehicle_number': 'int32',
+    'location_id': 'int32',
+    'ons': 'int32',
+    'offs': 'int32',
+    'tstamp': 'datetime64[ns]',
+}
+
+# columns a stop-event table of the TriMet html page must have
+STOP_COLUMNS = ['vehicle_number', 'arrive_time', 'location_id', 'ons', 'offs', 'trip_number']
+# whole-number columns and the stop-event columns they become
+NUMBER_COLUMNS = {'trip_number': 'trip_id', 'vehicle_number': 'vehicle_number',
+                  'location_id': 'location_id', 'ons': 'ons', 'offs': 'offs'}
+
+
+def _cell_text(cell):
+    text = cell.text if len(cell) == 0 else ''.join(cell.itertext())
+    return text.strip() if text else ''
+
+
+# stream the stop-event tables of a TriMet stop events html page: yields one
+# list of rows (raw strings of STOP_COLUMNS) per table that has every
+# STOP_COLUMNS header; parsed elements are dropped as soon as they are read,
+# so memory holds one table, not the page
+def iter_stop_tables(fname):
+    from lxml import etree
+
+    idx, width, rows = None, 0, []
+    for _, elem in etree.iterparse(fname, events=('end',), tag=('tr', 'table'), html=True):
+        if elem.tag == 'tr':
+            cells = [cell for cell in elem if cell.tag in ('th', 'td')]
+            if cells and cells[0].tag == 'th':
+                header = [_cell_text(cell) for cell in cells]
+                idx = [header.index(c) for c in STOP_COLUMNS] if set(STOP_COLUMNS).issubset(header) else None
+                width = len(header)
+            elif idx is not None and len(cells) == width:
+                rows.append([_cell_text(cells[i]) for i in idx])
+        else:
+            if rows:
+                yield rows
+            idx, rows = None, []
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+# typed stop events from raw STOP_COLUMNS strings; arrive_time is seconds
+# after midnight of the service date and numbers may have thousands
+# separators ("1,234"), as pandas.read_html allowed; rows with an empty cell
+# are dropped, as are rows with a value that is not a whole number
+# returns the stop events and the raw rows dropped for such a malformed value
+def typed_stops(raw_df, service_date):
+    text = raw_df[STOP_COLUMNS].astype(str).apply(lambda col: col.str.strip().str.replace(',', '', regex=False))
+    present = text != ''
+    numbers = text.apply(lambda col: pd.to_numeric(col.where(col.str.fullmatch(r'[+-]?\d+(\.0*)?')),
+                                                   errors='coerce'))
+    numbers['arrive_time'] = pd.to_numeric(text['arrive_time'].where(text['arrive_time'].str.isdigit()),
+                                           errors='coerce')
+    malformed = (present & numbers.isna()).any(axis=1)
+    keep = present.all(axis=1) & ~malformed
+
+    stops_df = numbers.loc[keep, list(NUMBER_COLUMNS)].rename(columns=NUMBER_COLUMNS)
+    stops_df['tstamp'] = pd.Timestamp(service_date) + pd.to_timedelta(numbers.loc[keep, 'arrive_time'], unit='s')
+    stops_df = stops_df[list(STOP_TYPES)].astype(STOP_TYPES).reset_index(drop=True)
+    return stops_df, raw_df.loc[malformed, STOP_COLUMNS]
+
+
+# stream typed stop events out of the html page in DataFrames of about
+# batch_rows rows (whole tables are never split); yields the stop events
+# and the malformed rows of each batch (see typed_stops)
+def iter_stop_events(fname, service_date, batch_rows=200_000):
+    batch = []
+    for rows in iter_stop_tables(fname):
+        batch.extend(rows)
+        if len(batch) >= batch_rows:
+            yield typed_stops(pd.DataFrame(batch, columns=STOP_COLUMNS), service_date)
+            batch = []
+    if batch:
+        yield typed_stops(pd.DataFrame(batch, columns=STOP_COLUMNS), service_date)
+
+
+# all stop events of an html page as one typed DataFrame, and all of its
+# malformed rows
+def read_stop_events(fname, service_date, batch_rows=200_000):
+    batches = list(iter_stop_events(fname, service_date, batch_rows))
+    if not batches:
+        return typed_stops(pd.DataFrame(columns=STOP_COLUMNS), service_date)
+    stops, malformed = zip(*batches)
+    return pd.concat(stops, ignore_index=True), pd.concat(malformed, ignore_index=True)
+
+
+# parse an html page straight into the partitioned Parquet store without
+# holding the whole day in memory
+# returns the number of stop events written and of malformed rows dropped
+def html_to_parquet(fname, outdir, service_date, batch_rows=200_000):
+    total = dropped = 0
+    for part, (stops_df, malformed) in enumerate(iter_stop_events(fname, service_date, batch_rows)):
+        write_stops_parquet(stops_df, outdir, service_date, part)
+        total += len(stops_df)
+        dropped += len(malformed)
+    return total, dropped
+
+
+def _stop_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(
+        pa.schema([('service_date', pa.string()), ('vehicle_number', pa.int32())]),
+        flavor='hive'
+    )
+
+
+# write stop events to a Parquet dataset partitioned by service date and
+# vehicle; `part` keeps file names of successive batches apart, and part 0
+# replaces everything the dataset held for its service dates, so rewriting a
+# day leaves no parts of an earlier run behind
+# pass the service_date the events were decoded with, arrivals after
+# midnight still belong to the previous service day
+def write_stops_parquet(stops_df, outdir, service_date=None, part=0):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    cols = [c for c in STOP_TYPES if c in stops_df.columns]
+    out = stops_df[cols].astype({c: STOP_TYPES[c] for c in cols})
+    if service_date is not None:
+        out['service_date'] = pd.Timestamp(service_date).strftime('%Y-%m-%d')
+    else:
+        out['service_date'] = out['tstamp'].dt.strftime('%Y-%m-%d')
+
+    if part == 0:
+        for day in out['service_date'].unique():
+            shutil.rmtree(os.path.join(outdir, f'service_date={day}'), ignore_errors=True)
+    ds.write_dataset(
+        pa.Table.from_pandas(out, preserve_index=False),
+        outdir,
+        format='parquet',
+        partitioning=_stop_partitioning(),
+        basename_template=f'part-{part}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+# read back only the needed columns/partitions, e.g.
+#   read_stops_parquet(d, ['vehicle_number', 'ons'], [('service_date', '=', '2022-12-07')])
+def read_stops_parquet(outdir, columns=None, filters=None):
+    import pyarrow.parquet as pq
+    return pq.read_table(outdir, columns=columns, filters=filters,
+                         partitioning=_stop_partitioning()).to_pandas()
@@ -0,0 +1,105 @@
+# DataEng S25 - Detecting Bias: tests of the multi-day batch analysis
+# statistics merged from cached per-day files must test like one pass over
+# all the days' rows
+#   python -m pytest test_batch_bias.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_bias import STATS_FILE, cached_day_stats, collect_stats, run_tests
+from bias import biased_boarding, biased_gps, boarding_stats, relpos_stats
+from stop_events import read_stop_events
+from test_stop_events import stop, write_page
+
+pytest.importorskip('pyarrow')
+
+DATES = ['2022-12-05', '2022-12-06', '2022-12-12']  # two in one week, one in the next
+
+
+# relpos and stop events of one day for vehicles 3000..3009, some of which
+# drift or board more; relpos values sit far from zero next to their spread
+def write_day(indir, date, seed, drift=0.0):
+    rng = np.random.default_rng(seed)
+    vehicle = rng.integers(3000, 3010, 3000)
+    relpos = 1e4 + 1e-3 * (rng.normal(0, 1, len(vehicle)) + drift * (vehicle == 3003))
+    pd.DataFrame({' VEHICLE_NUMBER': vehicle, 'RELPOS ': relpos}).to_csv(
+        indir / f'trimet_relpos_{date}.csv', index=False)
+
+    trips = {}
+    for t in range(40):
+        bus = 3000 + t % 10
+        rate = 0.8 if bus == 3007 else 0.4
+        trips[t] = [stop(bus, 30000 + 60 * i, int(rng.random() < rate), t) for i in range(20)]
+    write_page(indir / f'trimet_stopevents_{date}.html', trips)
+    return pd.DataFrame({'vehicle_number': vehicle, 'relpos': relpos})
+
+
+def all_rows(indir, dates):
+    relpos = pd.concat([pd.read_csv(indir / f'trimet_relpos_{d}.csv') for d in dates], ignore_index=True)
+    relpos.columns = relpos.columns.str.strip().str.lower()
+    stops = pd.concat([read_stop_events(str(indir / f'trimet_stopevents_{d}.html'), d)[0] for d in dates],
+                      ignore_index=True)
+    return relpos, stops
+
+
+def pvalues(result):
+    return result.set_index('vehicle_number')['p_value'].sort_index()
+
+
+def test_merged_days_match_one_pass(tmp_path):
+    for i, date in enumerate(DATES):
+        write_day(tmp_path, date, seed=i, drift=0.5 * i)
+    stats = collect_stats(str(tmp_path), str(tmp_path / 'stats'), DATES, workers=2)
+    relpos, stops = all_rows(tmp_path, DATES)
+
+    results = run_tests(stats, by='all', boarding_alpha=np.inf, gps_alpha=np.inf)
+    gps = pvalues(results[results['test'] == 'gps'])
+    board = pvalues(results[results['test'] == 'boarding'])
+    np.testing.assert_allclose(gps.to_numpy(), pvalues(biased_gps(relpos_stats(relpos), np.inf)).to_numpy(),
+                               rtol=1e-6)
+    np.testing.assert_allclose(board.to_numpy(), pvalues(biased_boarding(boarding_stats(stops), np.inf)).to_numpy(),
+                               rtol=1e-12)
+    assert list(gps.index) == list(range(3000, 3010))
+
+
+def test_weeks_merge_only_their_days(tmp_path):
+    for i, date in enumerate(DATES):
+        write_day(tmp_path, date, seed=i)
+    stats = collect_stats(str(tmp_path), str(tmp_path / 'stats'), DATES, workers=1)
+    results = run_tests(stats, by='week', boarding_alpha=np.inf, gps_alpha=np.inf)
+    assert set(results['period']) == {'week of 2022-12-05', 'week of 2022-12-12'}
+
+    relpos, _ = all_rows(tmp_path, DATES[:2])
+    first_week = results[(results['period'] == 'week of 2022-12-05') & (results['test'] == 'gps')]
+    np.testing.assert_allclose(pvalues(first_week).to_numpy(),
+                               pvalues(biased_gps(relpos_stats(relpos), np.inf)).to_numpy(), rtol=1e-6)
+
+
+# a day whose input is written again gets its statistics recomputed, and so
+# does a cache saved with other columns
+def test_rewritten_day_replaces_its_cached_stats(tmp_path):
+    statsdir = tmp_path / 'stats'
+    statsdir.mkdir()
+    date = DATES[0]
+    first = write_day(tmp_path, date, seed=1)
+    cached = cached_day_stats(str(tmp_path), str(statsdir), date)
+    assert cached['relpos_n'].sum() == len(first)
+
+    second = write_day(tmp_path, date, seed=2, drift=3.0)
+    later = os.path.getmtime(statsdir / STATS_FILE.format(date=date)) + 10
+    for name in (f'trimet_relpos_{date}.csv', f'trimet_stopevents_{date}.html'):
+        os.utime(tmp_path / name, (later, later))
+    stats = cached_day_stats(str(tmp_path), str(statsdir), date).set_index('vehicle_number')
+    expected = relpos_stats(second)
+    np.testing.assert_allclose(stats.loc[expected.index, 'relpos_mean'], expected['mean'], rtol=1e-12)
+    np.testing.assert_allclose(stats.loc[expected.index, 'relpos_m2'], expected['m2'], rtol=1e-6)
+
+    # an older cache layout (sums instead of moments) is not used
+    path = statsdir / STATS_FILE.format(date=date)
+    stats.reset_index()[['vehicle_number', 'n', 'k', 'relpos_n']].assign(
+        relpos_sum=0.0, relpos_sumsq=0.0, service_date=date).to_parquet(path, index=False)
+    recomputed = cached_day_stats(str(tmp_path), str(statsdir), date)
+    assert 'relpos_m2' in recomputed.columns
+    assert recomputed['relpos_n'].sum() == len(second)
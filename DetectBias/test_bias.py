@@ -0,0 +1,95 @@
+# DataEng S25 - Detecting Bias: tests of the vectorized bias tests
+# each test compares against the per-vehicle scipy loop the vectorized code replaced
+#   python -m pytest test_bias.py
+import numpy as np
+import pandas as pd
+from scipy.stats import binomtest, ttest_ind
+
+from bias import biased_boarding, biased_gps, boarding_stats, merge_moments, relpos_stats
+
+
+# stop events of `vehicles` vehicles with anywhere from 1 to 400 stops and
+# their own boarding rates, so the test sees k = 0, k = n and both tails
+def make_stops(vehicles=120, seed=11):
+    rng = np.random.default_rng(seed)
+    stops = rng.integers(1, 400, vehicles)
+    rate = rng.choice([0.0, 0.2, 0.45, 0.5, 1.0], vehicles, p=[0.05, 0.2, 0.5, 0.2, 0.05])
+    vehicle = np.repeat(np.arange(4000, 4000 + vehicles), stops)
+    ons = rng.binomial(1, np.repeat(rate, stops)) * rng.integers(1, 4, len(vehicle))
+    return pd.DataFrame({'vehicle_number': vehicle, 'ons': ons})
+
+
+# the per-vehicle binomial test loop of the original detect_bias.py
+def loop_boarding(stops_df):
+    rate = (stops_df['ons'] >= 1).sum() / len(stops_df)
+    out = {}
+    for vehicle_id, group in stops_df.groupby('vehicle_number'):
+        out[vehicle_id] = binomtest(int((group['ons'] >= 1).sum()), len(group), rate).pvalue
+    return pd.Series(out)
+
+
+# a breadcrumb table of `vehicles` vehicles, each with its own relpos bias
+def make_relpos(vehicles=40, rows=20000, offset=0.0, scale=1.0, seed=7):
+    rng = np.random.default_rng(seed)
+    vehicle = rng.integers(0, vehicles, rows)
+    bias = rng.normal(0, 0.3, vehicles)
+    relpos = offset + scale * (rng.normal(0, 1, rows) + bias[vehicle])
+    return pd.DataFrame({'vehicle_number': vehicle + 3000, 'relpos': relpos})
+
+
+# the per-vehicle Welch t-test loop of the original detect_bias.py
+def loop_gps(breadcrumb_df):
+    all_relpos = breadcrumb_df['relpos'].to_numpy()
+    out = {}
+    for vehicle_id, group in breadcrumb_df.groupby('vehicle_number'):
+        out[vehicle_id] = ttest_ind(group['relpos'].to_numpy(), all_relpos, equal_var=False).pvalue
+    return pd.Series(out)
+
+
+def test_boarding_matches_binomtest_loop():
+    stops_df = make_stops()
+    expected = loop_boarding(stops_df)
+    result = biased_boarding(boarding_stats(stops_df), alpha=np.inf)
+    pvalues = result.set_index('vehicle_number')['p_value'].sort_index()
+    np.testing.assert_array_equal(pvalues.index.to_numpy(), expected.index.to_numpy())
+    np.testing.assert_allclose(pvalues.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+def test_boarding_alpha_keeps_only_significant_vehicles():
+    stops_df = make_stops()
+    expected = loop_boarding(stops_df)
+    result = biased_boarding(boarding_stats(stops_df), alpha=0.05)
+    assert set(result['vehicle_number']) == set(expected.index[expected < 0.05])
+    assert result['p_value'].is_monotonic_increasing
+
+
+def gps_pvalues(breadcrumb_df):
+    result = biased_gps(relpos_stats(breadcrumb_df), alpha=np.inf)
+    return result.set_index('vehicle_number')['p_value'].sort_index()
+
+
+def test_gps_matches_ttest_ind_loop():
+    breadcrumb_df = make_relpos()
+    expected = loop_gps(breadcrumb_df)
+    np.testing.assert_allclose(gps_pvalues(breadcrumb_df).to_numpy(), expected.to_numpy(), rtol=1e-9)
+
+
+# values far from zero next to their spread: a variance taken from the sum of
+# squares minus n * mean^2 loses every digit here, the two-pass m2 does not
+def test_gps_matches_ttest_ind_loop_with_large_offset():
+    breadcrumb_df = make_relpos(offset=1e4, scale=1e-3)
+    expected = loop_gps(breadcrumb_df)
+    np.testing.assert_allclose(gps_pvalues(breadcrumb_df).to_numpy(), expected.to_numpy(), rtol=1e-6)
+
+
+# moments of several days merged per vehicle equal those of all rows at once
+def test_merged_moments_match_one_pass():
+    breadcrumb_df = make_relpos(offset=1e4, scale=1e-3)
+    bounds = [0, 5000, 12000, len(breadcrumb_df)]
+    parts = pd.concat([relpos_stats(breadcrumb_df.iloc[lo:hi]) for lo, hi in zip(bounds, bounds[1:])])
+    codes, vehicles = pd.factorize(parts.index, sort=True)
+    n, mean, m2 = merge_moments(codes, parts['n'], parts['mean'], parts['m2'], len(vehicles))
+    whole = relpos_stats(breadcrumb_df)
+    np.testing.assert_array_equal(n, whole['n'].to_numpy())
+    np.testing.assert_allclose(mean, whole['mean'].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(m2, whole['m2'].to_numpy(), rtol=1e-6)
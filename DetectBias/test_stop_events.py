@@ -0,0 +1,89 @@
+# DataEng S25 - Detecting Bias: tests of the streaming stop-event parser
+#   python -m pytest test_stop_events.py
+import pandas as pd
+import pytest
+
+from stop_events import STOP_COLUMNS, html_to_parquet, read_stop_events, read_stops_parquet, typed_stops
+
+SERVICE_DATE = '2022-12-07'
+HEADER = ['vehicle_number', 'leave_time', 'train', 'route_number', 'direction', 'service_key',
+          'trip_number', 'stop_time', 'arrive_time', 'dwell', 'location_id', 'door', 'lift',
+          'ons', 'offs', 'estimated_load', 'maximum_speed', 'train_mileage', 'pattern_distance',
+          'location_distance', 'x_coordinate', 'y_coordinate', 'data_source', 'schedule_status']
+
+
+# a TriMet stop events page: one h2 and table per trip, with cells given by
+# name and the rest filled in
+def write_page(path, trips):
+    parts = ['<html><body><h1>Stop events</h1>']
+    for trip, rows in trips.items():
+        parts.append(f'<h2>Stop events for PDX_TRIP {trip}</h2><table>')
+        parts.append('<tr>' + ''.join(f'<th>{name}</th>' for name in HEADER) + '</tr>')
+        for row in rows:
+            parts.append('<tr>' + ''.join(f'<td>{row.get(name, "0")}</td>' for name in HEADER) + '</tr>')
+        parts.append('</table>')
+    parts.append('</body></html>')
+    path.write_text('\n'.join(parts))
+
+
+def stop(vehicle, arrive, ons, trip, location=9000, offs=0):
+    return {'vehicle_number': vehicle, 'arrive_time': arrive, 'ons': ons, 'offs': offs,
+            'trip_number': trip, 'location_id': location}
+
+
+def raw(*rows):
+    return pd.DataFrame([[str(row[c]) for c in STOP_COLUMNS] for row in rows], columns=STOP_COLUMNS)
+
+
+def test_typed_stops_keeps_thousands_separators_and_reports_malformed_rows():
+    raw_df = raw(stop(3001, 30000, 2, 123456),
+                 stop(3001, 30060, '1,234', '1,234,567', location='13,001'),
+                 stop(3002, 86500, '3.0', 123457),  # past midnight, whole-number float
+                 stop('30x2', 30100, 1, 123458),
+                 stop(3003, '8:20', 1, 123459),
+                 stop(3004, 30200, '', 123460))
+    stops_df, malformed = typed_stops(raw_df, SERVICE_DATE)
+
+    assert list(stops_df['ons']) == [2, 1234, 3]
+    assert list(stops_df['trip_id']) == [123456, 1234567, 123457]
+    assert list(stops_df['location_id']) == [9000, 13001, 9000]
+    assert list(stops_df['tstamp']) == [pd.Timestamp('2022-12-07 08:20:00'), pd.Timestamp('2022-12-07 08:21:00'),
+                                        pd.Timestamp('2022-12-08 00:01:40')]
+    assert stops_df.dtypes['ons'] == 'int32'
+    # a bad number or time is reported; an empty cell only drops its row
+    assert list(malformed['vehicle_number']) == ['30x2', '3003']
+    assert list(malformed['arrive_time']) == ['30100', '8:20']
+
+
+def test_read_stop_events_from_html(tmp_path):
+    fname = tmp_path / 'stops.html'
+    write_page(fname, {123456: [stop(3001, 30000, 2, 123456), stop(3001, 30060, '1,234', 123456)],
+                       123457: [stop(3002, 31000, 'n/a', 123457), stop(3002, 31060, 0, 123457)]})
+    stops_df, malformed = read_stop_events(str(fname), SERVICE_DATE, batch_rows=1)
+    assert list(stops_df['ons']) == [2, 1234, 0]
+    assert list(stops_df['vehicle_number']) == [3001, 3001, 3002]
+    assert malformed.to_dict('records') == [{'vehicle_number': '3002', 'arrive_time': '31000',
+                                             'location_id': '9000', 'ons': 'n/a', 'offs': '0',
+                                             'trip_number': '123457'}]
+
+
+def test_empty_page_gives_empty_frames(tmp_path):
+    fname = tmp_path / 'stops.html'
+    write_page(fname, {})
+    stops_df, malformed = read_stop_events(str(fname), SERVICE_DATE)
+    assert stops_df.empty and malformed.empty
+    assert list(stops_df.columns) == ['trip_id', 'vehicle_number', 'location_id', 'ons', 'offs', 'tstamp']
+
+
+# a day written again in smaller batches replaces its earlier parts
+def test_html_to_parquet_replaces_the_day(tmp_path):
+    pytest.importorskip('pyarrow')
+    fname = tmp_path / 'stops.html'
+    write_page(fname, {100 + t: [stop(3000 + t % 3, 30000 + 60 * i, i % 4, 100 + t) for i in range(5)]
+                       for t in range(6)} | {999: [stop(3001, 'x', 1, 999)]})
+    outdir = tmp_path / 'stops'
+    assert html_to_parquet(str(fname), str(outdir), SERVICE_DATE, batch_rows=20) == (30, 1)
+    assert html_to_parquet(str(fname), str(outdir), SERVICE_DATE, batch_rows=5) == (30, 1)
+    stored = read_stops_parquet(str(outdir))
+    assert len(stored) == 30
+    assert sorted(stored['trip_id'].unique()) == list(range(100, 106))
@@ -0,0 +1,196 @@
+# DataEng S25 - pipeline runner
+# runs the lab scripts as stages with declared inputs and outputs; each stage
+# is a subprocess started in its own directory, so its wall time and peak RSS
+# are its own, and the results go to a JSON report:
+#   stage, status, seconds, rows, rows_per_sec, peak_rss_mb, inputs, outputs
+# a stage is skipped when the sha256 of its command, its directory's .py files
+# and its input files match the last successful run and its outputs are still
+# the files that run left behind
+#   python pipeline.py                      run every stage
+#   python pipeline.py transform bias       run only these stages
+# run it with -h to see the command line options
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = ".pipeline_cache.json"
+LOG_DIR = "pipeline_logs"
+
+
+# one script run: paths are relative to directory; rows names the file whose
+# rows measure the work done (a csv file or a Parquet dataset)
+class Stage:
+    def __init__(self, name, directory, command, inputs=(), outputs=(), rows=None):
+        self.name = name
+        self.directory = directory
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.rows = rows
+
+    def path(self, name):
+        return os.path.join(ROOT, self.directory, name)
+
+
+STAGES = [
+    Stage("synthesize", "DataSynthesis", ["generate_data.py"],
+          inputs=["departments_roles.csv", "roles_and_salaries.csv"],
+          outputs=["employee_data.csv", "plots"], rows="employee_data.csv"),
+    Stage("transform", "DataTransformation",
+          ["DataTransformation.py", "-d", "bc_trip259172515_230215.csv", "-o", "trips_parquet"],
+          inputs=["bc_trip259172515_230215.csv"],
+          outputs=["trips_parquet"], rows="bc_trip259172515_230215.csv"),
+    Stage("integrate", "DataIntegration", ["data_integration.py", "-o", "integrated.csv"],
+          inputs=["covid_confirmed_usafacts.csv", "covid_deaths_usafacts.csv", "acs2017_county_data.csv"],
+          outputs=["integrated.csv"], rows="integrated.csv"),
+    Stage("bias", "DetectBias", ["detect_bias.py", "--date", "2022-12-07", "-p", "trimet_stops_parquet"],
+          inputs=["trimet_stopevents_2022-12-07.html", "trimet_relpos_2022-12-07.csv"],
+          outputs=["trimet_stops.csv", "trimet_stops_parquet"], rows="trimet_stops.csv"),
+    # loads into the database, so there is no output file to check: it is
+    # skipped on unchanged input alone, use --force after resetting the table
+    Stage("load", "DataStorage", ["load_inserts.py", "-d", "acs2015_census_tract_data.csv", "-c"],
+          inputs=["acs2015_census_tract_data.csv"], rows="acs2015_census_tract_data.csv"),
+]
+
+
+# sha256 of a file, or of every file under a directory with its relative path
+def content_hash(path):
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                h.update(os.path.relpath(full, path).encode() + b'\0')
+                h.update(content_hash(full).encode())
+        return h.hexdigest()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# what a stage's result depends on: its command, its code and its inputs
+def stage_key(stage):
+    h = hashlib.sha256(json.dumps(stage.command).encode())
+    code_dir = os.path.join(ROOT, stage.directory)
+    for name in sorted(os.listdir(code_dir)):
+        if name.endswith('.py'):
+            h.update(name.encode() + content_hash(os.path.join(code_dir, name)).encode())
+    for name in stage.inputs:
+        h.update(name.encode() + content_hash(stage.path(name)).encode())
+    return h.hexdigest()
+
+
+def output_hashes(stage):
+    return {name: content_hash(stage.path(name)) for name in stage.outputs
+            if os.path.exists(stage.path(name))}
+
+
+# rows in a csv file (lines after the header) or a Parquet dataset
+def count_rows(path):
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        import pyarrow.dataset as ds
+        return ds.dataset(path, format='parquet').count_rows()
+    with open(path, 'rb') as f:
+        return max(sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1, 0)
+
+
+# run a stage's script and wait for it with wait4, which gives the rusage of
+# that child alone; output goes to log_path
+# returns exit code, wall seconds and peak RSS in MB
+def run_process(stage, log_path):
+    env = dict(os.environ, MPLBACKEND="Agg")  # plots are saved or dropped, never shown
+    with open(log_path, 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + stage.command, cwd=os.path.join(ROOT, stage.directory),
+                                stdout=log, stderr=subprocess.STDOUT, env=env)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)  # Popen did not reap it itself
+    return proc.returncode, seconds, usage.ru_maxrss / 1024  # ru_maxrss is in KB on Linux
+
+
+# run (or skip) one stage and return its report entry; cache is updated in place
+def run_stage(stage, cache, force=False, log_dir=LOG_DIR):
+    entry = {'stage': stage.name, 'directory': stage.directory, 'command': stage.command,
+             'inputs': stage.inputs, 'outputs': stage.outputs}
+    missing = [name for name in stage.inputs if not os.path.exists(stage.path(name))]
+    if missing:
+        return {**entry, 'status': 'missing inputs', 'missing': missing}
+
+    key = stage_key(stage)
+    last = cache.get(stage.name)
+    if not force and last and last['key'] == key and last['outputs'] == output_hashes(stage):
+        return {**entry, 'status': 'skipped', 'last_run': last['metrics']}
+
+    os.makedirs(os.path.join(ROOT, log_dir), exist_ok=True)
+    log_path = os.path.join(ROOT, log_dir, f"{stage.name}.log")
+    code, seconds, peak_mb = run_process(stage, log_path)
+    metrics = {'seconds': round(seconds, 3), 'peak_rss_mb': round(peak_mb, 1), 'rows': None,
+               'rows_per_sec': None, 'log': os.path.relpath(log_path, ROOT)}
+    if code != 0:
+        cache.pop(stage.name, None)
+        return {**entry, 'status': 'failed', 'exit_code': code, **metrics}
+
+    if stage.rows and os.path.exists(stage.path(stage.rows)):
+        metrics['rows'] = count_rows(stage.path(stage.rows))
+        metrics['rows_per_sec'] = round(metrics['rows'] / seconds, 1) if seconds > 0 else None
+    cache[stage.name] = {'key': key, 'outputs': output_hashes(stage), 'metrics': metrics}
+    return {**entry, 'status': 'ran', **metrics}
+
+
+def load_cache(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def write_json(path, obj):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stages", nargs="*",
+                        help=f"stages to run, in pipeline order (default: all of {', '.join(names)})")
+    parser.add_argument("-f", "--force", action="store_true", help="run stages even when cached")
+    parser.add_argument("-r", "--report", default="pipeline_report.json")
+    parser.add_argument("--cache", default=os.path.join(ROOT, CACHE_FILE))
+    args = parser.parse_args()
+    unknown = sorted(set(args.stages) - set(names))
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    cache = load_cache(args.cache)
+    report = []
+    for stage in STAGES:
+        if args.stages and stage.name not in args.stages:
+            continue
+        entry = run_stage(stage, cache, args.force)
+        report.append(entry)
+        write_json(args.cache, cache)
+
+        rows = f"{entry['rows']:,} rows, {entry['rows_per_sec']:,.0f} rows/sec" if entry.get('rows') else ""
+        timing = f"{entry['seconds']:8.3f} s  {entry['peak_rss_mb']:7.1f} MB  {rows}" if 'seconds' in entry else ""
+        print(f"{stage.name:12s} {entry['status']:15s} {timing}")
+        if entry['status'] == 'missing inputs':
+            print(f"{'':12s} not found in {stage.directory}: {', '.join(entry['missing'])}")
+
+    write_json(args.report, {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': report})
+    print(f"report written to {args.report}")
+    if any(entry['status'] in ('failed', 'missing inputs') for entry in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
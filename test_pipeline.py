@@ -0,0 +1,96 @@
+# DataEng S25 - tests of the pipeline runner's skip-on-unchanged-hash logic
+# a throwaway stage copies in.csv to out.csv, draws a "plot" and counts its runs
+#   python -m pytest test_pipeline.py
+import os
+
+import pytest
+
+import pipeline
+from pipeline import Stage, run_stage
+
+SCRIPT = '''import os
+import sys
+with open("in.csv") as f:
+    rows = f.read()
+with open("out.csv", "w") as f:
+    f.write(rows)
+os.makedirs("plots", exist_ok=True)
+with open(os.path.join("plots", "rows.png"), "w") as f:
+    f.write(str(len(rows)))
+with open("runs.txt", "a") as f:
+    f.write("run\\n")
+sys.exit(int(rows.startswith("fail")))
+'''
+
+
+@pytest.fixture
+def stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'ROOT', str(tmp_path))
+    work = tmp_path / 'work'
+    work.mkdir()
+    (work / 'copy.py').write_text(SCRIPT)
+    (work / 'in.csv').write_text('a,b\n1,2\n3,4\n')
+    return Stage('copy', 'work', ['copy.py'], inputs=['in.csv'], outputs=['out.csv', 'plots'], rows='out.csv')
+
+
+def runs(stage):
+    with open(stage.path('runs.txt')) as f:
+        return len(f.readlines())
+
+
+def test_unchanged_stage_is_skipped(stage):
+    cache = {}
+    entry = run_stage(stage, cache)
+    assert (entry['status'], entry['rows']) == ('ran', 2)
+    assert os.path.exists(os.path.join(pipeline.ROOT, pipeline.LOG_DIR, 'copy.log'))
+
+    entry = run_stage(stage, cache)
+    assert entry['status'] == 'skipped'
+    assert entry['last_run']['rows'] == 2
+    assert runs(stage) == 1
+    assert run_stage(stage, cache, force=True)['status'] == 'ran'
+
+
+# a changed input, code, command or output, or a missing output file or a
+# file missing from an output directory, runs it again
+@pytest.mark.parametrize('change', ['input', 'code', 'command', 'output', 'deleted output', 'deleted plot'])
+def test_changes_run_the_stage_again(stage, change):
+    cache = {}
+    run_stage(stage, cache)
+    if change == 'input':
+        with open(stage.path('in.csv'), 'a') as f:
+            f.write('5,6\n')
+    elif change == 'code':
+        with open(stage.path('copy.py'), 'a') as f:
+            f.write('# changed\n')
+    elif change == 'command':
+        stage.command.append('--verbose')
+    elif change == 'output':
+        with open(stage.path('out.csv'), 'a') as f:
+            f.write('edited\n')
+    elif change == 'deleted output':
+        os.remove(stage.path('out.csv'))
+    else:
+        os.remove(stage.path(os.path.join('plots', 'rows.png')))
+    assert run_stage(stage, cache)['status'] == 'ran'
+    assert runs(stage) == 2
+    assert run_stage(stage, cache)['status'] == 'skipped'
+
+
+def test_failed_stage_is_not_cached(stage):
+    cache = {}
+    run_stage(stage, cache)
+    with open(stage.path('in.csv'), 'w') as f:
+        f.write('fail\n')
+    entry = run_stage(stage, cache)
+    assert (entry['status'], entry['exit_code']) == ('failed', 1)
+    assert 'copy' not in cache
+    assert run_stage(stage, cache)['status'] == 'failed'
+    assert runs(stage) == 3
+
+
+def test_missing_inputs_are_reported(stage):
+    os.remove(stage.path('in.csv'))
+    entry = run_stage(stage, {})
+    assert (entry['status'], entry['missing']) == ('missing inputs', ['in.csv'])
+    assert not os.path.exists(stage.path('runs.txt'))